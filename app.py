@@ -1,20 +1,47 @@
 import streamlit as st
 import os
-from dotenv import load_dotenv
-from googleapiclient.discovery import build
-import openai
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+from mindy.concurrency import iter_completed, submit_timed
+from mindy.config import env_flag
+from mindy.deep_pool import DEEP_POOL_ENABLED, TOP_K as DEEP_POOL_TOP_K, enrich_pools, fetch_candidate_pool
+from mindy.extraction import extract_techniques_and_keywords as parse_techniques_and_keywords
+from mindy.gpt import request_completion, request_structured_completion, stream_completion
+from mindy.intent import get_intent_classifier
+from mindy.prompts import CATEGORIES, GPT_OUTPUT_FORMAT
+from mindy.ranking import dedupe_ranked, get_ranker, preprocess_texts
+from mindy.search_scheduler import get_search_scheduler
+from mindy.structured import render_markdown, techniques_from_recommendations
+from mindy.telemetry import TELEMETRY_ENABLED, record_error, span, start_trace
+from mindy.warmup import IN_APP as WARMUP_IN_APP, get_technique_video_table, start_warmup_thread
+from mindy.youtube import QuotaExceededError, build_youtube_client, enrich_videos
+
+
+# Environment variables are loaded once per process by mindy.config, and the
+# OpenAI SDK reads OPENAI_API_KEY from the environment on first use
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
 
-# Load environment variables
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+# Initialize YouTube API once per process; reruns and sessions share the client
+@st.cache_resource
+def get_youtube_client():
+    return build_youtube_client(YOUTUBE_API_KEY)
+
+
+youtube = get_youtube_client()
+
+# Local intent and category classifier, loaded once per process at startup.
+# None until `python -m mindy.intent train` has exported a model; the query
+# then goes to GPT with the user-selected category.
+intent_classifier = get_intent_classifier()
 
-# Initialize YouTube API
-youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
+# Keep the precomputed videos of popular techniques fresh from inside the app
+if WARMUP_IN_APP:
+    start_warmup_thread(youtube)
+
+# Render GPT output as it streams in and prefetch videos per technique
+STREAM_GPT = env_flag("MINDY_GPT_STREAM", True)
+
+# Show the last request's stage waterfall in the sidebar when telemetry is on
+SHOW_TRACE_PANEL = TELEMETRY_ENABLED and env_flag("MINDY_TRACE_PANEL", True)
 
 # Streamlit App
 st.title("Mindy")
@@ -23,138 +50,61 @@ st.subheader("Discover mindfulness techniques and personalized video recommendat
 st.write("Enter your query to get recommendations.")
 
 # Categories for user guidance
-categories = {
-    "Mindfulness and Meditation": ["mindfulness", "guided meditation", "focus meditation"],
-    "Breathing Exercises" : ["deep breathing techniques", "4-7-8 breathing", "box breathing"], 
-    "Somatic Practices":  ["yoga for relaxation", "tai chi", "progressive muscle relaxation"],
-}
+categories = CATEGORIES
 
 # Generate GPT-4 Recommendations
-def generate_gpt_recommendations(query, selected_category):
+def generate_gpt_recommendations(query, selected_category, bypass_cache=False):
     try:
-        # Dynamically adjust the prompt based on the selected category
-        if selected_category != "All":
-            category_instruction = (
-                f"Focus your recommendations specifically on the category: **{selected_category}**. "
-                "Only suggest techniques and advice that are directly relevant to this category. "
-                "If the query falls outside the scope of this category, state: 'The provided context does not contain this information.'"
-            )
-        else:
-            category_instruction = (
-                "Provide general recommendations not limited to any specific category. "
-                "Cover a diverse range of actionable techniques related to mindfulness, relaxation, and self-help."
-            )
-            
-        gpt_prompt = f"""
-        ## SYSTEM ROLE
-        You are an expert chatbot designed to provide actionable, insightful, and personalized advice on **Mindfulness**, **Relaxation**, and **Self-Help Techniques**. 
-        If a query is unrelated to these topics, politely inform the user and avoid generating recommendations.
-        Based on the user's query, provide **specific techniques** the user can apply, along with actionable advice
-
-        ## USER QUESTION
-        The user has asked: 
-        "{query}"
-
-        ## CATEGORY CONTEXT
-        {category_instruction}
-
-        ## GUIDELINES
-        1. **Accuracy**:  
-           - Provide actionable techniques tailored to the query 
-           - Prioritize recommendations from CATEGORY CONTEXT and base your suggestions on the user's query.
-           - If the answer cannot be found, explicitly state: "The provided context does not contain this information."
-           - Use actionable language to recommend techniques for relaxation and mindfulness.
-           
-        2. **Actionable Techniques**: Suggest **specific techniques** the user can apply (e.g., guided breathing, mindfulness meditation, progressive muscle relaxation). Explain:
-           - How the technique works.
-           - How it helps address the query.
-           - Steps to apply it.
-
-        3. **Clarity**:  
-           - Use simple, professional, and user-friendly language.  
-           - Ensure the response is well-structured and formatted in Markdown for readability.  
-           
-        4. **Category Relevance**:  
-           - If a category is provided, ensure all suggestions directly address that category.
-           - For example:
-             - For "Stress and Anxiety Relief", focus on techniques like deep breathing, mindfulness exercises, and calming practices.
-             - For "Sleep and Rest", suggest techniques like guided sleep meditations, sleep hygiene tips, and relaxing yoga poses.
-
-        5. **Response Format**:
-           - Include at least two techniques.
-           - Use the following structure:
-    
-        '''
-        # [Custom Title Based on the Query]
-        Provide a meaningful title based on the user’s query and CATEGORY CONTEXT (e.g., "How to Relax and Sleep Better").
-
-        ## Recommendations
-        1. **[Actionable Advice]**: Actionable and insightful advice.
-        1. **[Technique Name]**: Detailed explanation of the technique, why it works, and how to apply it].
-        2. **[Another Technique Name]**: [Detailed explanation].
-
-
-        ## Note
-        Focus on actionable advice. Avoid vague suggestions.
-        '''
-        """
-
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert assistant."},
-                {"role": "user", "content": gpt_prompt},
-            ],
-            temperature=0.7,
-            max_tokens=1500,
-        )
-        return response.choices[0].message.content
+        # Served from the response cache shared with the query simulator when possible
+        return request_completion(query, selected_category, bypass_cache=bypass_cache)
     except Exception as e:
         return f"Error generating recommendations: {e}"
 
+
+# Stream GPT-4 Recommendations into the page as tokens arrive and return the full text
+def stream_gpt_recommendations(query, selected_category, on_technique=None, bypass_cache=False):
+    try:
+        return st.write_stream(stream_completion(
+            query,
+            selected_category,
+            on_technique=on_technique,
+            bypass_cache=bypass_cache,
+        ))
+    except Exception as e:
+        gpt_recommendations = f"Error generating recommendations: {e}"
+        st.markdown(gpt_recommendations)
+        return gpt_recommendations
+
+
+# JSON output mode: returns the locally rendered markdown and the parsed techniques
+def generate_structured_recommendations(query, selected_category, bypass_cache=False):
+    try:
+        recommendations = request_structured_completion(query, selected_category, bypass_cache=bypass_cache)
+        return render_markdown(recommendations), techniques_from_recommendations(recommendations)
+    except Exception as e:
+        return f"Error generating recommendations: {e}", []
+
 # Extract techniques from GPT recommendations
 def extract_techniques_and_keywords(gpt_recommendations):
     try:
-        techniques_with_keywords = []
-        lines = gpt_recommendations.splitlines()
-        
-        # Step 1: Extract the custom title
-        title_keywords = []
-        for line in lines:
-            if line.startswith("# "):  # Identify the custom title
-                title = line[2:].strip()  # Remove the "# " prefix and extract the title
-                # Extract keywords from the title
-                title_keywords = [
-                    word.lower()
-                    for word in title.split()
-                    if len(word) > 3  # Filter out short/common words
-                ]
-                break  # Title extraction is complete, no need to continue
-
-        # Step 2: Extract technique name and add title keywords
-        for i, line in enumerate(lines):
-            if line.startswith("1.") or line.startswith("2."):
-                technique_name = line.split("**")[1]  # Extract text within "**[Technique Name]**"
-
-                # Extract additional keywords from the technique name
-                technique_keywords = [
-                    word.lower()
-                    for word in technique_name.split()
-                    if len(word) > 3
-                ]
-
-                # Combine title keywords and technique keywords
-                combined_keywords = technique_keywords + title_keywords
-                techniques_with_keywords.append({"technique": technique_name, "keywords": combined_keywords})
-        
-        return techniques_with_keywords
+        return parse_techniques_and_keywords(gpt_recommendations)
     except Exception as e:
+        record_error("extract")
         st.error(f"Error extracting techniques and keywords: {e}")
         return []
 
 
+# Show a message right away, or collect it when running on a worker thread,
+# where Streamlit calls are not allowed; the main thread renders it later
+def report(level, message, messages=None):
+    if messages is None:
+        getattr(st, level)(message)
+    else:
+        messages.append((level, message))
+
+
 # Fetch videos from YouTube API
-def fetch_youtube_videos(query, max_results=10, order="relevance", video_duration=None, video_definition=None):
+def fetch_youtube_videos(query, max_results=10, order="relevance", video_duration=None, video_definition=None, messages=None):
     try:
         request_params = {
                 "q": query,
@@ -169,63 +119,157 @@ def fetch_youtube_videos(query, max_results=10, order="relevance", video_duratio
         if video_definition:  # Add video definition filter if provided
             request_params["videoDefinition"] = video_definition
 
-        response = youtube.search().list(**request_params).execute()
-
-        videos = [
-            {
-                "title": item["snippet"]["title"],
-                "description": item["snippet"]["description"],
-                "video_id": item["id"]["videoId"],
-                "link": f"https://www.youtube.com/watch?v={item['id']['videoId']}",
-            }
-            for item in response.get("items", [])
-        ]
-        return videos
+        # Walk result pages into a pool of candidates instead of taking YouTube's top results
+        if DEEP_POOL_ENABLED:
+            return fetch_candidate_pool(youtube, request_params)
+
+        # Canonicalized and shared with equivalent searches from other techniques
+        # and sessions; served from the results cache when possible
+        return get_search_scheduler().search(youtube, request_params)
+    except QuotaExceededError as e:
+        report("warning", f"{e} Showing no new videos for now.", messages)
+        return []
     except Exception as e:
-        st.error(f"Error fetching videos: {e}")
+        report("error", f"Error fetching videos: {e}", messages)
         return []
 
 
 def preprocess_text(text):
     # Convert to lowercase and remove special characters
-    text = text.lower()
-    text = re.sub(r"[^a-zA-Z0-9\s]", "", text)  # Remove punctuation and special characters
-    return text
+    return preprocess_texts([text])[0]
     
 
+def report_unmatched(ranked_videos, messages=None):
+    if ranked_videos and all(video["similarity_score"] == 0.0 for video in ranked_videos):
+        report("warning", "No meaningful matches found based on similarity. Displaying original YouTube ranking.", messages)
+
+
 # Rank videos by similarity to the technique
-def rank_videos_by_query(query, videos):
+def rank_videos_by_query(query, videos, messages=None):
     try:
-        video_texts = [
-            preprocess_text(video["title"] + " " + video["description"]) for video in videos
-        ]
-        query_text = preprocess_text(query)
-
-        # Compute similarity using TF-IDF
-        vectorizer = TfidfVectorizer(stop_words="english")
-        tfidf_matrix = vectorizer.fit_transform([query_text] + video_texts)
-        similarity_scores = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:]).flatten()
-
-        # Add similarity scores to videos
-        for i, video in enumerate(videos):
-            video["similarity_score"] = similarity_scores[i]
-        if all(score == 0.0 for score in similarity_scores):
-            st.warning("No meaningful matches found based on similarity. Displaying original YouTube ranking.")
-            return videos  # Return videos without re-ranking
-        return sorted(videos, key=lambda x: x["similarity_score"], reverse=True)
+        # Cosine similarity using the configured ranking backend (TF-IDF by default)
+        if DEEP_POOL_ENABLED:
+            ranked_videos = get_ranker().top_k(query, videos, DEEP_POOL_TOP_K)
+        else:
+            ranked_videos = get_ranker().rank(query, videos)
+        report_unmatched(ranked_videos, messages)
+        return ranked_videos
     except Exception as e:
-        st.error(f"Error ranking videos: {e}")
+        report("error", f"Error ranking videos: {e}", messages)
         return videos
 
+
 def build_enriched_query(technique_data):
     # Use only unique keywords for the query
     unique_keywords = list(set(technique_data["keywords"]))  # Remove duplicates
     return " ".join(unique_keywords)
 
+
+# Fetch, enrich and rank the videos for one technique; runs on the shared
+# fetch pool, so techniques are ranked in parallel and each ranking is final.
+# Popular and seed techniques are served from the table precomputed by
+# mindy.warmup.
+def fetch_technique_videos(technique_data):
+    precomputed = get_technique_video_table().get(technique_data["technique"])
+    if precomputed is not None:
+        return precomputed, []
+    messages = []
+
+    # Fetch videos using the enriched query
+    enriched_query = build_enriched_query(technique_data)
+    videos = fetch_youtube_videos(
+        enriched_query,
+        max_results=10,
+        order="relevance",  # Fetch the most-viewed videos
+        video_duration="medium",  # Fetch videos between 4 and 20 minutes
+        video_definition="high",  # Fetch only high-definition videos
+        messages=messages,
+    )
+
+    # Add harvested videos retrieved by the ranker's own index (the semantic
+    # backend's ANN index), then view counts and durations
+    videos = get_ranker().with_neighbours([enriched_query], [videos])[0]
+    if DEEP_POOL_ENABLED:
+        videos = enrich_pools(youtube, [videos])[0]
+    else:
+        videos = enrich_videos(youtube, [videos])[0]
+    return rank_videos_by_query(enriched_query, videos, messages=messages), messages
+
+
+def display_ranked_videos(technique, ranked_videos, messages):
+    st.subheader(f"Top Videos for: {technique}")
+    for level, message in messages:
+        getattr(st, level)(message)
+    for video in ranked_videos[:3]:  # Show top 3 videos per technique
+        st.markdown(f"""
+        - **{video['title']}**  
+          {video['description']}  
+          [Watch here]({video['link']})  
+          **Similarity Score**: {video['similarity_score']:.2f}
+            """)
+
+
+# Gantt-style chart of the spans in a finished trace
+def display_trace_waterfall(trace):
+    import altair as alt  # Only needed when the panel is shown
+
+    st.sidebar.write("### Last Request")
+    st.sidebar.caption(f"{trace['name']}: {trace['duration_ms']:.0f} ms, {len(trace['spans'])} spans")
+    rows = [
+        {
+            "stage": f"{position + 1}. {trace_span['name']}",
+            "start_ms": trace_span["start_ms"],
+            "end_ms": trace_span["start_ms"] + trace_span["duration_ms"],
+            "duration_ms": round(trace_span["duration_ms"], 1),
+            "details": ", ".join(f"{key}={value}" for key, value in trace_span["attributes"].items()),
+            "error": trace_span["error"] or "",
+        }
+        for position, trace_span in enumerate(trace["spans"])
+    ]
+    if not rows:
+        return
+    chart = alt.Chart(alt.Data(values=rows)).mark_bar().encode(
+        x=alt.X("start_ms:Q", title="ms"),
+        x2="end_ms:Q",
+        y=alt.Y("stage:N", sort=None, title=None),
+        color=alt.condition("datum.error != ''", alt.value("#d62728"), alt.value("#1f77b4")),
+        tooltip=["stage:N", "duration_ms:Q", "details:N", "error:N"],
+    )
+    st.sidebar.altair_chart(chart, use_container_width=True)
+
+
+def prefetch_key(technique_data):
+    return (technique_data["technique"], tuple(technique_data["keywords"]))
+
+
+# Start fetching videos for a technique while GPT is still generating the rest
+def prefetch_technique_videos(technique_data):
+    future = submit_timed(fetch_technique_videos, technique_data)
+    st.session_state.video_prefetch[prefetch_key(technique_data)] = future
+
+
+# Reuse prefetched fetches where available and submit the rest
+def technique_video_futures(techniques):
+    prefetched = st.session_state.get("video_prefetch", {})
+    futures = []
+    for technique_data in techniques:
+        future = prefetched.get(prefetch_key(technique_data))
+        if future is None or future.cancelled() or (future.done() and future.exception() is not None):
+            future = submit_timed(fetch_technique_videos, technique_data)
+        futures.append(future)
+    return futures
+
     
 # Streamlit Input and Display
 query = st.text_input("Enter your query:")
 selected_category = st.selectbox("Select a category (optional):", ["All"] + list(categories.keys()))
+
+# Checked locally as the query is entered, before any network call
+intent = intent_classifier.classify(query) if intent_classifier is not None and query else None
+suggested_category = intent_classifier.suggest_category(intent) if intent is not None else None
+if suggested_category is not None and suggested_category != selected_category:
+    st.caption(f"Suggested category: {suggested_category}")
+off_topic = intent is not None and intent_classifier.is_off_topic(intent)
 tab_chatbot, tab_videos = st.tabs(["Chatbot Recommendations", "Video Recommendations"])
 with tab_chatbot:
     st.write("### GPT-4 Recommendations")
@@ -233,46 +277,92 @@ with tab_chatbot:
     # Reset button to clear input
     if st.button("Reset"):
         st.experimental_rerun()  # Reset the app
-    if generate_button and query:
-        with st.spinner("Generating recommendations..."):
+    if generate_button and off_topic:
+        st.warning("This question doesn't seem to be about mindfulness, relaxation or self-help, so no recommendations were generated. Try rephrasing it.")
+    if generate_button and query and not off_topic:
+        with st.spinner("Generating recommendations..."), start_trace("chat", query=query, category=selected_category) as trace:
             # Step 1: Generate GPT-4 recommendations using the original query and selected category
-            gpt_recommendations = generate_gpt_recommendations(query, selected_category)
-            st.markdown(gpt_recommendations)  # Display GPT recommendations
+            if GPT_OUTPUT_FORMAT == "json":
+                # The answer arrives as validated JSON, so techniques need no scraping
+                gpt_recommendations, structured_techniques = generate_structured_recommendations(query, selected_category)
+                st.markdown(gpt_recommendations)
+                st.session_state.video_prefetch = {}
+                for technique_data in structured_techniques:
+                    prefetch_technique_videos(technique_data)
+            elif STREAM_GPT:
+                # Render tokens as they arrive; videos for each technique are prefetched as soon as it is parsed
+                st.session_state.video_prefetch = {}
+                gpt_recommendations = stream_gpt_recommendations(
+                    query, selected_category, on_technique=prefetch_technique_videos
+                )
+            else:
+                gpt_recommendations = generate_gpt_recommendations(query, selected_category)
+                st.markdown(gpt_recommendations)  # Display GPT recommendations
     
             # Step 2: Extract techniques and related keywords (including title keywords)
-            techniques_with_keywords = extract_techniques_and_keywords(gpt_recommendations)
+            if GPT_OUTPUT_FORMAT == "json":
+                techniques_with_keywords = structured_techniques
+            else:
+                with span("extract"):
+                    techniques_with_keywords = extract_techniques_and_keywords(gpt_recommendations)
 
             # Save recommendations in session state
             st.session_state.techniques_with_keywords = techniques_with_keywords
             
             st.success("Recommendations generated successfully!")
+        st.session_state.last_trace = trace.to_dict()
             
 with tab_videos:
     st.write("### Video Recommendations")
     if "techniques_with_keywords" not in st.session_state or not st.session_state.techniques_with_keywords:
         st.warning("Please generate recommendations in the 'Chatbot Recommendations' tab first.")
     else:
-        with st.spinner("Fetching and ranking videos..."):
-            for technique_data in st.session_state.techniques_with_keywords:
-                technique = technique_data["technique"]
-                enriched_query = build_enriched_query(technique_data)
-                
-                # Fetch and rank videos using the enriched query
-                videos = fetch_youtube_videos(
-                    enriched_query,
-                    max_results=10,
-                    order="relevance",  # Fetch the most-viewed videos
-                    video_duration="medium",  # Fetch videos between 4 and 20 minutes
-                    video_definition="high"  # Fetch only high-definition videos
-                )
-                ranked_videos = rank_videos_by_query(enriched_query, videos)
-                
-                # Display ranked videos
-                st.subheader(f"Top Videos for: {technique}")
-                for video in ranked_videos[:3]:  # Show top 3 videos per technique
-                    st.markdown(f"""
-                    - **{video['title']}**  
-                      {video['description']}  
-                      [Watch here]({video['link']})  
-                      **Similarity Score**: {video['similarity_score']:.2f}
-                        """)
\ No newline at end of file
+        techniques = st.session_state.techniques_with_keywords
+
+        # Reruns with the same techniques (any widget interaction) reuse this
+        # session's results instead of fetching and ranking again
+        results_key = tuple(prefetch_key(technique_data) for technique_data in techniques)
+        video_results = st.session_state.get("video_results")
+        if video_results is not None and video_results["key"] == results_key:
+            for technique_data, ranked_videos, messages in zip(techniques, video_results["ranked_lists"], video_results["message_lists"]):
+                display_ranked_videos(technique_data["technique"], ranked_videos, messages)
+        else:
+            # Reserve one slot per technique so results keep a fixed order while
+            # the searches run concurrently and finish in any order
+            slots = [st.empty() for _ in techniques]
+            for slot, technique_data in zip(slots, techniques):
+                slot.info(f"Fetching videos for: {technique_data['technique']}...")
+
+            with st.spinner("Fetching and ranking videos..."), start_trace("videos", techniques=len(techniques)) as trace:
+                ranked_lists = [[] for _ in techniques]
+                message_lists = [[] for _ in techniques]
+
+                # Show each technique's ranking as soon as it is ready
+                for index, result, error in iter_completed(technique_video_futures(techniques)):
+                    if error is not None:
+                        record_error("fetch")
+                        message_lists[index].append(("error", f"Error fetching videos: {error}"))
+                    else:
+                        ranked_lists[index], fetch_messages = result
+                        message_lists[index].extend(fetch_messages)
+                    with slots[index].container():
+                        display_ranked_videos(techniques[index]["technique"], ranked_lists[index], message_lists[index])
+
+                # Keep a video only under the technique it matches best, and
+                # redraw only the techniques whose shown videos change
+                deduped_lists = dedupe_ranked(ranked_lists)
+                for slot, technique_data, ranked_videos, deduped_videos, messages in zip(
+                    slots, techniques, ranked_lists, deduped_lists, message_lists
+                ):
+                    if deduped_videos[:3] != ranked_videos[:3]:
+                        slot.empty()  # Clear the shown list so no stale rows remain
+                        with slot.container():
+                            display_ranked_videos(technique_data["technique"], deduped_videos, messages)
+                ranked_lists = deduped_lists
+            # Failed fetches are retried on the next rerun rather than memoized
+            if not any(level == "error" for messages in message_lists for level, _ in messages):
+                st.session_state.video_results = {"key": results_key, "ranked_lists": ranked_lists, "message_lists": message_lists}
+            st.session_state.last_trace = trace.to_dict()
+
+if SHOW_TRACE_PANEL and st.session_state.get("last_trace"):
+    display_trace_waterfall(st.session_state.last_trace)
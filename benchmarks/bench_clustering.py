@@ -0,0 +1,105 @@
+import argparse
+import csv
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Make the shared mindy package importable when running from this directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from mindy.clustering import EmbeddingCache, TechniqueClusterer
+from mindy.ranking import CORPUS_PATH
+
+MODIFIERS = [
+    "daily", "evening", "morning", "guided", "gentle", "quick", "deep", "mindful", "seated", "walking",
+    "bedtime", "workplace", "beginner", "advanced", "five minute", "breath focused", "body based", "outdoor",
+]
+
+
+# A stand-in for the sentence encoder when the model is not available: hashed
+# bag of words, randomly projected to the model's dimension and normalized
+def hashed_embedder(dimension=384, n_features=2 ** 14, seed=0):
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+    vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None)
+    projection = np.random.default_rng(seed).standard_normal((n_features, dimension)).astype(np.float32)
+
+    def embed(texts):
+        embeddings = np.asarray(vectorizer.transform(texts) @ projection, dtype=np.float32)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    return embed
+
+
+# Technique names from the corpus, varied with modifiers into `unique` distinct
+# texts, then drawn with a Zipf-like frequency as in real simulation logs
+def synthetic_techniques(n_rows, n_unique, seed=0):
+    with open(CORPUS_PATH, newline="", encoding="utf-8") as file:
+        base = sorted({row["Technique"] for row in csv.DictReader(file)})
+    rng = np.random.default_rng(seed)
+    texts = list(dict.fromkeys(
+        f"{base[rng.integers(len(base))]} {' '.join(rng.choice(MODIFIERS, size=rng.integers(1, 4), replace=False))}"
+        for _ in range(n_unique * 2)
+    ))[:n_unique]
+    weights = 1.0 / np.arange(1, len(texts) + 1) ** 0.8
+    return [texts[i] for i in rng.choice(len(texts), size=n_rows, p=weights / weights.sum())]
+
+
+def timed(label, fn, *args, **kwargs):
+    started_at = time.perf_counter()
+    result = fn(*args, **kwargs)
+    print(f"  {label:<42} {time.perf_counter() - started_at:8.2f} s")
+    return result
+
+
+# The notebook's approach: every row embedded, full PCA and KMeans in memory
+def notebook_baseline(texts, embed, n_clusters):
+    from sklearn.cluster import KMeans
+    from sklearn.decomposition import PCA
+
+    embeddings = embed(texts)
+    reduced = PCA(n_components=0.90, random_state=42).fit_transform(embeddings)
+    return KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit_predict(reduced)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the clustering pipeline on a large synthetic technique log.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Technique rows to cluster")
+    parser.add_argument("--unique", type=int, default=50_000, help="Distinct technique texts among the rows")
+    parser.add_argument("--new-rows", type=int, default=10_000, help="Rows of a later run assigned to the clusters")
+    parser.add_argument("--clusters", type=int, default=12)
+    parser.add_argument("--model", action="store_true", help="Encode with the sentence-transformer model instead of hashed vectors")
+    parser.add_argument("--baseline-rows", type=int, default=0, help="Also time the notebook's full-batch approach on this many rows")
+    args = parser.parse_args()
+
+    if args.model:
+        from mindy.semantic import embed_texts as embed
+    else:
+        embed = hashed_embedder()
+    texts = timed(f"generate {args.rows} rows", synthetic_techniques, args.rows, args.unique)
+    new_texts = synthetic_techniques(args.new_rows, args.unique + args.unique // 5, seed=1)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print("Pipeline:")
+        cache = EmbeddingCache(cache_dir, embed=embed)
+        clusterer = TechniqueClusterer(n_clusters=args.clusters)
+        timed("fit, cold embedding cache", clusterer.fit, texts, cache)
+        print(f"  {'':<42} {cache.misses} texts encoded, {clusterer.n_components} PCA components")
+
+        cache = EmbeddingCache(cache_dir, embed=embed)
+        timed("fit, warm embedding cache", TechniqueClusterer(n_clusters=args.clusters).fit, texts, cache)
+        print(f"  {'':<42} {cache.misses} texts encoded")
+
+        timed(f"assign {args.new_rows} new rows", clusterer.assign, new_texts, cache)
+        print(f"  {'':<42} {cache.misses} texts encoded")
+        timed("save model and themes", clusterer.save, os.path.join(cache_dir, "clusters"))
+        for theme in clusterer.themes()[:5]:
+            print(f"    cluster {theme['cluster']:>2} ({theme['size']} rows): {', '.join(theme['top_words'][:6])}")
+
+    if args.baseline_rows:
+        print("Notebook approach:")
+        timed(f"embed + PCA + KMeans on {args.baseline_rows} rows", notebook_baseline, texts[:args.baseline_rows], embed, args.clusters)
+
+    print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
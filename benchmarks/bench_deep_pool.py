@@ -0,0 +1,142 @@
+import argparse
+import csv
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+# A fresh cache and quota ledger; mindy.config reads the directory at import
+os.environ["MINDY_CACHE_DIR"] = tempfile.mkdtemp()
+
+# Make the shared mindy package importable when running from this directory
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+from mindy.standins import add_standin_arguments, standin_kwargs, start_standin_server
+from mindy.stats import percentile
+
+
+# Keyword queries of the technique searches per logged query
+def load_sessions(csv_path, n_queries):
+    sessions = defaultdict(list)
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            key = (row["Query"], row["Category"])
+            if key in sessions or len(sessions) < n_queries:
+                sessions[key].append(" ".join(dict.fromkeys(row["Keywords"].split())))
+    return list(sessions.values())
+
+
+# Bytes allocated while building fn()'s result
+def allocated(fn):
+    tracemalloc.start()
+    result = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+# Fetch, enrich and rank every session's techniques with pools of `size`
+# candidates; the searches of a session run concurrently as in the app
+def run_sessions(youtube, sessions, size, args):
+    from mindy.concurrency import run_concurrently
+    from mindy.deep_pool import enrich_pools, fetch_candidate_pool
+    from mindy.ranking import get_ranker
+
+    ranker = get_ranker()
+    fetch_seconds, rank_seconds, pool_sizes, deep_picks = [], [], [], 0
+    for queries in sessions:
+        params = [{"q": query, "part": "snippet", "type": "video", "maxResults": 10, "order": "relevance",
+                   "videoDuration": "medium", "videoDefinition": "high"} for query in queries]
+        started_at = time.perf_counter()
+        pools = [None] * len(params)
+        for index, pool, error in run_concurrently(
+            lambda request_params: fetch_candidate_pool(youtube, request_params, size=size, max_units=args.max_units,
+                                                        budget=args.budget), params
+        ):
+            if error is not None:
+                raise error
+            pools[index] = pool
+        pools = enrich_pools(youtube, pools)
+        fetch_seconds.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        ranked_lists = ranker.top_k_many(queries, pools, 3, dedupe=True)
+        rank_seconds.append(time.perf_counter() - started_at)
+        pool_sizes.extend(len(pool) for pool in pools)
+        for pool, ranked in zip(pools, ranked_lists):
+            first_page = set(str(video_id) for video_id in pool.video_ids[:10])
+            deep_picks += sum(1 for video in ranked if video["video_id"] not in first_page)
+    return fetch_seconds, rank_seconds, pool_sizes, deep_picks
+
+
+# Rank one pool of `size` videos as dicts with a full sort (rank_many) and as a
+# CandidatePool with top-k selection (top_k_many)
+def compare_ranking(size, texts, repeats):
+    from mindy.ranking import CandidatePool, get_ranker
+
+    ranker = get_ranker()
+    query = texts[0]
+    videos, dict_bytes = allocated(lambda: [
+        {"title": text[:60], "description": text, "video_id": f"{index:011d}",
+         "link": f"https://www.youtube.com/watch?v={index:011d}", "view_count": 1000 * index, "like_count": 10 * index,
+         "duration_seconds": 600, "definition": "hd"}
+        for index, text in enumerate(texts[1:size + 1])
+    ])
+    pool, pool_bytes = allocated(lambda: CandidatePool.from_videos(videos))
+    timings = {}
+    for name, rank in (("sorted dicts", lambda: ranker.rank(query, videos)[:3]),
+                       ("top-k pool", lambda: ranker.top_k(query, pool, 3))):
+        rank()
+        started_at = time.perf_counter()
+        for _ in range(repeats):
+            rank()
+        timings[name] = (time.perf_counter() - started_at) / repeats
+    print(f"  {size:>4} videos: sorted dicts {timings['sorted dicts'] * 1000:6.2f} ms, "
+          f"top-k pool {timings['top-k pool'] * 1000:6.2f} ms; "
+          f"{dict_bytes / size:.0f} bytes per video as a dict, {pool_bytes / size:.0f} per pool row sharing its texts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure deep candidate pools: paging cost, latency and ranking time.")
+    parser.add_argument("--queries", type=int, default=20, help="Logged queries to replay as sessions")
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[10, 100, 200, 500],
+                        help="Comma-separated pool sizes to compare")
+    parser.add_argument("--max-units", type=int, default=1000, help="search.list units each search may spend")
+    parser.add_argument("--budget", type=float, default=4.0, help="Seconds to keep paging after the first page")
+    parser.add_argument("--repeats", type=int, default=50, help="Timed rankings per pool size")
+    add_standin_arguments(parser)
+    parser.set_defaults(youtube_latency=0.3)
+    args = parser.parse_args()
+
+    server = start_standin_server(**standin_kwargs(args))
+    os.environ.update({
+        "MINDY_YOUTUBE_API_ENDPOINT": f"{server.url}/",
+        "MINDY_LOCAL_INDEX": "0",
+        "MINDY_YOUTUBE_DAILY_QUOTA": str(10 ** 9),
+    })
+    from mindy.ranking import load_corpus_texts
+    from mindy.youtube import build_youtube_client, get_quota_ledger, get_video_cache
+
+    sessions = load_sessions(args.corpus, args.queries)
+    youtube = build_youtube_client("standin")
+    print(f"{len(sessions)} sessions, {sum(map(len, sessions))} technique searches per pool size; stand-in search latency "
+          f"median {args.youtube_latency:g} s, budget {args.max_units} units and {args.budget:g} s per search")
+    for size in args.sizes:
+        get_video_cache().clear()  # Every size pages from the first result, with no pages cached
+        units_before = sum(get_quota_ledger().usage().values())
+        fetch_seconds, rank_seconds, pool_sizes, deep_picks = run_sessions(youtube, sessions, size, args)
+        units = sum(get_quota_ledger().usage().values()) - units_before
+        print(f"pool of {size}: {statistics.mean(pool_sizes):.0f} candidates and {units / len(pool_sizes):.0f} units per search "
+              f"(search.list and videos.list)")
+        print(f"  session fetch p50 {percentile(fetch_seconds, 0.5):5.2f} s   p95 {percentile(fetch_seconds, 0.95):5.2f} s;   "
+              f"rank p50 {percentile(rank_seconds, 0.5) * 1000:6.2f} ms")
+        print(f"  {deep_picks / (3 * len(pool_sizes)):.0%} of the top 3 come from beyond YouTube's first 10 results")
+    server.shutdown()
+
+    print("Ranking one pool:")
+    texts = load_corpus_texts(args.corpus)
+    for size in args.sizes:
+        compare_ranking(size, texts, args.repeats)
@@ -0,0 +1,79 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the shared mindy package importable when running from this directory
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+from mindy.standins import add_standin_arguments, standin_kwargs, start_standin_server
+from mindy.stats import percentile
+
+
+def load_prompts(csv_path, n_requests):
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        pairs = list(dict.fromkeys((row["Query"], row["Category"]) for row in csv.DictReader(file)))
+    return [pairs[index % len(pairs)] for index in range(n_requests)]
+
+
+# Time full answers through one call policy, `concurrency` at a time
+def run_policy(name, completions, prompts, concurrency, server):
+    from mindy.gpt import completion_params, read_answer
+    from mindy.telemetry import NULL_SPAN
+
+    def call(prompt):
+        started_at = time.perf_counter()
+        try:
+            read_answer(completions.open(completion_params(*prompt)), NULL_SPAN)
+            return time.perf_counter() - started_at, True
+        except Exception:
+            return time.perf_counter() - started_at, False
+
+    calls_before = server.calls["chat.completions"]
+    cancelled_before = server.calls["chat.completions.cancelled"]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, prompts))
+    durations = sorted(duration for duration, _ in results)
+    stats = completions.stats()
+    print(f"{name}:")
+    print(f"  answer p50 {percentile(durations, 0.5):6.2f} s   p95 {percentile(durations, 0.95):6.2f} s   "
+          f"p99 {percentile(durations, 0.99):6.2f} s   max {durations[-1]:6.2f} s   "
+          f"({sum(1 for _, ok in results if not ok)} failed)")
+    print(f"  {(server.calls['chat.completions'] - calls_before) / len(prompts):.2f} upstream calls per answer, "
+          f"{server.calls['chat.completions.cancelled'] - cancelled_before} streams cancelled; "
+          f"{stats['hedges']} hedges ({stats['hedge_wins']} won), {stats['fallbacks']} fallbacks, "
+          f"{stats['deadlines_missed']} missed deadlines, hedge after {stats['hedge_after']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare GPT answer tail latency with and without deadlines, hedging and fallback.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--deadline", type=float, default=3.0, help="First-token deadline of the primary model (s)")
+    parser.add_argument("--hedge-budget", type=float, default=0.1, help="Largest fraction of calls to hedge")
+    add_standin_arguments(parser)
+    parser.set_defaults(openai_latency=1.0, latency_sigma=1.0)
+    args = parser.parse_args()
+
+    server = start_standin_server(**standin_kwargs(args))
+    os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "standin")
+    from mindy.gpt import create_chat_completion
+    from mindy.resilience import ResilientCompletions
+
+    prompts = load_prompts(args.corpus, args.requests)
+    print(f"{args.requests} answers, {args.concurrency} at a time; stand-in first token after a fifth of a "
+          f"lognormal latency (median {args.openai_latency:g} s, sigma {args.latency_sigma:g})")
+    unbounded = 3600.0
+    policies = [
+        ("single call", ResilientCompletions(create_chat_completion, deadline=unbounded, fallback_model="", hedge=False)),
+        ("hedged", ResilientCompletions(create_chat_completion, deadline=unbounded, fallback_model="", hedge=True,
+                                        hedge_budget=args.hedge_budget)),
+        (f"hedged, {args.deadline:g} s deadline and fallback", ResilientCompletions(
+            create_chat_completion, deadline=args.deadline, hedge=True, hedge_budget=args.hedge_budget)),
+    ]
+    for name, completions in policies:
+        run_policy(name, completions, prompts, args.concurrency, server)
+    server.shutdown()
@@ -0,0 +1,104 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+# Bypass the response caches and record spans, whose token counts and wall
+# times are what this benchmark reports. Set before any mindy module is imported.
+CACHE_DIR = tempfile.mkdtemp(prefix="mindy-bench-")
+os.environ["MINDY_CACHE_DIR"] = CACHE_DIR
+os.environ["MINDY_GPT_CACHE"] = "0"
+os.environ["MINDY_SEMANTIC_CACHE"] = "0"
+os.environ["MINDY_TELEMETRY"] = "1"
+
+# Make the shared mindy package and the simulator's app_logic importable
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, "simulate queries"))
+from bench_utils import load_query_pairs
+from mindy.standins import add_standin_arguments, standin_kwargs, start_standin_server
+from mindy.stats import percentile
+
+
+def measure(output_format, query_pairs):
+    from app_logic import extract_techniques_and_keywords
+    from mindy.gpt import request_completion, request_structured_completion
+    from mindy.structured import techniques_from_recommendations
+    from mindy.telemetry import start_trace
+
+    results = []
+    for query, category in query_pairs:
+        with start_trace("bench", output=output_format) as trace:
+            try:
+                if output_format == "json":
+                    techniques = techniques_from_recommendations(request_structured_completion(query, category))
+                else:
+                    techniques = extract_techniques_and_keywords(request_completion(query, category))
+                error = None if techniques else "no techniques extracted"
+            except Exception as e:
+                techniques, error = [], str(e)
+        gpt_span = next((span for span in trace.to_dict()["spans"] if span["name"] == "gpt"), None)
+        results.append({
+            "latency_ms": gpt_span["duration_ms"] if gpt_span else None,
+            "prompt_tokens": gpt_span["attributes"].get("prompt_tokens") if gpt_span else None,
+            "completion_tokens": gpt_span["attributes"].get("completion_tokens") if gpt_span else None,
+            "techniques": len(techniques),
+            "error": error,
+        })
+    return results
+
+
+def summarize(results):
+    def values(key):
+        return sorted(result[key] for result in results if result[key] is not None)
+
+    latencies = values("latency_ms")
+    return {
+        "n": len(results),
+        "prompt_tokens": statistics.mean(values("prompt_tokens") or [0]),
+        "completion_tokens": statistics.mean(values("completion_tokens") or [0]),
+        "p50_ms": percentile(latencies, 0.5) if latencies else 0.0,
+        "p95_ms": percentile(latencies, 0.95) if latencies else 0.0,
+        "techniques": statistics.mean(result["techniques"] for result in results),
+        "failures": sum(result["error"] is not None for result in results),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare completion tokens, latency and parse failures of the markdown and JSON output formats.")
+    parser.add_argument("--queries", type=int, default=20, help="Number of (query, category) pairs per format")
+    parser.add_argument("--live", action="store_true", help="Call the real OpenAI API (uses OPENAI_API_KEY) instead of the stand-in")
+    add_standin_arguments(parser)
+    parser.set_defaults(seed=42, openai_latency=0.5, openai_token_latency=0.02)
+    args = parser.parse_args()
+
+    server = None
+    if not args.live:
+        server = start_standin_server(**standin_kwargs(args))
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "standin")
+    os.environ.setdefault("YOUTUBE_API_KEY", "standin")
+
+    query_pairs = load_query_pairs(args.corpus, args.queries, args.seed)
+    try:
+        summaries = {output_format: summarize(measure(output_format, query_pairs)) for output_format in ("markdown", "json")}
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    print(f"{len(query_pairs)} queries against {'the OpenAI API' if args.live else 'the stand-in server'}\n")
+    print(f"{'format':<10} {'prompt tok':>10} {'compl tok':>10} {'p50 ms':>9} {'p95 ms':>9} {'techniques':>10} {'failures':>9}")
+    for output_format, summary in summaries.items():
+        print(
+            f"{output_format:<10} {summary['prompt_tokens']:>10.0f} {summary['completion_tokens']:>10.0f} "
+            f"{summary['p50_ms']:>9.0f} {summary['p95_ms']:>9.0f} {summary['techniques']:>10.1f} {summary['failures']:>9}"
+        )
+    markdown, structured = summaries["markdown"], summaries["json"]
+    if markdown["completion_tokens"] and markdown["p50_ms"]:
+        print(
+            f"\nJSON mode: {1 - structured['completion_tokens'] / markdown['completion_tokens']:.0%} fewer completion tokens, "
+            f"{1 - structured['p50_ms'] / markdown['p50_ms']:.0%} lower p50 latency."
+        )
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# mindy.config reads the cache directory at import, so point it at a scratch
+# directory before any mindy module is imported; removed again on exit
+CACHE_DIR = tempfile.mkdtemp(prefix="mindy-bench-")
+os.environ["MINDY_CACHE_DIR"] = CACHE_DIR
+
+# Make the shared mindy package and the simulator's app_logic importable
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, "simulate queries"))
+from bench_utils import isolate_environment, load_query_pairs
+from mindy.standins import add_standin_arguments, standin_kwargs, start_standin_server
+from mindy.stats import percentile
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "pipeline.jsonl")
+STAGES = ["prompt", "gpt", "extract", "fetch", "rank", "pipeline"]
+
+
+def timed(timings, stage, fn, *args, **kwargs):
+    started_at = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings[stage].append((time.perf_counter() - started_at) * 1000)
+    return result
+
+
+def run_benchmark(query_pairs, max_results):
+    import app_logic
+    from mindy.prompts import build_gpt_prompt, build_messages
+
+    app_logic.get_ranker()  # Load the ranking model before timing
+    timings = {stage: [] for stage in STAGES}
+    errors = {stage: 0 for stage in STAGES}
+    for query, category in query_pairs:
+        started_at = time.perf_counter()
+        try:
+            timed(timings, "prompt", lambda: build_messages(build_gpt_prompt(query, category)))
+            gpt_recommendations = timed(
+                timings, "gpt", app_logic.request_gpt_recommendations, query, category, bypass_cache=True
+            )
+            techniques = timed(timings, "extract", app_logic.extract_techniques_and_keywords, gpt_recommendations)
+        except Exception:
+            errors["gpt"] += 1
+            continue
+
+        for technique_data in techniques:
+            enriched_query = " ".join([technique_data["technique"]] + technique_data["keywords"])
+            try:
+                videos = timed(
+                    timings, "fetch", app_logic.search_youtube_videos, enriched_query, max_results=max_results,
+                    order="relevance", video_duration="medium", video_definition="high",
+                )
+            except Exception:
+                errors["fetch"] += 1
+                continue
+            timed(timings, "rank", app_logic.rank_videos_by_query, enriched_query, videos)
+        timings["pipeline"].append((time.perf_counter() - started_at) * 1000)
+    return timings, errors
+
+
+def summarize(samples):
+    if not samples:
+        return {"n": 0}
+    return {
+        "n": len(samples),
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": percentile(samples, 0.5),
+        "p95_ms": percentile(samples, 0.95),
+    }
+
+
+def current_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=ROOT_DIR).returncode != 0
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# Most recent stored run with the same settings from a different commit
+def load_baseline(settings, commit):
+    if not os.path.exists(RESULTS_PATH):
+        return None
+    baseline = None
+    with open(RESULTS_PATH, encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if record["settings"] == settings and record["commit"] != commit:
+                baseline = record
+    return baseline
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each pipeline stage against local stand-ins for OpenAI and YouTube.")
+    parser.add_argument("--queries", type=int, default=20, help="Number of (query, category) pairs to run")
+    parser.add_argument("--max-results", type=int, default=5, help="Videos fetched per technique")
+    parser.add_argument("--no-save", action="store_true", help=f"Do not append the results to {RESULTS_PATH}")
+    add_standin_arguments(parser)
+    parser.set_defaults(seed=42)
+    args = parser.parse_args()
+
+    server = start_standin_server(**standin_kwargs(args))
+    try:
+        isolate_environment(server.url, CACHE_DIR)
+        timings, errors = run_benchmark(load_query_pairs(args.corpus, args.queries, args.seed), args.max_results)
+    finally:
+        server.shutdown()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    settings = {
+        key: getattr(args, key)
+        for key in ("queries", "max_results", "openai_latency", "openai_token_latency", "youtube_latency",
+                    "latency_sigma", "openai_error_rate", "youtube_error_rate", "seed")
+    }
+    commit = current_commit()
+    record = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": settings,
+        "stages": {stage: summarize(timings[stage]) for stage in STAGES},
+        "errors": errors,
+    }
+    baseline = load_baseline(settings, commit)
+
+    print(f"{'stage':<10} {'n':>5} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}" + (f" {'p50 vs ' + baseline['commit']:>20}" if baseline else ""))
+    for stage, stats in record["stages"].items():
+        if not stats["n"]:
+            print(f"{stage:<10} {0:>5}")
+            continue
+        line = f"{stage:<10} {stats['n']:>5} {stats['mean_ms']:>10.2f} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f}"
+        previous = baseline["stages"].get(stage, {}) if baseline else {}
+        if previous.get("p50_ms"):
+            line += f" {(stats['p50_ms'] / previous['p50_ms'] - 1):>+20.1%}"
+        print(line)
+    if any(errors.values()):
+        print(f"Errors: {errors}")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+        print(f"Saved results for {commit} to {RESULTS_PATH}.")
@@ -0,0 +1,76 @@
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import time
+
+# Make the shared mindy package importable when running from this directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from mindy.ranking import CORPUS_PATH, get_ranking_engine
+from mindy.stats import percentile
+
+
+# Each logged technique becomes a "video" (title = technique, description = its
+# description). The query is the technique's keywords, as built by the simulator,
+# and the ranker has to pick that technique out of randomly drawn distractors.
+def load_cases(csv_path, n_queries, n_candidates, seed):
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        rows = [row for row in csv.DictReader(file) if row["Technique"] and row["Keywords"]]
+    documents = [
+        {"title": row["Technique"], "description": row["Description"] or "", "video_id": str(position), "link": ""}
+        for position, row in enumerate(rows)
+    ]
+
+    rng = random.Random(seed)
+    cases = []
+    for position in rng.sample(range(len(rows)), min(n_queries, len(rows))):
+        distractors = rng.sample([document for document in documents if document["title"] != rows[position]["Technique"]], n_candidates - 1)
+        candidates = distractors + [documents[position]]
+        rng.shuffle(candidates)
+        cases.append((rows[position]["Keywords"], candidates, documents[position]["video_id"]))
+    return cases
+
+
+def evaluate(ranker, cases):
+    latencies, reciprocal_ranks = [], []
+    for query, candidates, relevant_id in cases:
+        start = time.perf_counter()
+        ranked = ranker.rank(query, candidates)
+        latencies.append((time.perf_counter() - start) * 1000)
+        rank = next(position for position, video in enumerate(ranked, start=1) if video["video_id"] == relevant_id)
+        reciprocal_ranks.append(1 / rank)
+
+    return {
+        "mrr": statistics.mean(reciprocal_ranks),
+        "top1": sum(rr == 1 for rr in reciprocal_ranks) / len(reciprocal_ranks),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+    }
+
+
+def load_ranker(backend):
+    if backend == "semantic":
+        from mindy.semantic import get_semantic_ranker
+        return get_semantic_ranker()
+    return get_ranking_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare latency and quality of the TF-IDF and semantic rankers.")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="Simulation results CSV to draw cases from")
+    parser.add_argument("--queries", type=int, default=200, help="Number of ranking cases")
+    parser.add_argument("--candidates", type=int, default=10, help="Videos to rank per case")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", nargs="+", default=["tfidf", "semantic"], choices=["tfidf", "semantic"])
+    args = parser.parse_args()
+
+    cases = load_cases(args.corpus, args.queries, args.candidates, args.seed)
+    print(f"{len(cases)} cases, {args.candidates} candidates each\n")
+    print(f"{'backend':<10} {'MRR':>6} {'top-1':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for backend in args.backends:
+        ranker = load_ranker(backend)
+        ranker.rank(cases[0][0], cases[0][1])  # Warm up: load models before timing
+        result = evaluate(ranker, cases)
+        print(f"{backend:<10} {result['mrr']:6.3f} {result['top1']:6.1%} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f}")
@@ -0,0 +1,81 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+from collections import defaultdict
+
+# A fresh cache and quota ledger; mindy.config reads the directory at import
+os.environ["MINDY_CACHE_DIR"] = tempfile.mkdtemp()
+
+# Make the shared mindy package importable when running from this directory
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+from mindy.standins import add_standin_arguments, standin_kwargs, start_standin_server
+
+
+# Keyword sets of the technique searches per logged query
+def load_sessions(csv_path, n_queries):
+    sessions = defaultdict(list)
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            key = (row["Query"], row["Category"])
+            if key in sessions or len(sessions) < n_queries:
+                sessions[key].append(sorted(set(row["Keywords"].split())))
+    return list(sessions.values())
+
+
+# The app joins a set of keywords, whose order depends on the process's string
+# hash seed; each restart is modeled with its own random order
+def enriched_queries(keyword_sets, restart):
+    rng = random.Random(restart)
+    return [" ".join(rng.sample(keywords, len(keywords))) for keywords in keyword_sets]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the YouTube quota spent by plain and scheduled searches on logged techniques.")
+    parser.add_argument("--queries", type=int, default=200, help="Logged queries to replay as sessions")
+    parser.add_argument("--restarts", type=int, default=2, help="App processes replaying every session, sharing one cache")
+    parser.add_argument("--max-results", type=int, default=10)
+    add_standin_arguments(parser)
+    parser.set_defaults(openai_latency=0.0, youtube_latency=0.0)
+    args = parser.parse_args()
+
+    server = start_standin_server(**standin_kwargs(args))
+    os.environ.update({
+        "MINDY_YOUTUBE_API_ENDPOINT": f"{server.url}/",
+        "MINDY_LOCAL_INDEX": "0",
+        "MINDY_YOUTUBE_DAILY_QUOTA": str(10 ** 9),
+    })
+    from mindy.ranking import get_ranker
+    from mindy.search_scheduler import get_search_scheduler
+    from mindy.youtube import SEARCH_LIST_COST, build_youtube_client, enrich_videos, get_quota_ledger
+
+    sessions = load_sessions(args.corpus, args.queries)
+    youtube = build_youtube_client("standin")
+    scheduler = get_search_scheduler()
+    searches = 0
+    enriched = 0
+    plain_queries = set()
+    for restart in range(args.restarts):
+        for keyword_sets in sessions:
+            queries = enriched_queries(keyword_sets, restart)
+            plain_queries.update(queries)
+            params = [{"q": query, "part": "snippet", "type": "video", "maxResults": args.max_results,
+                       "order": "relevance", "videoDuration": "medium", "videoDefinition": "high"} for query in queries]
+            video_lists = enrich_videos(youtube, [scheduler.search(youtube, request_params) for request_params in params])
+            enriched += sum(1 for videos in video_lists for video in videos if "view_count" in video)
+            get_ranker().rank_many(queries, video_lists, dedupe=True)
+            searches += len(queries)
+    server.shutdown()
+
+    # Without the scheduler a search is only served from the cache when the exact string was searched before
+    plain_units = SEARCH_LIST_COST * len(plain_queries)
+    usage = get_quota_ledger().usage()
+    scheduled_units = sum(usage.values())
+    print(f"{searches} technique searches from {len(sessions)} sessions, replayed by {args.restarts} app processes")
+    print(f"  plain:     {plain_units:>8} units (one search.list per distinct query string)")
+    print(f"  scheduled: {scheduled_units:>8} units ({scheduled_units / plain_units:.0%}), by endpoint {usage}")
+    print(f"  upstream calls {dict(server.calls)}; scheduler {scheduler.stats()}")
+    print(f"  {enriched} ranked videos carried view counts and durations")
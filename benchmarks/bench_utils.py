@@ -0,0 +1,27 @@
+import csv
+import os
+import random
+
+
+# Route every API call to the stand-in server and switch off the caches, so each
+# stage does its full amount of work. Must run before app_logic is imported or
+# the service is started; in-process benchmarks also set MINDY_CACHE_DIR before
+# their first mindy import, since mindy.config reads it at import.
+def isolate_environment(server_url, cache_dir):
+    os.environ["OPENAI_BASE_URL"] = f"{server_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "standin"
+    os.environ["YOUTUBE_API_KEY"] = "standin"
+    os.environ["MINDY_YOUTUBE_API_ENDPOINT"] = f"{server_url}/"
+    os.environ["MINDY_CACHE_DIR"] = cache_dir
+    os.environ["MINDY_GPT_CACHE"] = "0"
+    os.environ["MINDY_YOUTUBE_CACHE"] = "0"
+    os.environ["MINDY_LOCAL_INDEX"] = "0"
+    os.environ["MINDY_SEMANTIC_CACHE"] = "0"
+    os.environ["MINDY_YOUTUBE_DAILY_QUOTA"] = str(10 ** 9)
+
+
+# A seeded sample of the distinct (query, category) pairs in the corpus
+def load_query_pairs(csv_path, n_queries, seed):
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        pairs = sorted({(row["Query"], row["Category"]) for row in csv.DictReader(file)})
+    return random.Random(seed).sample(pairs, min(n_queries, len(pairs)))
@@ -0,0 +1,285 @@
+import argparse
+import asyncio
+import csv
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Make the shared mindy package importable when running from this directory
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+from mindy.stats import percentile
+
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+QUERY_LABEL = "Enter your query:"
+GENERATE_LABEL = "Generate Recommendations"
+POOL_WAIT_METRIC = "mindy_pool_wait_seconds"
+FETCH_POOL = "mindy-fetch"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Distinct logged queries, so every generate misses the GPT cache like a new user's would
+def load_queries(csv_path):
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        return list(dict.fromkeys(row["Query"] for row in csv.DictReader(file) if row["Query"]))
+
+
+# Resident memory (MiB) and thread count of a process, from /proc (Linux only)
+def process_status(pid):
+    status = {}
+    with open(f"/proc/{pid}/status", encoding="utf-8") as file:
+        for line in file:
+            key, _, value = line.partition(":")
+            status[key] = value.split()
+    return int(status["VmRSS"][0]) / 1024, int(status["Threads"][0])
+
+
+# Count, sum and the count within the `within` bucket of the pool-wait
+# histogram on the app's /metrics endpoint
+def scrape_pool_wait(metrics_url, pool=FETCH_POOL, within="0.01"):
+    try:
+        with urllib.request.urlopen(metrics_url, timeout=5) as response:
+            text = response.read().decode("utf-8")
+    except OSError:
+        return {"count": 0, "sum": 0.0, "within": 0}
+    labels = f'pool="{pool}"'
+    values = {}
+    for suffix, extra in (("count", ""), ("sum", ""), ("within", f',le="{within}"')):
+        name = f"{POOL_WAIT_METRIC}_bucket" if suffix == "within" else f"{POOL_WAIT_METRIC}_{suffix}"
+        match = re.search(rf"^{name}\{{{re.escape(labels + extra)}\}} (\S+)$", text, re.MULTILINE)
+        values[suffix] = float(match.group(1)) if match else 0.0
+    return values
+
+
+# One browser tab, speaking Streamlit's websocket protocol: every rerun sends
+# the widget values and waits for the script run to finish
+class Session:
+    def __init__(self, url):
+        self.url = url
+        self.widget_ids = {}
+
+    async def __aenter__(self):
+        from websockets.asyncio.client import connect
+
+        self.websocket = await connect(self.url, subprotocols=["streamlit"], max_size=None, open_timeout=60)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.websocket.close()
+
+    # Rerun with the given widget values; returns (seconds, succeeded). A run
+    # succeeds when it finishes without an exception or error alert and, when
+    # expect_success is set, shows the success message.
+    async def rerun(self, query=None, generate=False, expect_success=False):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.SetInParent()
+        widgets = message.rerun_script.widget_states.widgets
+        if query is not None:
+            widgets.add(id=self.widget_ids[QUERY_LABEL], string_value=query)
+        if generate:
+            widgets.add(id=self.widget_ids[GENERATE_LABEL], trigger_value=True)
+
+        started_at = time.perf_counter()
+        await self.websocket.send(message.SerializeToString())
+        failed, succeeded = False, False
+        while True:
+            forward_msg = ForwardMsg.FromString(await self.websocket.recv())
+            kind = forward_msg.WhichOneof("type")
+            if kind == "script_finished":
+                ok = forward_msg.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY and not failed
+                return time.perf_counter() - started_at, ok and (succeeded or not expect_success)
+            if kind != "delta" or forward_msg.delta.WhichOneof("type") != "new_element":
+                continue
+            element = forward_msg.delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type in ("text_input", "button"):
+                widget = getattr(element, element_type)
+                self.widget_ids[widget.label] = widget.id
+            elif element_type == "exception":
+                failed = True
+            elif element_type == "alert":
+                failed |= element.alert.format == element.alert.ERROR
+                succeeded |= element.alert.format == element.alert.SUCCESS
+
+
+# One simulated user: open the page, then for each query type it, click
+# Generate (GPT answer plus the video tab's fetch and ranking, which run in the
+# same script run since tabs are client-side), then rerun once more as any
+# interaction on the video tab does, which serves the memoized videos
+async def user_flow(url, queries, samples, ready, release):
+    async with Session(url) as session:
+        duration, ok = await session.rerun()
+        samples.append(("page load", duration, ok))
+        for query in queries:
+            duration, ok = await session.rerun(query, generate=True, expect_success=True)
+            samples.append(("generate", duration, ok))
+            duration, ok = await session.rerun(query)
+            samples.append(("video tab rerun", duration, ok))
+        # Stay connected until every session is done, so memory is sampled
+        # with all of them open
+        ready.release()
+        await release.wait()
+
+
+async def sample_process(pid, peaks, stop):
+    while not stop.is_set():
+        rss_mb, threads = process_status(pid)
+        peaks["rss_mb"] = max(peaks.get("rss_mb", 0), rss_mb)
+        peaks["threads"] = max(peaks.get("threads", 0), threads)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(url, pid, sessions, query_batches):
+    samples, peaks = [], {}
+    ready, release, stop = asyncio.Semaphore(0), asyncio.Event(), asyncio.Event()
+    rss_before, _ = process_status(pid)
+    sampler = asyncio.create_task(sample_process(pid, peaks, stop))
+    started_at = time.perf_counter()
+    users = [asyncio.create_task(user_flow(url, batch, samples, ready, release)) for batch in query_batches]
+    for _ in users:
+        await ready.acquire()
+    elapsed = time.perf_counter() - started_at
+    rss_connected, _ = process_status(pid)
+    release.set()
+    await asyncio.gather(*users)
+    stop.set()
+    await sampler
+    return {
+        "sessions": sessions,
+        "elapsed": elapsed,
+        "samples": samples,
+        "rss_before": rss_before,
+        "rss_connected": rss_connected,
+        **peaks,
+    }
+
+
+def wait_until_healthy(base_url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("streamlit exited before it was ready")
+        try:
+            with urllib.request.urlopen(f"{base_url}/_stcore/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("streamlit did not become healthy in time")
+
+
+def report(level, pool_wait, fetch_workers):
+    samples = level["samples"]
+    generates = [sample for sample in samples if sample[0] == "generate"]
+    failed = sum(1 for sample in samples if not sample[2])
+    print(f"{level['sessions']} concurrent sessions: {len(generates)} flows in {level['elapsed']:.1f} s, "
+          f"{len(generates) / level['elapsed']:.2f} flows/s, {failed} failed reruns")
+    for kind in ("page load", "generate", "video tab rerun"):
+        durations = [duration for sample_kind, duration, _ in samples if sample_kind == kind]
+        print(f"  {kind:<16} p50 {percentile(durations, 0.5):6.2f} s   p95 {percentile(durations, 0.95):6.2f} s   "
+              f"p99 {percentile(durations, 0.99):6.2f} s   (n={len(durations)})")
+    waits = pool_wait["count"]
+    if waits:
+        print(f"  fetch pool ({fetch_workers} workers): {waits:.0f} tasks, mean wait {pool_wait['sum'] / waits * 1000:.0f} ms, "
+              f"{1 - pool_wait['within'] / waits:.0%} waited over 10 ms")
+    per_session = (level["rss_connected"] - level["rss_before"]) / level["sessions"]
+    print(f"  server: peak RSS {level['rss_mb']:.0f} MiB, peak threads {level['threads']}, "
+          f"~{per_session:.1f} MiB per connected session")
+
+
+async def load_test(args, base_url, pid, metrics_url):
+    url = base_url.replace("http://", "ws://") + "/_stcore/stream"
+    queries = load_queries(args.corpus)
+    next_query = 1
+
+    # One throwaway flow pays for the app's first runs (imports, models), so
+    # neither the first level's latency nor its memory includes them
+    async with Session(url) as session:
+        await session.rerun()
+        await session.rerun(queries[0], generate=True)
+
+    baseline_p95 = None
+    capacity = 0
+    for sessions in args.levels:
+        batches = []
+        for _ in range(sessions):
+            batches.append([queries[(next_query + offset) % len(queries)] for offset in range(args.flows)])
+            next_query += args.flows
+        before = scrape_pool_wait(metrics_url)
+        level = await run_level(url, pid, sessions, batches)
+        after = scrape_pool_wait(metrics_url)
+        report(level, {key: after[key] - before[key] for key in after}, args.fetch_workers)
+
+        generate_p95 = percentile([duration for kind, duration, _ in level["samples"] if kind == "generate"], 0.95)
+        failures = sum(1 for sample in level["samples"] if not sample[2])
+        baseline_p95 = baseline_p95 or generate_p95
+        if failures or generate_p95 > args.max_slowdown * baseline_p95:
+            break
+        capacity = sessions
+
+    print(f"Capacity: {capacity} concurrent sessions per server process keep generate p95 within "
+          f"{args.max_slowdown:g}x of a single session's, with no failed reruns.")
+
+
+if __name__ == "__main__":
+    from mindy.standins import add_standin_arguments
+
+    parser = argparse.ArgumentParser(description="Drive concurrent sessions through the Streamlit app and report its capacity.")
+    parser.add_argument("--levels", type=lambda value: [int(level) for level in value.split(",")], default=[1, 2, 4, 8, 16, 32],
+                        help="Comma-separated numbers of concurrent sessions, run in order")
+    parser.add_argument("--flows", type=int, default=2, help="Queries each session generates per level")
+    parser.add_argument("--max-slowdown", type=float, default=2.0,
+                        help="Stop once generate p95 exceeds this multiple of the first level's")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Size of the app's fetch pool (MINDY_FETCH_WORKERS)")
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A fresh cache, GPT and search caches included, for the app process
+        os.environ["MINDY_CACHE_DIR"] = cache_dir
+        from mindy.standins import standin_kwargs, start_standin_server
+
+        server = start_standin_server(**standin_kwargs(args))
+        port, metrics_port = free_port(), free_port()
+        env = {
+            **os.environ,
+            "OPENAI_BASE_URL": f"{server.url}/v1",
+            "MINDY_YOUTUBE_API_ENDPOINT": f"{server.url}/",
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "standin"),
+            "YOUTUBE_API_KEY": os.getenv("YOUTUBE_API_KEY", "standin"),
+            # Every search goes to the stand-in, as on a deployment without a local index
+            "MINDY_LOCAL_INDEX": "0",
+            "MINDY_YOUTUBE_DAILY_QUOTA": str(10 ** 9),
+            "MINDY_FETCH_WORKERS": str(args.fetch_workers),
+            "MINDY_TELEMETRY": "1",
+            "MINDY_METRICS_PORT": str(metrics_port),
+        }
+        process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless", "true",
+             "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_healthy(base_url, process)
+            asyncio.run(load_test(args, base_url, process.pid, f"http://127.0.0.1:{metrics_port}/metrics"))
+            print(f"Upstream calls: {dict(server.calls)}")
+        finally:
+            process.terminate()
+            process.wait()
+            server.shutdown()
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+# Make the shared mindy package importable when running from this directory
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+from bench_utils import isolate_environment, load_query_pairs
+from mindy.standins import add_standin_arguments, standin_kwargs, start_standin_server
+from mindy.stats import percentile
+
+
+# Run the API service in a subprocess, so it reads the stand-in environment at import
+def start_service(port, workers):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mindy.service", "--port", str(port), "--workers", str(workers)],
+        cwd=ROOT_DIR,
+        env=os.environ.copy(),
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/healthz", timeout=1.0).status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Service did not start within 60s")
+
+
+# Closed loop: each user sends its next request as soon as the previous one is
+# answered. Queries are drawn from a small pool, so identical requests overlap.
+async def run_load(url, endpoint, pairs, n_requests, concurrency, seed):
+    rng = random.Random(seed)
+    schedule = [rng.choice(pairs) for _ in range(n_requests)]
+    latencies, statuses = [], Counter()
+
+    async def user(client):
+        while schedule:
+            query, category = schedule.pop()
+            started_at = time.perf_counter()
+            try:
+                response = await client.post(f"{url}{endpoint}", json={"query": query, "category": category})
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started_at)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120.0)) as client:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_at
+    return latencies, statuses, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the recommendation API against local stand-ins for OpenAI and YouTube.")
+    parser.add_argument("--requests", type=int, default=500, help="Requests to send in total")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("--distinct", type=int, default=100, help="Distinct (query, category) pairs the requests draw from")
+    parser.add_argument("--endpoint", default="/pipeline", choices=["/pipeline", "/recommendations"])
+    parser.add_argument("--workers", type=int, default=1, help="Service worker processes")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--cache", action="store_true", help="Keep the response caches on (off by default, so every request reaches the stand-ins)")
+    add_standin_arguments(parser)
+    parser.set_defaults(seed=42, openai_latency=1.0, youtube_latency=0.2)
+    args = parser.parse_args()
+
+    server = start_standin_server(**standin_kwargs(args))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        isolate_environment(server.url, cache_dir)
+        if args.cache:
+            for name in ("MINDY_GPT_CACHE", "MINDY_YOUTUBE_CACHE"):
+                os.environ[name] = "1"
+        process, url = start_service(args.port, args.workers)
+        try:
+            pairs = load_query_pairs(args.corpus, args.distinct, args.seed)
+            latencies, statuses, elapsed = asyncio.run(
+                run_load(url, args.endpoint, pairs, args.requests, args.concurrency, args.seed)
+            )
+            stats = httpx.get(f"{url}/healthz").json()
+        finally:
+            process.terminate()
+            process.wait()
+    server.shutdown()
+
+    print(f"{args.requests} requests to {args.endpoint}, {args.concurrency} concurrent users, {len(pairs)} distinct queries")
+    print(f"  throughput      {len(latencies) / elapsed:8.1f} req/s over {elapsed:.1f} s")
+    if latencies:
+        p50, p95, p99 = (percentile(latencies, fraction) * 1000 for fraction in (0.5, 0.95, 0.99))
+        print(f"  latency ms      p50 {p50:.0f}  p95 {p95:.0f}  p99 {p99:.0f}  max {max(latencies) * 1000:.0f}")
+    print(f"  responses       {dict(sorted(statuses.items(), key=str))}")
+    print(f"  upstream calls  {dict(server.calls)}")
+    for name, counts in stats["coalescing"].items():
+        print(f"  {name:<15} {counts['started']} calls started, {counts['coalesced']} coalesced")
+    if stats["rejected"]:
+        print(f"  shed            {stats['rejected']} requests rejected with 503 by the worker answering /healthz")
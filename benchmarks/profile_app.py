@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Make the shared mindy package importable when running from this directory
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(ROOT_DIR)
+from mindy.stats import percentile
+
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+SAMPLE_QUERY = "How to cultivate a sense of mindfulness in daily routines"
+
+
+def timed_run(app_test):
+    started_at = time.perf_counter()
+    app_test.run()
+    return (time.perf_counter() - started_at) * 1000
+
+
+# Runs in a fresh interpreter: time the first script run, which pays for every
+# import and resource the app builds on startup
+def cold_start():
+    from streamlit.testing.v1 import AppTest
+
+    app_test = AppTest.from_file(APP_PATH, default_timeout=120)
+    print(json.dumps({"first_run_ms": timed_run(app_test)}))
+
+
+def describe(samples):
+    return f"p50 {percentile(samples, 0.5):8.1f} ms   p95 {percentile(samples, 0.95):8.1f} ms   (n={len(samples)})"
+
+
+def profile(cold_runs, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    print(f"Cold start ({cold_runs} fresh interpreters):")
+    process_ms, first_run_ms = [], []
+    for _ in range(cold_runs):
+        started_at = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--cold-child"], capture_output=True, text=True, check=True
+        ).stdout
+        process_ms.append((time.perf_counter() - started_at) * 1000)
+        first_run_ms.append(json.loads(output.strip().splitlines()[-1])["first_run_ms"])
+    print(f"  process start to first render   {describe(process_ms)}")
+    print(f"  first script run                {describe(first_run_ms)}")
+
+    app_test = AppTest.from_file(APP_PATH, default_timeout=120)
+    app_test.run()
+    print("Warm reruns:")
+    print(f"  idle rerun                      {describe([timed_run(app_test) for _ in range(reruns)])}")
+
+    app_test.text_input[0].input(SAMPLE_QUERY)
+    app_test.button[0].click()
+    print(f"  generate recommendations        {timed_run(app_test):8.1f} ms")
+    print(f"  rerun, video results memoized   {describe([timed_run(app_test) for _ in range(reruns)])}")
+
+    unmemoized = []
+    for _ in range(reruns):
+        app_test.session_state["video_results"] = None
+        unmemoized.append(timed_run(app_test))
+    print(f"  rerun, video results recomputed {describe(unmemoized)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report cold-start and warm-rerun times of the Streamlit app.")
+    parser.add_argument("--cold-runs", type=int, default=3, help="Fresh interpreters to time the first run in")
+    parser.add_argument("--reruns", type=int, default=10, help="Warm reruns to time per scenario")
+    parser.add_argument("--cold-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_child:
+        cold_start()
+        sys.exit(0)
+
+    # Serve the APIs locally so timings do not depend on the network; the
+    # cold-start children inherit these settings
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["MINDY_CACHE_DIR"] = cache_dir
+        from mindy.standins import LatencyModel, start_standin_server
+
+        server = start_standin_server(openai_latency=LatencyModel(0.2), youtube_latency=LatencyModel(0.05), seed=0)
+        os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+        os.environ["MINDY_YOUTUBE_API_ENDPOINT"] = f"{server.url}/"
+        os.environ.setdefault("OPENAI_API_KEY", "standin")
+        os.environ.setdefault("YOUTUBE_API_KEY", "standin")
+        profile(args.cold_runs, args.reruns)
+        server.shutdown()
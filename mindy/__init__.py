@@ -0,0 +1,2 @@
+# Shared building blocks for the Streamlit app (app.py) and the query simulator
+# (simulate queries/app_logic.py).
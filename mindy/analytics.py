@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import time
+
+import duckdb
+
+from mindy.config import cache_path
+from mindy.results import RESULTS_DIR, RUN_ID_COLUMN
+
+
+# The EDA notebook metrics, kept as per-run aggregates in an embedded DuckDB
+# database. A refresh only aggregates runs that are new or whose Parquet files
+# changed since the last refresh (dropping the old aggregates of changed or
+# deleted runs first), so its cost follows the new rows, not the history.
+# Reports then read the small aggregate tables instead of the raw results.
+ANALYTICS_DB_PATH = os.getenv("MINDY_ANALYTICS_DB")
+
+DESCRIPTION_CHARS_BUCKET = 25  # Width of the description length histogram bins
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_runs (run_id VARCHAR PRIMARY KEY, signature VARCHAR, rows BIGINT, ingested_at DOUBLE);
+CREATE TABLE IF NOT EXISTS category_totals (
+    run_id VARCHAR, category VARCHAR, rows BIGINT, description_chars BIGINT, keyword_words BIGINT
+);
+CREATE TABLE IF NOT EXISTS value_counts (run_id VARCHAR, kind VARCHAR, category VARCHAR, value VARCHAR, n BIGINT);
+CREATE TABLE IF NOT EXISTS length_histograms (run_id VARCHAR, measure VARCHAR, category VARCHAR, length BIGINT, n BIGINT);
+"""
+
+# Aggregates of one run, computed from the staged rows of its files. Values are
+# counted per category (empty values are skipped, like NaN in pandas);
+# descriptions are stored as hashes.
+RUN_AGGREGATES = [
+    """
+    INSERT INTO category_totals
+    SELECT $run_id, category, count(*), sum(description_chars), sum(keyword_words)
+    FROM staged GROUP BY category
+    """,
+    """
+    INSERT INTO value_counts
+    SELECT $run_id, 'query', category, query, count(*) FROM staged WHERE query <> '' GROUP BY category, query
+    UNION ALL
+    SELECT $run_id, 'technique', category, technique, count(*) FROM staged WHERE technique <> '' GROUP BY category, technique
+    UNION ALL
+    SELECT $run_id, 'description', category, md5(description), count(*) FROM staged WHERE description <> '' GROUP BY category, md5(description)
+    UNION ALL
+    SELECT $run_id, 'keyword', category, keyword, count(*)
+    FROM (SELECT category, unnest(keywords) AS keyword FROM staged)
+    WHERE keyword <> '' GROUP BY category, keyword
+    """,
+    f"""
+    INSERT INTO length_histograms
+    SELECT $run_id, 'description_chars', category, description_chars // {DESCRIPTION_CHARS_BUCKET} * {DESCRIPTION_CHARS_BUCKET}, count(*)
+    FROM staged GROUP BY ALL
+    UNION ALL
+    SELECT $run_id, 'description_words', category, description_words, count(*) FROM staged GROUP BY ALL
+    UNION ALL
+    SELECT $run_id, 'keyword_words', category, keyword_words, count(*) FROM staged GROUP BY ALL
+    """,
+]
+
+AGGREGATE_TABLES = ["category_totals", "value_counts", "length_histograms", "ingested_runs"]
+
+
+def sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+# {run_id: [parquet paths]} for the runs currently in the result store
+def store_runs(store_dir=RESULTS_DIR):
+    runs = {}
+    if not os.path.isdir(store_dir):
+        return runs
+    prefix = f"{RUN_ID_COLUMN}="
+    for name in sorted(os.listdir(store_dir)):
+        partition_dir = os.path.join(store_dir, name)
+        if not name.startswith(prefix) or not os.path.isdir(partition_dir):
+            continue
+        files = sorted(
+            os.path.join(partition_dir, file_name)
+            for file_name in os.listdir(partition_dir)
+            if file_name.endswith(".parquet")
+        )
+        if files:
+            runs[name[len(prefix):]] = files
+    return runs
+
+
+# Changes whenever a file of the run is added, removed or rewritten
+def run_signature(files):
+    return json.dumps([
+        [os.path.basename(path), os.stat(path).st_size, os.stat(path).st_mtime_ns] for path in files
+    ])
+
+
+class AnalyticsEngine:
+    def __init__(self, db_path=None, store_dir=RESULTS_DIR):
+        self.db_path = db_path or ANALYTICS_DB_PATH or cache_path("analytics.duckdb")
+        self.store_dir = store_dir
+        self.conn = duckdb.connect(self.db_path)
+        self.conn.execute(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _drop_run(self, run_id):
+        for table in AGGREGATE_TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE run_id = ?", [run_id])
+
+    def _ingest_run(self, run_id, files, signature):
+        file_list = "[" + ", ".join(sql_string(path) for path in files) + "]"
+        self.conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE staged AS
+            SELECT
+                coalesce("Category", '') AS category,
+                "Query" AS query,
+                "Technique" AS technique,
+                "Description" AS description,
+                coalesce(length("Description"), 0) AS description_chars,
+                CASE WHEN trim(coalesce("Description", '')) = '' THEN 0
+                     ELSE len(regexp_split_to_array(trim("Description"), '\\s+')) END AS description_words,
+                CASE WHEN trim(coalesce("Keywords", '')) = '' THEN []
+                     ELSE regexp_split_to_array(trim("Keywords"), '\\s+') END AS keywords,
+                CASE WHEN trim(coalesce("Keywords", '')) = '' THEN 0
+                     ELSE len(regexp_split_to_array(trim("Keywords"), '\\s+')) END AS keyword_words
+            FROM read_parquet({file_list})
+        """)
+        for statement in RUN_AGGREGATES:
+            self.conn.execute(statement, {"run_id": run_id})
+        rows = self.conn.execute("SELECT count(*) FROM staged").fetchone()[0]
+        self.conn.execute("DROP TABLE staged")
+        self.conn.execute(
+            "INSERT INTO ingested_runs VALUES (?, ?, ?, ?)", [run_id, signature, rows, time.time()]
+        )
+        return rows
+
+    # Bring the aggregates up to date with the store. Each run is replaced in
+    # its own transaction, so an interrupted refresh never double counts.
+    def refresh(self, full=False):
+        started_at = time.perf_counter()
+        if full:
+            for table in AGGREGATE_TABLES:
+                self.conn.execute(f"DELETE FROM {table}")
+        ingested = dict(self.conn.execute("SELECT run_id, signature FROM ingested_runs").fetchall())
+        runs = store_runs(self.store_dir)
+        summary = {"added": 0, "updated": 0, "removed": 0, "rows": 0}
+
+        for run_id in set(ingested) - set(runs):
+            self.conn.execute("BEGIN TRANSACTION")
+            self._drop_run(run_id)
+            self.conn.execute("COMMIT")
+            summary["removed"] += 1
+
+        for run_id, files in runs.items():
+            signature = run_signature(files)
+            if ingested.get(run_id) == signature:
+                continue
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                self._drop_run(run_id)
+                summary["rows"] += self._ingest_run(run_id, files, signature)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            summary["updated" if run_id in ingested else "added"] += 1
+
+        summary["seconds"] = time.perf_counter() - started_at
+        return summary
+
+    def runs(self):
+        return self.conn.execute(
+            "SELECT run_id, rows FROM ingested_runs ORDER BY run_id"
+        ).df()
+
+    # Metrics, named after the notebook functions they replace
+
+    def basic_statistics(self):
+        totals = self.conn.execute(
+            "SELECT coalesce(sum(rows), 0), coalesce(sum(description_chars), 0), count(DISTINCT category) FROM category_totals"
+        ).fetchone()
+        unique = dict(self.conn.execute(
+            "SELECT kind, count(DISTINCT value) FROM value_counts GROUP BY kind"
+        ).fetchall())
+        return {
+            "total_rows": totals[0],
+            "unique_queries": unique.get("query", 0),
+            "unique_categories": totals[2],
+            "unique_techniques": unique.get("technique", 0),
+            "unique_keywords": unique.get("keyword", 0),
+            "average_description_length": totals[1] / totals[0] if totals[0] else 0.0,
+        }
+
+    def category_distribution(self):
+        return self.conn.execute(
+            "SELECT category AS Category, sum(rows)::BIGINT AS count FROM category_totals GROUP BY category ORDER BY count DESC"
+        ).df()
+
+    def estimate_diversity(self):
+        statistics = self.basic_statistics()
+        unique_descriptions = self.conn.execute(
+            "SELECT count(DISTINCT value) FROM value_counts WHERE kind = 'description'"
+        ).fetchone()[0]
+        total_rows = statistics["total_rows"]
+        return {
+            "unique_techniques": statistics["unique_techniques"],
+            "unique_descriptions": unique_descriptions,
+            "technique_diversity": statistics["unique_techniques"] / total_rows if total_rows else 0.0,
+            "description_diversity": unique_descriptions / total_rows if total_rows else 0.0,
+        }
+
+    # Histogram of a length measure: description_chars (binned), description_words or keyword_words
+    def length_histogram(self, measure, by_category=False):
+        group = "category, length" if by_category else "length"
+        return self.conn.execute(
+            f"SELECT {group}, sum(n)::BIGINT AS count FROM length_histograms WHERE measure = ? GROUP BY {group} ORDER BY {group}",
+            [measure],
+        ).df()
+
+    def length_analysis(self):
+        return {
+            "description_chars": self.length_histogram("description_chars"),
+            "keyword_words": self.length_histogram("keyword_words"),
+        }
+
+    def description_words_by_category(self):
+        return self.conn.execute("""
+            SELECT category AS Category, max(length) AS max_words,
+                   sum(length * n) / sum(n) AS mean_words
+            FROM length_histograms WHERE measure = 'description_words'
+            GROUP BY category ORDER BY category
+        """).df()
+
+    def unique_per_category(self, kind):
+        return self.conn.execute(
+            "SELECT category AS Category, count(DISTINCT value) AS unique_count FROM value_counts "
+            "WHERE kind = ? GROUP BY category ORDER BY category",
+            [kind],
+        ).df()
+
+    def relationship_analysis(self):
+        return self.unique_per_category("technique")
+
+    def relationship_analysis_keywords(self):
+        return self.unique_per_category("keyword")
+
+    def relationship_analysis_queries(self):
+        return self.unique_per_category("query")
+
+    # The three unique counts side by side, one row per category
+    def relationship_summary(self):
+        return self.conn.execute("""
+            SELECT category AS Category,
+                   count(DISTINCT value) FILTER (WHERE kind = 'technique') AS techniques,
+                   count(DISTINCT value) FILTER (WHERE kind = 'keyword') AS keywords,
+                   count(DISTINCT value) FILTER (WHERE kind = 'query') AS queries
+            FROM value_counts WHERE kind IN ('technique', 'keyword', 'query')
+            GROUP BY category ORDER BY category
+        """).df()
+
+    def top_values(self, kind, limit=20):
+        return self.conn.execute(
+            "SELECT value, sum(n)::BIGINT AS count FROM value_counts WHERE kind = ? GROUP BY value ORDER BY count DESC, value LIMIT ?",
+            [kind, limit],
+        ).df()
+
+
+def print_report(engine):
+    statistics = engine.basic_statistics()
+    print("--- Basic Statistics ---")
+    print(f"Total rows: {statistics['total_rows']}")
+    print(f"Unique Queries: {statistics['unique_queries']}")
+    print(f"Unique Categories: {statistics['unique_categories']}")
+    print(f"Unique Techniques: {statistics['unique_techniques']}")
+    print(f"Unique Keywords: {statistics['unique_keywords']}")
+    print(f"Average Description Length: {statistics['average_description_length']:.2f} characters")
+
+    print("\n--- Category Distribution ---")
+    print(engine.category_distribution().to_string(index=False))
+
+    diversity = engine.estimate_diversity()
+    print("\n--- Diversity of Recommendations ---")
+    print(f"Unique Techniques: {diversity['unique_techniques']}")
+    print(f"Unique Descriptions: {diversity['unique_descriptions']}")
+    print(f"Technique Diversity: {diversity['technique_diversity']:.2%}")
+    print(f"Description Diversity: {diversity['description_diversity']:.2%}")
+
+    print("\n--- Length Analysis ---")
+    print(engine.description_words_by_category().to_string(index=False))
+
+    print("\n--- Relationship Analysis ---")
+    print(engine.relationship_summary().to_string(index=False))
+
+    print("\n--- Top Keywords ---")
+    print(", ".join(f"{row.value} ({row.count})" for row in engine.top_values("keyword", 15).itertuples()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the incremental EDA aggregates and print the report.")
+    parser.add_argument("--store", default=RESULTS_DIR, help="Parquet result store to read runs from")
+    parser.add_argument("--db", default=None, help="DuckDB file holding the aggregates (default: the cache directory)")
+    parser.add_argument("--full", action="store_true", help="Rebuild the aggregates from every run")
+    parser.add_argument("--refresh-only", action="store_true", help="Update the aggregates without printing the report")
+    args = parser.parse_args()
+
+    with AnalyticsEngine(args.db, args.store) as engine:
+        summary = engine.refresh(full=args.full)
+        print(
+            f"Refreshed in {summary['seconds']:.2f}s: {summary['added']} runs added, {summary['updated']} updated, "
+            f"{summary['removed']} removed ({summary['rows']} rows aggregated).\n"
+        )
+        if not args.refresh_only:
+            print_report(engine)
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import time
+
+from mindy.config import env_float
+from mindy.gpt import completion_params
+from mindy.prompts import GPT_JSON_PROMPT_TEMPLATE_HASH, GPT_PROMPT_TEMPLATE_HASH
+
+
+# Bulk generation through the OpenAI Batch API: every prompt goes into a JSONL
+# job file, the job runs server-side within the completion window at a lower
+# price and outside the per-minute rate limits, and the result file is read
+# back once it is done.
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_SECONDS = env_float("MINDY_BATCH_POLL_SECONDS", 30.0)
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+# A batch that ended failed, expired or cancelled. Expired and cancelled
+# batches keep the answers they produced before stopping: pass .batch to
+# read_batch_results to collect them.
+class BatchFailedError(RuntimeError):
+    def __init__(self, message, batch=None):
+        super().__init__(message)
+        self.batch = batch
+
+
+# The OpenAI SDK takes about a second to import, so defer it to the first call
+def openai_client():
+    import openai
+    return openai
+
+
+# Stable across runs for the same pair and prompt, so a result file can always
+# be matched back to its pair, even by a later process
+def batch_custom_id(query_id, query, selected_category, output_format="markdown"):
+    prompt_hash = GPT_JSON_PROMPT_TEMPLATE_HASH if output_format == "json" else GPT_PROMPT_TEMPLATE_HASH
+    digest = hashlib.sha1(json.dumps([query, selected_category, prompt_hash]).encode("utf-8")).hexdigest()[:16]
+    return f"q{query_id}-{digest}"
+
+
+# Write one chat completion request per (query_id, query, category) pair, with
+# the same parameters as the live calls. Returns {custom_id: pair}.
+def write_batch_jobs(path, pairs, output_format="markdown"):
+    jobs = {}
+    with open(path, "w", encoding="utf-8") as file:
+        for query_id, query, selected_category in pairs:
+            custom_id = batch_custom_id(query_id, query, selected_category, output_format)
+            if custom_id in jobs:
+                continue
+            jobs[custom_id] = (query_id, query, selected_category)
+            file.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": completion_params(query, selected_category, output_format),
+            }) + "\n")
+    return jobs
+
+
+# Upload a job file and start the batch; returns the batch id
+def submit_batch(path, metadata=None):
+    openai = openai_client()
+    with open(path, "rb") as file:
+        input_file = openai.files.create(file=file, purpose="batch")
+    batch = openai.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata=metadata,
+    )
+    return batch.id
+
+
+# Poll until the batch reaches a terminal status. A completed batch is returned
+# even when some of its requests failed; those are reported by read_batch_results.
+def wait_for_batch(batch_id, poll_seconds=BATCH_POLL_SECONDS, timeout=None, on_poll=None):
+    openai = openai_client()
+    started_at = time.monotonic()
+    while True:
+        batch = openai.batches.retrieve(batch_id)
+        if on_poll is not None:
+            on_poll(batch)
+        if batch.status == "completed":
+            return batch
+        if batch.status in TERMINAL_STATUSES:
+            errors = [error.message for error in (batch.errors.data if batch.errors and batch.errors.data else [])]
+            raise BatchFailedError(f"Batch {batch_id} {batch.status}" + (f": {'; '.join(errors)}" if errors else ""), batch)
+        if timeout is not None and time.monotonic() - started_at > timeout:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout:.0f}s")
+        time.sleep(poll_seconds)
+
+
+def read_file_lines(file_id):
+    if not file_id:
+        return []
+    text = openai_client().files.content(file_id).text
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+# Returns ({custom_id: answer text}, {custom_id: error message})
+def read_batch_results(batch):
+    answers, errors = {}, {}
+    for line in read_file_lines(batch.output_file_id) + read_file_lines(batch.error_file_id):
+        custom_id = line["custom_id"]
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            error = line.get("error") or response.get("body", {}).get("error") or {}
+            errors[custom_id] = error.get("message", f"status {response.get('status_code')}")
+            continue
+        answers[custom_id] = response["body"]["choices"][0]["message"]["content"]
+    return answers, errors
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from functools import lru_cache
+
+from mindy.config import cache_path, env_flag, env_float, env_int
+from mindy.telemetry import record_cache
+
+
+# On-disk key/value cache with TTL and size-based (least recently used) eviction.
+# One SQLite file is shared by the Streamlit app and the simulator, and each
+# cache lives in its own table.
+class SQLiteCache:
+    def __init__(self, path, table, ttl_seconds=None, max_entries=None, enabled=True):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+
+    # A fresh connection per call keeps the cache safe across Streamlit threads.
+    # Callers close it with contextlib.closing; "with conn" alone only commits.
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _is_expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    # Return the cached value, or None on a miss. Expired entries are only
+    # returned when allow_stale is set (used to degrade gracefully).
+    def get(self, key, allow_stale=False):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self._is_expired(row[1], now) and not allow_stale):
+                with self._lock:
+                    self.misses += 1
+                record_cache(self.table, hit=False)
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        record_cache(self.table, hit=True)
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(conn, now)
+
+    # Batched get: {key: value} for the fresh entries among keys, in one query
+    def get_many(self, keys):
+        if not self.enabled or not keys:
+            return {}
+        now = time.time()
+        keys = list(dict.fromkeys(keys))
+        with closing(self._connect()) as conn, conn:
+            rows = []
+            for start in range(0, len(keys), 500):  # Stay under SQLite's bound parameter limit
+                chunk = keys[start:start + 500]
+                rows += conn.execute(
+                    f"SELECT key, value, created_at FROM {self.table} WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+            found = {key: json.loads(value) for key, value, created_at in rows if not self._is_expired(created_at, now)}
+            conn.executemany(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        for key in keys:
+            record_cache(self.table, hit=key in found)
+        return found
+
+    def set_many(self, items):
+        if not self.enabled or not items:
+            return
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), now, now) for key, value in items.items()],
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.ttl_seconds is not None:
+            conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries is not None:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self):
+        with closing(self._connect()) as conn, conn:
+            entries = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def normalize_query(query):
+    # Lowercase and collapse whitespace so trivial variations share a cache entry
+    return " ".join(query.lower().split())
+
+
+def make_cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# Process-wide cache in front of generate_gpt_recommendations
+@lru_cache(maxsize=None)
+def get_gpt_cache():
+    return SQLiteCache(
+        cache_path("mindy_cache.sqlite3"),
+        table="gpt_responses",
+        ttl_seconds=env_float("MINDY_GPT_CACHE_TTL", 7 * 24 * 3600),
+        max_entries=env_int("MINDY_GPT_CACHE_MAX_ENTRIES", 5000),
+        enabled=env_flag("MINDY_GPT_CACHE", True),
+    )
+
+
+# Hash of the fully rendered chat completion request (messages, model,
+# temperature, max_tokens and response format), so any change to what is sent
+# to the model misses the cache
+def gpt_cache_key(params):
+    return make_cache_key("gpt", params)
@@ -0,0 +1,332 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+
+import numpy as np
+
+from mindy.config import CACHE_DIR, env_int
+from mindy.local_index import tokenize
+from mindy.results import RESULTS_DIR, list_runs, read_results_table
+from mindy.semantic import EMBEDDING_MODEL, embed_texts, embed_texts_multiprocess
+
+
+# Technique clustering that scales past memory-sized refits: texts are embedded
+# once into a content-addressed cache, PCA is fitted incrementally, k-means is
+# fitted in mini-batches on the distinct texts (weighted by how often each
+# occurs), and later simulation runs are assigned to the existing clusters.
+CLUSTER_DIR = os.getenv("MINDY_CLUSTER_DIR", os.path.join(CACHE_DIR, "technique_clusters"))
+EMBEDDING_CACHE_DIR = os.path.join(CACHE_DIR, "embedding_cache")
+EMBEDDING_CHUNK = env_int("MINDY_EMBEDDING_CHUNK", 8192)  # Texts encoded (and persisted) per step
+THEME_WORDS = 10
+
+
+# Same preprocessing as the notebook's Cleaned_Technique, minus lemmatization
+def clean_technique(text):
+    return " ".join(tokenize(text or ""))
+
+
+def text_key(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# Distinct texts, the index of each input text among them, and their counts
+def deduplicate(texts):
+    positions = {}
+    inverse = np.fromiter((positions.setdefault(text, len(positions)) for text in texts), dtype=np.int64, count=len(texts))
+    return list(positions), inverse, np.bincount(inverse, minlength=len(positions))
+
+
+# Like deduplicate, over the cleaned techniques; each distinct raw text is cleaned once
+def deduplicate_techniques(texts):
+    raw_texts, raw_inverse, _ = deduplicate(texts)
+    cleaned, cleaned_inverse, _ = deduplicate([clean_technique(text) for text in raw_texts])
+    inverse = cleaned_inverse[raw_inverse]
+    return cleaned, inverse, np.bincount(inverse, minlength=len(cleaned))
+
+
+# Embeddings keyed by a 64-bit hash of the text, in two append-only files: the
+# keys and the float32 vectors in the same order. Only texts missing from the
+# cache are encoded. A torn append is dropped on load by truncating both files
+# to their common length.
+class EmbeddingCache:
+    def __init__(self, directory=None, model_name=EMBEDDING_MODEL, embed=None, chunk_size=EMBEDDING_CHUNK):
+        self.directory = directory or os.path.join(EMBEDDING_CACHE_DIR, model_name.replace("/", "__"))
+        self.embed = embed or embed_texts
+        self.chunk_size = chunk_size
+        self.keys_path = os.path.join(self.directory, "keys.u64")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.dimension = None
+        self.index = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.load()
+
+    def load(self):
+        meta_path = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, encoding="utf-8") as file:
+            self.dimension = json.load(file)["dimension"]
+        keys = np.fromfile(self.keys_path, dtype="<u8") if os.path.exists(self.keys_path) else np.zeros(0, "<u8")
+        vector_rows = os.path.getsize(self.vectors_path) // (4 * self.dimension) if os.path.exists(self.vectors_path) else 0
+        rows = min(len(keys), vector_rows)
+        if rows < len(keys) or rows < vector_rows:
+            with open(self.keys_path, "r+b") as file:
+                file.truncate(rows * 8)
+            with open(self.vectors_path, "r+b") as file:
+                file.truncate(rows * 4 * self.dimension)
+        self.index = dict(zip(keys[:rows].tolist(), range(rows)))
+
+    def _append(self, keys, vectors):
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+            with open(os.path.join(self.directory, "meta.json"), "w", encoding="utf-8") as file:
+                json.dump({"dimension": self.dimension}, file)
+        with open(self.vectors_path, "ab") as file:
+            file.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        with open(self.keys_path, "ab") as file:
+            file.write(np.asarray(keys, dtype="<u8").tobytes())
+        for key in keys:
+            self.index[key] = len(self.index)
+
+    def vectors(self):
+        if not self.index:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype="<f4", mode="r", shape=(len(self.index), self.dimension))
+
+    # Embedding matrix for texts, encoding (and caching) only the unseen ones
+    def encode(self, texts):
+        keys = [text_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.index:
+                missing.setdefault(key, text)
+        self.misses += len(missing)
+        self.hits += len(set(keys)) - len(missing)
+
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.chunk_size):
+            chunk = missing_keys[start:start + self.chunk_size]
+            self._append(chunk, self.embed([missing[key] for key in chunk]))
+        rows = np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self.vectors()[rows])
+
+
+# IncrementalPCA keeping enough components for explained_variance, then
+# MiniBatchKMeans. Themes are the most frequent words of each cluster's
+# techniques; their counts are kept so later assignments update them.
+class TechniqueClusterer:
+    def __init__(self, n_clusters=8, max_components=64, explained_variance=0.90, batch_size=4096, random_state=42):
+        self.n_clusters = n_clusters
+        self.max_components = max_components
+        self.explained_variance = explained_variance
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.pca = None
+        self.kmeans = None
+        self.n_components = None
+        self.word_counts = []
+        self.sizes = []
+        self.assigned_runs = []
+
+    def reduce(self, embeddings):
+        reduced = np.empty((len(embeddings), self.n_components), dtype=np.float32)
+        components = self.pca.components_[:self.n_components].T.astype(np.float32)
+        mean = self.pca.mean_.astype(np.float32)
+        for start in range(0, len(embeddings), self.batch_size * 16):
+            chunk = embeddings[start:start + self.batch_size * 16]
+            reduced[start:start + len(chunk)] = (chunk - mean) @ components
+        return reduced
+
+    def fit_pca(self, embeddings):
+        from sklearn.decomposition import IncrementalPCA
+
+        n_components = min(self.max_components, embeddings.shape[1], len(embeddings))
+        self.pca = IncrementalPCA(n_components=n_components)
+        chunk_rows = max(self.batch_size * 16, n_components)
+        start = 0
+        while start < len(embeddings):
+            end = start + chunk_rows
+            if len(embeddings) - end < n_components:  # partial_fit needs at least n_components rows
+                end = len(embeddings)
+            self.pca.partial_fit(embeddings[start:end])
+            start = end
+        cumulative = np.cumsum(self.pca.explained_variance_ratio_)
+        self.n_components = int(min(np.searchsorted(cumulative, self.explained_variance) + 1, n_components))
+
+    def _update_themes(self, texts, labels, counts):
+        while len(self.word_counts) < self.kmeans.n_clusters:
+            self.word_counts.append(Counter())
+            self.sizes.append(0)
+        for text, label, count in zip(texts, labels, counts):
+            self.sizes[label] += int(count)
+            for word in text.split():
+                self.word_counts[label][word] += int(count)
+
+    # Fit on all texts; returns the cluster of each text
+    def fit(self, texts, cache):
+        from sklearn.cluster import MiniBatchKMeans
+
+        unique_texts, inverse, counts = deduplicate_techniques(texts)
+        embeddings = cache.encode(unique_texts)
+        self.fit_pca(embeddings)
+        reduced = self.reduce(embeddings)
+        if self.n_clusters in (None, "auto"):
+            self.n_clusters = choose_n_clusters(reduced, counts, self.batch_size, self.random_state)
+        self.kmeans = MiniBatchKMeans(
+            n_clusters=min(self.n_clusters, len(unique_texts)),
+            batch_size=self.batch_size,
+            n_init=3,
+            random_state=self.random_state,
+        )
+        self.kmeans.fit(reduced, sample_weight=counts)
+        labels = self.kmeans.predict(reduced)
+        self.word_counts, self.sizes = [], []
+        self._update_themes(unique_texts, labels, counts)
+        return labels[inverse]
+
+    # Assign new texts to the existing clusters without refitting PCA. With
+    # update, the centroids also take a mini-batch step towards the new texts.
+    def assign(self, texts, cache, update=True):
+        unique_texts, inverse, counts = deduplicate_techniques(texts)
+        reduced = self.reduce(cache.encode(unique_texts))
+        if update:
+            self.kmeans.partial_fit(reduced, sample_weight=counts)
+        labels = self.kmeans.predict(reduced)
+        self._update_themes(unique_texts, labels, counts)
+        return labels[inverse]
+
+    def themes(self, top_n=THEME_WORDS):
+        return [
+            {"cluster": cluster, "size": size, "top_words": [word for word, _ in counts.most_common(top_n)]}
+            for cluster, (size, counts) in enumerate(zip(self.sizes, self.word_counts))
+        ]
+
+    def save(self, directory=CLUSTER_DIR):
+        import joblib
+
+        os.makedirs(directory, exist_ok=True)
+        joblib.dump(
+            {"pca": self.pca, "kmeans": self.kmeans, "n_components": self.n_components, "settings": self.settings()},
+            os.path.join(directory, "model.joblib"),
+        )
+        with open(os.path.join(directory, "themes.json.tmp"), "w", encoding="utf-8") as file:
+            json.dump({
+                "embedding_model": EMBEDDING_MODEL,
+                "assigned_runs": self.assigned_runs,
+                "clusters": [
+                    dict(theme, word_counts=dict(self.word_counts[theme["cluster"]].most_common()))
+                    for theme in self.themes()
+                ],
+            }, file, indent=2)
+        os.replace(os.path.join(directory, "themes.json.tmp"), os.path.join(directory, "themes.json"))
+
+    def settings(self):
+        return {
+            "n_clusters": self.n_clusters,
+            "max_components": self.max_components,
+            "explained_variance": self.explained_variance,
+            "batch_size": self.batch_size,
+            "random_state": self.random_state,
+        }
+
+    @classmethod
+    def load(cls, directory=CLUSTER_DIR):
+        import joblib
+
+        if not os.path.exists(os.path.join(directory, "model.joblib")):
+            return None
+        state = joblib.load(os.path.join(directory, "model.joblib"))
+        clusterer = cls(**state["settings"])
+        clusterer.pca, clusterer.kmeans, clusterer.n_components = state["pca"], state["kmeans"], state["n_components"]
+        with open(os.path.join(directory, "themes.json"), encoding="utf-8") as file:
+            themes = json.load(file)
+        clusterer.assigned_runs = themes["assigned_runs"]
+        clusterer.sizes = [cluster["size"] for cluster in themes["clusters"]]
+        clusterer.word_counts = [Counter(cluster["word_counts"]) for cluster in themes["clusters"]]
+        return clusterer
+
+
+# Elbow of the inertia curve, like the notebook's knee method: the k farthest
+# below the straight line between the first and last k. Fitted on a sample.
+def choose_n_clusters(reduced, counts, batch_size=4096, random_state=42, k_range=range(2, 16), sample_size=20000):
+    from sklearn.cluster import MiniBatchKMeans
+
+    rng = np.random.default_rng(random_state)
+    if len(reduced) > sample_size:
+        sample = rng.choice(len(reduced), sample_size, replace=False, p=counts / counts.sum())
+        reduced, counts = reduced[sample], np.ones(sample_size)
+    k_values = [k for k in k_range if k < len(reduced)]
+    if len(k_values) < 3:
+        return k_values[-1] if k_values else 1
+    inertias = np.array([
+        MiniBatchKMeans(n_clusters=k, batch_size=batch_size, n_init=3, random_state=random_state)
+        .fit(reduced, sample_weight=counts).inertia_
+        for k in k_values
+    ])
+    chord = inertias[0] + (inertias[-1] - inertias[0]) * (np.array(k_values) - k_values[0]) / (k_values[-1] - k_values[0])
+    return k_values[int(np.argmax(chord - inertias))]
+
+
+def write_assignments(directory, run_id, table, labels):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.join(directory, "assignments"), exist_ok=True)
+    path = os.path.join(directory, "assignments", f"{run_id}.parquet")
+    pq.write_table(table.append_column("Cluster", pa.array(labels, type=pa.int32())), f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+def read_techniques(store_dir, run_ids):
+    return read_results_table(columns=["Query ID", "Category", "Technique", "run_id"], run_ids=run_ids, store_dir=store_dir)
+
+
+def print_themes(clusterer):
+    for theme in clusterer.themes():
+        print(f"Cluster {theme['cluster']:>2} ({theme['size']} rows): {', '.join(theme['top_words'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster the techniques stored in the result store.")
+    parser.add_argument("--store", default=RESULTS_DIR, help="Parquet result store to read techniques from")
+    parser.add_argument("--dir", default=CLUSTER_DIR, help="Where the model, themes and assignments are kept")
+    parser.add_argument("--processes", type=int, default=1, help="Encode new texts on this many CPU processes")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    fit = subcommands.add_parser("fit", help="Fit the clusters on every stored run")
+    fit.add_argument("--clusters", default="auto", help="Number of clusters, or 'auto' for the elbow method")
+    subcommands.add_parser("update", help="Assign runs stored since the last fit or update")
+    subcommands.add_parser("themes", help="Print the persisted cluster themes")
+    args = parser.parse_args()
+
+    embed = embed_texts if args.processes <= 1 else lambda texts: embed_texts_multiprocess(texts, args.processes)
+    cache = EmbeddingCache(embed=embed)
+
+    if args.command == "fit":
+        clusterer = TechniqueClusterer(n_clusters=None if args.clusters == "auto" else int(args.clusters))
+        runs = list_runs(args.store)
+        table = read_techniques(args.store, runs)
+        labels = clusterer.fit(table.column("Technique").to_pylist(), cache)
+        run_column = table.column("run_id").to_numpy()
+        for run_id in runs:
+            mask = run_column == run_id
+            write_assignments(args.dir, run_id, table.filter(mask), labels[mask])
+        clusterer.assigned_runs = runs
+    else:
+        clusterer = TechniqueClusterer.load(args.dir)
+        if clusterer is None:
+            parser.error(f"No clusters in {args.dir}; run the fit command first.")
+        if args.command == "update":
+            for run_id in [run_id for run_id in list_runs(args.store) if run_id not in clusterer.assigned_runs]:
+                table = read_techniques(args.store, [run_id])
+                write_assignments(args.dir, run_id, table, clusterer.assign(table.column("Technique").to_pylist(), cache))
+                clusterer.assigned_runs.append(run_id)
+                print(f"Assigned {table.num_rows} rows of run {run_id}.")
+
+    if args.command != "themes":
+        clusterer.save(args.dir)
+        print(f"Encoded {cache.misses} new texts ({cache.hits} served from the embedding cache).")
+    print_themes(clusterer)
@@ -0,0 +1,76 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+from mindy.config import env_float, env_int
+from mindy.telemetry import record_pool_timeout, record_pool_wait
+
+
+# Default deadline (seconds) for waiting on a set of concurrent fetches
+FETCH_TIMEOUT = env_float("MINDY_FETCH_TIMEOUT", 15.0)
+
+
+class FetchTimeoutError(Exception):
+    pass
+
+
+# Bounded pool shared by every session in the process, so concurrent users
+# cannot multiply the number of in-flight YouTube requests
+@lru_cache(maxsize=None)
+def get_fetch_executor():
+    return ThreadPoolExecutor(
+        max_workers=env_int("MINDY_FETCH_WORKERS", 8),
+        thread_name_prefix="mindy-fetch",
+    )
+
+
+# Submit fn(*args) to the fetch pool. The time it spends queueing for a worker
+# is recorded per pool, and the caller's context is carried over so telemetry
+# spans join its trace.
+def submit_timed(fn, *args, executor=None):
+    executor = executor or get_fetch_executor()
+    pool = getattr(executor, "_thread_name_prefix", None) or "default"
+    submitted_at = time.monotonic()
+    context = contextvars.copy_context()
+
+    def timed_call():
+        record_pool_wait(pool, time.monotonic() - submitted_at)
+        return fn(*args)
+
+    future = executor.submit(context.run, timed_call)
+    future.pool = pool
+    return future
+
+
+# Yield (index, result, error) for each future as it finishes. `timeout` is one
+# deadline for the whole wait, not a per-request limit: futures not finished
+# `timeout` seconds after the wait began are reported with a FetchTimeoutError,
+# whether they were running or still queued. Queued ones are cancelled and never
+# start. A running call cannot be interrupted, so it is abandoned: its result is
+# dropped, and it keeps its worker until it returns (every YouTube request is
+# bounded by MINDY_YOUTUBE_HTTP_TIMEOUT). None waits for all of them.
+def iter_completed(futures, timeout=FETCH_TIMEOUT):
+    pending = {future: index for index, future in enumerate(futures)}
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while pending:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            for future, index in pending.items():
+                outcome = "cancelled" if future.cancel() else "abandoned"
+                record_pool_timeout(getattr(future, "pool", "default"), outcome)
+                yield index, None, FetchTimeoutError(f"Request timed out after {timeout:.0f}s ({outcome})")
+            return
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                yield index, future.result(), None
+            except Exception as e:
+                yield index, None, e
+
+
+# Run fn(item) for every item concurrently and yield (index, result, error) as each finishes
+def run_concurrently(fn, items, timeout=FETCH_TIMEOUT, executor=None):
+    futures = [submit_timed(fn, item, executor=executor) for item in items]
+    return iter_completed(futures, timeout=timeout)
@@ -0,0 +1,34 @@
+import os
+from dotenv import load_dotenv
+
+
+# Load environment variables before any module reads its settings
+load_dotenv()
+
+# Root of the repository, used to resolve shared on-disk state
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Shared cache directory so a simulation run warms the cache for live users
+CACHE_DIR = os.getenv("MINDY_CACHE_DIR", os.path.join(ROOT_DIR, ".mindy_cache"))
+
+
+def env_flag(name, default=False):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def cache_path(filename):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
@@ -0,0 +1,141 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+from mindy.concurrency import submit_timed
+from mindy.config import env_flag, env_float, env_int
+from mindy.ranking import CandidatePool
+from mindy.search_scheduler import get_search_scheduler
+from mindy.telemetry import record_error, record_quota, span
+from mindy.youtube import (
+    ENRICH_ENABLED,
+    OFFLINE,
+    SEARCH_LIST_COST,
+    cached_search_page,
+    fetch_video_details,
+    get_quota_ledger,
+    live_search_page,
+)
+
+
+# Deep candidate pools: rather than reordering the ten results YouTube already
+# chose, walk the nextPageToken pages of a technique's search into a pool of a
+# few hundred candidates and rank all of them (Ranker.top_k_many).
+DEEP_POOL_ENABLED = env_flag("MINDY_DEEP_POOL", False)
+
+# Candidates gathered per search; YouTube stops paging at about 500 results
+POOL_SIZE = env_int("MINDY_DEEP_POOL_SIZE", 200)
+
+# Per-search budget: search.list units spent on uncached pages (100 each), and
+# seconds to keep paging after the first page arrives
+MAX_UNITS = env_int("MINDY_DEEP_POOL_MAX_UNITS", 400)
+BUDGET_SECONDS = env_float("MINDY_DEEP_POOL_BUDGET", 4.0)
+
+# Videos kept from each ranked pool
+TOP_K = env_int("MINDY_DEEP_POOL_TOP_K", 10)
+
+# Largest maxResults search.list accepts
+PAGE_SIZE = 50
+
+
+# Pages are fetched on their own pool: the walks run on the fetch pool, and
+# waiting there for pages queued behind other walks could deadlock it
+@lru_cache(maxsize=None)
+def get_page_executor():
+    return ThreadPoolExecutor(
+        max_workers=env_int("MINDY_DEEP_POOL_PAGE_WORKERS", 8),
+        thread_name_prefix="mindy-pages",
+    )
+
+
+def completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+# Gather up to `size` candidates for a search into a CandidatePool. Page k+1 is
+# requested as soon as page k arrives, so it is in flight while page k is
+# merged, and cached pages cost nothing. Paging stops once the pool is full,
+# the results run out, `max_units` would be exceeded, the quota ledger refuses,
+# or `budget` seconds have passed; a page abandoned by the budget still lands
+# in the cache for the next search. When not even the first page can be
+# fetched, the regular search is used, with its stale cache and local index
+# fallbacks.
+def fetch_candidate_pool(youtube, request_params, size=POOL_SIZE, max_units=MAX_UNITS, budget=BUDGET_SECONDS, background=False):
+    page_params = get_search_scheduler().merge_request({**request_params, "maxResults": PAGE_SIZE})
+    units = 0
+
+    def request_page(page_token):
+        nonlocal units
+        page = cached_search_page(page_params, page_token)
+        if page is not None:
+            return completed(page)
+        if OFFLINE or units + SEARCH_LIST_COST > max_units:
+            return None
+        if not get_quota_ledger().try_spend(SEARCH_LIST_COST, "search.list", background=background):
+            return None
+        units += SEARCH_LIST_COST
+        record_quota(SEARCH_LIST_COST, "search.list")
+        return submit_timed(live_search_page, youtube, page_params, page_token, executor=get_page_executor())
+
+    with span("youtube.pool", q=page_params["q"], size=size) as pool_span:
+        future = request_page(None)
+        if future is None:
+            pool_span.set(source="search")
+            return CandidatePool.from_videos(get_search_scheduler().search(youtube, request_params, background=background))
+
+        video_ids, titles, descriptions = [], [], []
+        seen = set()
+        pages = 0
+        stopped = "exhausted"
+        deadline = None
+        while future is not None:
+            try:
+                # Always wait for the first page, as a regular search would
+                page = future.result(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except FutureTimeoutError:
+                stopped = "budget"
+                break
+            except Exception:
+                if deadline is None:
+                    raise
+                record_error("youtube.pool")
+                stopped = "error"
+                break
+            if deadline is None:
+                deadline = time.monotonic() + budget
+            pages += 1
+
+            future = None
+            if len(seen) + len(page["video_ids"]) >= size:
+                stopped = "full"
+            elif page["next_page_token"] and time.monotonic() < deadline:
+                future = request_page(page["next_page_token"])
+                if future is None:
+                    stopped = "quota"
+            elif page["next_page_token"]:
+                stopped = "budget"
+
+            for video_id, title, description in zip(page["video_ids"], page["titles"], page["descriptions"]):
+                if video_id not in seen and len(seen) < size:
+                    seen.add(video_id)
+                    video_ids.append(video_id)
+                    titles.append(title)
+                    descriptions.append(description)
+
+        pool_span.set(pages=pages, candidates=len(video_ids), quota_units=units, stopped=stopped)
+        return CandidatePool(video_ids, titles, descriptions)
+
+
+# Add statistics and content details to every pool (or list of videos), with
+# one videos.list call per 50 IDs missing from the details cache
+def enrich_pools(youtube, pools, background=False):
+    pools = [pool if isinstance(pool, CandidatePool) else CandidatePool.from_videos(pool) for pool in pools]
+    if not ENRICH_ENABLED:
+        return pools
+    video_ids = list(dict.fromkeys(str(video_id) for pool in pools for video_id in pool.video_ids))
+    details = fetch_video_details(youtube, video_ids, background=background)
+    for pool in pools:
+        pool.add_details(details)
+    return pools
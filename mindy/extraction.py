@@ -0,0 +1,62 @@
+from mindy.prompts import GPT_OUTPUT_FORMAT
+from mindy.streaming import NUMBERED_LINE
+from mindy.structured import parse_recommendations, techniques_from_recommendations
+from mindy.telemetry import span
+
+
+def extract_techniques_and_keywords(gpt_recommendations):
+    techniques_with_details = []
+    lines = gpt_recommendations.splitlines()
+
+    # Step 1: Extract the title keywords
+    title_keywords = []
+    for line in lines:
+        if line.startswith("# "):  # Identify the custom title
+            title = line[2:].strip()
+            title_keywords = [
+                word.lower()
+                for word in title.split()
+                if len(word) > 3  # Filter out short/common words
+            ]
+            break  # Title extraction is complete, no need to continue
+
+    # Step 2: Extract techniques and their details
+    for i, line in enumerate(lines):
+        if NUMBERED_LINE.match(line) and line.count("**") >= 2:
+            # Extract technique name
+            technique_name = line.split("**")[1]
+            
+            # Extract additional keywords from the technique name
+            technique_keywords = [
+                word.lower()
+                for word in technique_name.split()
+                if len(word) > 3
+            ]
+
+            # Combine title keywords and technique keywords
+            combined_keywords = technique_keywords + title_keywords
+
+            # Extract description (next line after the technique)
+            description = ""
+            current_line = lines[i].strip()
+            if ":" in current_line:  # Check if there is a colon in the line
+                description = current_line.split(":", 1)[1].strip()  # Take the text after the first colon
+        
+
+            # Add the technique, keywords, and description to the list
+            techniques_with_details.append({
+                "technique": technique_name,
+                "keywords": combined_keywords,
+                "description": description
+            })
+    
+    return techniques_with_details
+
+
+# Techniques from an answer produced elsewhere (e.g. a batch job) in the given
+# format; raises InvalidRecommendationsError on JSON answers that fail validation
+def techniques_from_answer(gpt_recommendations, output_format=GPT_OUTPUT_FORMAT):
+    if output_format == "json":
+        return techniques_from_recommendations(parse_recommendations(gpt_recommendations))
+    with span("extract"):
+        return extract_techniques_and_keywords(gpt_recommendations)
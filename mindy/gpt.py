@@ -0,0 +1,254 @@
+import asyncio
+import time
+from contextlib import closing
+from functools import lru_cache
+
+from mindy.cache import get_gpt_cache, gpt_cache_key, normalize_query
+from mindy.prompts import (
+    GPT_JSON_MAX_TOKENS,
+    GPT_JSON_MODEL,
+    GPT_JSON_PROMPT_TEMPLATE_HASH,
+    GPT_MAX_TOKENS,
+    GPT_MODEL,
+    GPT_TEMPERATURE,
+    build_gpt_prompt,
+    build_json_prompt,
+    build_messages,
+)
+from mindy.query_cache import answer_scope, get_semantic_query_cache
+from mindy.resilience import ResilientCompletions
+from mindy.streaming import TechniqueStreamParser
+from mindy.structured import RECOMMENDATIONS_RESPONSE_FORMAT, parse_recommendations
+from mindy.telemetry import record_tokens, span
+
+
+# The OpenAI SDK takes about a second to import, so defer it to the first call.
+# Retries are left to mindy.resilience rather than the SDK.
+@lru_cache(maxsize=None)
+def get_openai_client():
+    import openai
+    return openai.OpenAI(max_retries=0)
+
+
+def create_chat_completion(**kwargs):
+    return get_openai_client().chat.completions.create(**kwargs)
+
+
+# Deadlines, retries, hedging and the fallback model for every live call in the process
+@lru_cache(maxsize=None)
+def get_resilient_completions():
+    return ResilientCompletions(create_chat_completion)
+
+
+# Look the prompt up in the exact-match cache, then in the semantic cache of
+# paraphrased queries. Returns (answer, embedding); the embedding is None when
+# the semantic cache is disabled and is passed back to remember_completion.
+def cached_completion(query, cache_key, scope, gpt_span):
+    cached_recommendations = get_gpt_cache().get(cache_key)
+    if cached_recommendations is not None:
+        gpt_span.set(source="cache")
+        return cached_recommendations, None
+
+    semantic_cache = get_semantic_query_cache()
+    if semantic_cache is None:
+        return None, None
+    entry, similarity, embedding = semantic_cache.lookup(query, scope)
+    if entry is None:
+        return None, embedding
+    gpt_span.set(source="semantic_cache", similarity=similarity)
+    return entry["answer"], embedding
+
+
+# Request parameters for either output format, shared by the live calls and batch jobs
+def completion_params(query, selected_category, output_format="markdown"):
+    if output_format == "json":
+        return {
+            "model": GPT_JSON_MODEL,
+            "messages": build_messages(build_json_prompt(query, selected_category)),
+            "temperature": GPT_TEMPERATURE,
+            "max_tokens": GPT_JSON_MAX_TOKENS,
+            "response_format": RECOMMENDATIONS_RESPONSE_FORMAT,
+        }
+    return {
+        "model": GPT_MODEL,
+        "messages": build_messages(build_gpt_prompt(query, selected_category)),
+        "temperature": GPT_TEMPERATURE,
+        "max_tokens": GPT_MAX_TOKENS,
+    }
+
+
+# Exact-match cache key and semantic cache scope of an answer in either format.
+# The key hashes the request rendered for the normalized query, so trivial case
+# and whitespace variations share an entry.
+def completion_cache_keys(query, selected_category, output_format="markdown"):
+    cache_key = gpt_cache_key(completion_params(normalize_query(query), selected_category, output_format))
+    if output_format == "json":
+        return cache_key, answer_scope(selected_category, GPT_JSON_MODEL, GPT_TEMPERATURE, GPT_JSON_PROMPT_TEMPLATE_HASH)
+    return cache_key, answer_scope(selected_category, GPT_MODEL, GPT_TEMPERATURE)
+
+
+def record_usage(gpt_span, usage):
+    if usage is not None:
+        record_tokens(usage)
+        gpt_span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+
+# Answers from the fallback model are served but not cached, so the next ask
+# goes to the primary model again
+def served_by_primary(gpt_span, opened, params):
+    if opened.model == params["model"]:
+        return True
+    gpt_span.set(fallback_model=opened.model)
+    return False
+
+
+# Join a streamed answer, recording its token usage
+def read_answer(opened, gpt_span):
+    chunks = []
+    with closing(opened):
+        for event in opened:
+            if event.usage is not None:
+                record_usage(gpt_span, event.usage)
+            if event.choices and event.choices[0].delta.content:
+                chunks.append(event.choices[0].delta.content)
+    return "".join(chunks)
+
+
+def remember_completion(query, cache_key, scope, gpt_recommendations, embedding, latency):
+    get_gpt_cache().set(cache_key, gpt_recommendations)
+    semantic_cache = get_semantic_query_cache()
+    if semantic_cache is not None:
+        if embedding is None:
+            embedding = semantic_cache.embed_query(query)  # The lookup was bypassed
+        semantic_cache.add(query, scope, embedding, gpt_recommendations, latency)
+
+
+# Cache an answer produced outside the live calls (e.g. by a batch job)
+def store_completion(query, selected_category, gpt_recommendations, output_format="markdown", latency=0.0):
+    cache_key, scope = completion_cache_keys(query, selected_category, output_format)
+    remember_completion(query, cache_key, scope, gpt_recommendations, None, latency)
+
+
+# Ask GPT-4 for recommendations, serving repeated or paraphrased prompts from
+# the caches. Raises GPTUnavailableError when neither the primary nor the
+# fallback model answers; only the primary model's answers are cached.
+def request_completion(query, selected_category, bypass_cache=False):
+    with span("gpt", model=GPT_MODEL, category=selected_category) as gpt_span:
+        cache_key, scope = completion_cache_keys(query, selected_category)
+        embedding = None
+        if not bypass_cache:
+            cached_recommendations, embedding = cached_completion(query, cache_key, scope, gpt_span)
+            if cached_recommendations is not None:
+                return cached_recommendations
+
+        gpt_span.set(source="live")
+        started_at = time.monotonic()
+        params = completion_params(query, selected_category)
+        opened = get_resilient_completions().open(params)
+        gpt_recommendations = read_answer(opened, gpt_span)
+        if served_by_primary(gpt_span, opened, params):
+            remember_completion(query, cache_key, scope, gpt_recommendations, embedding, time.monotonic() - started_at)
+        return gpt_recommendations
+
+
+# Streaming variant: yields text chunks as they arrive and calls on_technique
+# with each numbered **Technique** line as soon as it is complete, so video
+# prefetch can start while the rest of the answer is still being generated.
+def stream_completion(query, selected_category, on_technique=None, technique_prefixes=None, bypass_cache=False):
+    parser = TechniqueStreamParser(on_technique=on_technique, prefixes=technique_prefixes)
+    with span("gpt", model=GPT_MODEL, category=selected_category, stream=True) as gpt_span:
+        cache_key, scope = completion_cache_keys(query, selected_category)
+        embedding = None
+        if not bypass_cache:
+            cached_recommendations, embedding = cached_completion(query, cache_key, scope, gpt_span)
+            if cached_recommendations is not None:
+                parser.feed(cached_recommendations)
+                parser.close()
+                yield cached_recommendations
+                return
+
+        gpt_span.set(source="live")
+        started_at = time.monotonic()
+        params = completion_params(query, selected_category)
+        opened = get_resilient_completions().open(params)
+        chunks = []
+        with closing(opened):  # Also when the reader stops early
+            for event in opened:
+                if event.usage is not None:
+                    record_usage(gpt_span, event.usage)
+                if not event.choices:
+                    continue
+                chunk = event.choices[0].delta.content
+                if chunk:
+                    if not chunks:
+                        gpt_span.set(first_token_ms=(time.monotonic() - started_at) * 1000)
+                    chunks.append(chunk)
+                    parser.feed(chunk)
+                    yield chunk
+        parser.close()
+
+        # Cache only once the whole answer has arrived
+        if served_by_primary(gpt_span, opened, params):
+            remember_completion(query, cache_key, scope, "".join(chunks), embedding, time.monotonic() - started_at)
+
+
+# JSON output mode: the model answers in the compact schema from
+# mindy.structured, which is validated before it is cached. Returns the parsed
+# recommendations; raises on API errors and on answers that fail validation.
+def request_structured_completion(query, selected_category, bypass_cache=False):
+    with span("gpt", model=GPT_JSON_MODEL, category=selected_category, output="json") as gpt_span:
+        cache_key, scope = completion_cache_keys(query, selected_category, "json")
+        embedding = None
+        if not bypass_cache:
+            cached_recommendations, embedding = cached_completion(query, cache_key, scope, gpt_span)
+            if cached_recommendations is not None:
+                return parse_recommendations(cached_recommendations)
+
+        gpt_span.set(source="live")
+        started_at = time.monotonic()
+        params = completion_params(query, selected_category, "json")
+        opened = get_resilient_completions().open(params)
+        content = read_answer(opened, gpt_span)
+        recommendations = parse_recommendations(content)
+        if served_by_primary(gpt_span, opened, params):
+            remember_completion(query, cache_key, scope, content, embedding, time.monotonic() - started_at)
+        return recommendations
+
+
+# Async variant for the API service, on a shared openai.AsyncOpenAI client. Cache
+# lookups (which may embed the query) and writes run on a worker thread so the
+# event loop keeps serving other requests. Returns the answer text in either
+# format; JSON answers are validated before they are cached.
+async def request_completion_async(client, query, selected_category, output_format="markdown", bypass_cache=False):
+    model = GPT_JSON_MODEL if output_format == "json" else GPT_MODEL
+    with span("gpt", model=model, category=selected_category, output=output_format) as gpt_span:
+        cache_key, scope = completion_cache_keys(query, selected_category, output_format)
+        embedding = None
+        if not bypass_cache:
+            cached_recommendations, embedding = await asyncio.to_thread(
+                cached_completion, query, cache_key, scope, gpt_span
+            )
+            if cached_recommendations is not None:
+                return cached_recommendations
+
+        gpt_span.set(source="live")
+        started_at = time.monotonic()
+        params = completion_params(query, selected_category, output_format)
+        opened = await get_resilient_completions().open_async(client, params)
+        chunks = []
+        try:
+            async for event in opened:
+                if event.usage is not None:
+                    record_usage(gpt_span, event.usage)
+                if event.choices and event.choices[0].delta.content:
+                    chunks.append(event.choices[0].delta.content)
+        finally:
+            await opened.aclose()
+        content = "".join(chunks)
+        if output_format == "json":
+            parse_recommendations(content)
+        if served_by_primary(gpt_span, opened, params):
+            await asyncio.to_thread(
+                remember_completion, query, cache_key, scope, content, embedding, time.monotonic() - started_at
+            )
+        return content
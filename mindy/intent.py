@@ -0,0 +1,455 @@
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from mindy.config import cache_path, env_flag, env_float
+from mindy.prompts import CATEGORIES
+from mindy.ranking import CORPUS_PATH, preprocess_texts
+
+
+# Local query classifier, run before any network call: a linear model over
+# TF-IDF features decides whether a query is about mindfulness, relaxation or
+# self-help, and which category it belongs to. Training needs scikit-learn;
+# the exported model is plain arrays scored with numpy.
+ENABLED = env_flag("MINDY_INTENT_CLASSIFIER", True)
+MODEL_PATH = os.getenv("MINDY_INTENT_MODEL") or "intent_classifier.npz"
+
+# A false refusal turns away someone who needed help, so queries are only
+# refused locally below a threshold calibrated on held-out on-topic queries:
+# at most MAX_FALSE_REFUSALS of them, and none of DISTRESS_EXAMPLES, fall
+# below it. Everything above, the uncertain band included, goes to GPT.
+# MINDY_INTENT_REJECT_BELOW overrides the calibrated threshold.
+REJECT_BELOW = env_float("MINDY_INTENT_REJECT_BELOW", None)
+MAX_FALSE_REFUSALS = env_float("MINDY_INTENT_MAX_FALSE_REFUSALS", 0.005)
+CALIBRATION_FOLDS = 5
+
+# Suggest a category once its probability reaches this
+SUGGEST_ABOVE = env_float("MINDY_INTENT_SUGGEST_ABOVE", 0.5)
+
+# The simulation log only holds on-topic queries; these are the off-topic side
+OFF_TOPIC_EXAMPLES = [
+    "What is the capital of France",
+    "Write a Python function to reverse a linked list",
+    "How do I fix a null pointer exception in Java",
+    "Best pizza recipe with homemade dough",
+    "How to bake chocolate chip cookies",
+    "What is the stock price of Tesla today",
+    "Should I invest in bitcoin or index funds",
+    "Who won the football world cup in 2018",
+    "What is the weather forecast for tomorrow",
+    "Translate this sentence into Spanish",
+    "How to change a flat tire on a car",
+    "Explain the theory of relativity",
+    "Solve the equation 2x plus 5 equals 15",
+    "Recommend a good science fiction movie",
+    "What are the lyrics of Bohemian Rhapsody",
+    "How to set up a React project with TypeScript",
+    "Cheapest flights from London to New York",
+    "How many calories are in a banana",
+    "Write a cover letter for a software engineering job",
+    "How to install Windows on a new laptop",
+    "What is the population of Japan",
+    "Who is the president of the United States",
+    "How to train my dog to sit",
+    "Best smartphone to buy this year",
+    "How to write a SQL query with a left join",
+    "Summarize the plot of Hamlet",
+    "How do vaccines work",
+    "What time does the supermarket close",
+    "How to repair a leaking kitchen faucet",
+    "Give me a workout plan to build biceps",
+    "How to file my tax return",
+    "What is machine learning",
+    "Tell me a joke about cats",
+    "How to grow tomatoes on a balcony",
+    "Convert 100 dollars to euros",
+    "Which programming language should I learn first",
+    "How does a car engine work",
+    "Best places to visit in Italy",
+    "How to make cold brew coffee",
+    "What is the difference between a virus and a bacterium",
+    "Generate a marketing slogan for my bakery",
+    "How to clean a laptop keyboard",
+    "Who painted the Mona Lisa",
+    "How to play chess openings",
+    "What is the boiling point of water in Fahrenheit",
+    "Help me with my calculus homework on derivatives",
+    "How to negotiate a higher salary",
+    "How to configure a home wifi router",
+    "What are the rules of basketball",
+    "Plan a three day trip to Paris",
+    "How to knit a scarf for beginners",
+    "Recommend a laptop for video editing",
+    "Explain how blockchain works",
+    "Write a poem about the ocean",
+    "What is the GDP of Germany",
+    "How to remove a virus from my computer",
+    "How to cook rice in a rice cooker",
+    "What are the best video games of all time",
+    "How to start a small online business",
+    "How to paint a room quickly",
+    "My laptop won't turn on",
+    "I need a recipe for dinner tonight",
+    "I want to buy a new car",
+    "My phone battery drains too fast",
+    "Can you help me write an email to my landlord",
+    "I lost my passport, what should I do",
+    "My code throws an index error",
+    "I want to learn to play the guitar",
+    "Help me pick a birthday gift for my mom",
+    "My printer is not connecting",
+    "I need to book a hotel in Rome",
+    "How do I reset my password",
+    "My car makes a strange noise",
+    "I need help with my resume",
+    "What should I cook for a dinner party",
+    "I want to renovate my kitchen",
+    "My internet connection keeps dropping",
+    "Help me understand compound interest",
+    "I need a summary of world war two",
+    "How do I get a driving license",
+    "How do I apply for unemployment benefits online",
+    "What vet clinics are open on Sunday",
+    "How to debug a segmentation fault in C",
+    "How much does a used car cost",
+    "What documents do I need to rent an apartment",
+    "How to split a restaurant bill between friends",
+    "When is the deadline for university applications",
+    "How to transfer money to another bank",
+    "What is the best dog food brand",
+    "How to write unit tests in Python",
+]
+
+# Distress about everyday matters (work, pets, money, code, family) is on
+# topic even though its topic words are those of the off-topic examples. These
+# are training positives, and evaluate reports how many of them a held-out
+# model would refuse.
+DISTRESS_EXAMPLES = [
+    "I lost my job",
+    "I lost my job and I feel worthless",
+    "I got fired today and I can't stop crying",
+    "my dog died",
+    "My dog died yesterday and the house feels empty",
+    "My cat passed away and I can't focus on anything",
+    "my code throws an error and I am so stressed",
+    "My code keeps failing and I feel like a fraud",
+    "My deadline is tomorrow and I am panicking",
+    "I failed my driving test and feel like a failure",
+    "I failed my exam and I am devastated",
+    "I crashed my car and I am still shaking",
+    "My landlord is evicting me and I can't sleep",
+    "I can't pay my rent and I am terrified",
+    "I am drowning in debt and constantly anxious",
+    "My boss yells at me and I dread going to work",
+    "I have a job interview tomorrow and my heart is racing",
+    "My girlfriend broke up with me",
+    "My husband left me and I feel lost",
+    "My mom is in the hospital and I am scared",
+    "My dad died last month",
+    "My best friend stopped talking to me",
+    "I moved to a new city and I am lonely",
+    "My kids are driving me crazy and I am exhausted",
+    "I have too much homework and I am overwhelmed",
+    "I missed my flight and I am freaking out",
+    "My laptop broke before my presentation and I am panicking",
+    "I got rejected from every university I applied to",
+    "I am burned out from work",
+    "My business is failing and I can't stop worrying",
+    "I lost my wallet and I am so upset",
+    "I keep making mistakes at work and hate myself",
+    "My phone is full of bad news and I feel hopeless",
+    "I argued with my sister and I feel terrible",
+    "The noise from my neighbours makes me so angry",
+    "I have been unemployed for a year and feel useless",
+    "My pet is sick and I am worried all the time",
+    "I am stressed about my taxes",
+    "Traffic makes me furious every morning",
+    "I got a bad performance review and I feel awful",
+]
+
+
+# Words and word pairs of a text, after the ranking engine's normalization
+def terms(text):
+    tokens = preprocess_texts([text])[0].split()
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+
+# Training leaves out terms made only of stop words, so they never enter the
+# vocabulary and are ignored when scoring
+def content_terms(text):
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+    return [term for term in terms(text) if not all(word in ENGLISH_STOP_WORDS for word in term.split())]
+
+
+def sigmoid(value):
+    return 1 / (1 + math.exp(-value))
+
+
+# Scores one query in a few microseconds: sublinear TF-IDF with L2
+# normalization, as in the TfidfVectorizer the model was trained with, then one
+# dot product per head
+class IntentClassifier:
+    def __init__(self, vocabulary, idf, topic_coef, topic_intercept, category_coef, category_intercept, categories, reject_below=None):
+        self.index = {term: position for position, term in enumerate(vocabulary)}
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.topic_coef = topic_coef
+        self.topic_intercept = float(topic_intercept)
+        self.category_coef = category_coef
+        self.category_intercept = category_intercept
+        self.categories = list(categories)
+        self.reject_below = reject_below
+
+    # Returns {"on_topic", "category", "category_probability"}. Every value is
+    # None for a query with no known terms, which is left for GPT to judge.
+    def classify(self, query):
+        counts = Counter(self.index[term] for term in terms(query) if term in self.index)
+        if not counts:
+            return {"on_topic": None, "category": None, "category_probability": None}
+        positions = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self.idf[positions]
+        weights /= np.linalg.norm(weights)
+
+        on_topic = sigmoid(float(self.topic_coef[positions] @ weights) + self.topic_intercept)
+        logits = self.category_coef[:, positions] @ weights + self.category_intercept
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        best = int(probabilities.argmax())
+        return {"on_topic": on_topic, "category": self.categories[best], "category_probability": float(probabilities[best])}
+
+    def is_off_topic(self, result, reject_below=None):
+        for threshold in (reject_below, REJECT_BELOW, self.reject_below):
+            if threshold is not None:
+                return result["on_topic"] is not None and result["on_topic"] < threshold
+        return False
+
+    # The confidently predicted category, or None
+    def suggest_category(self, result, suggest_above=SUGGEST_ABOVE):
+        if result["category_probability"] is None or result["category_probability"] < suggest_above:
+            return None
+        return result["category"]
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            vocabulary=np.array(self.vocabulary),
+            idf=self.idf,
+            topic_coef=self.topic_coef,
+            topic_intercept=np.array(self.topic_intercept),
+            category_coef=self.category_coef,
+            category_intercept=self.category_intercept,
+            categories=np.array(self.categories),
+            reject_below=np.array(np.nan if self.reject_below is None else self.reject_below),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as model:
+            return cls(
+                model["vocabulary"].tolist(),
+                model["idf"],
+                model["topic_coef"],
+                model["topic_intercept"],
+                model["category_coef"],
+                model["category_intercept"],
+                model["categories"].tolist(),
+                # Models exported before calibration have no threshold
+                float(model["reject_below"]) if "reject_below" in model.files and not np.isnan(model["reject_below"]) else None,
+            )
+
+
+# Training examples from the simulation log. On-topic: every logged query,
+# technique name and description, plus the category seeds. Category: the name
+# and keywords of each technique GPT suggested under a selected category,
+# grouped by query for cross-validation.
+def load_training_data(csv_path=CORPUS_PATH):
+    on_topic, category_texts, category_labels, groups = set(), [], [], []
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            on_topic.update([row["Query"], row["Technique"], row["Description"]])
+            if row["Category"] in CATEGORIES:
+                category_texts.append(" ".join([row["Technique"], row["Keywords"]]))
+                category_labels.append(row["Category"])
+                groups.append(row["Query"])
+    for category, seeds in CATEGORIES.items():
+        on_topic.update(seeds)
+        category_texts += seeds + [category]
+        category_labels += [category] * (len(seeds) + 1)
+        groups += [f"seed:{category}"] * (len(seeds) + 1)
+    on_topic.update(DISTRESS_EXAMPLES)
+    on_topic = sorted(text for text in on_topic if text)
+    return {
+        "topic_texts": on_topic + OFF_TOPIC_EXAMPLES,
+        "topic_labels": [1] * len(on_topic) + [0] * len(OFF_TOPIC_EXAMPLES),
+        "category_texts": category_texts,
+        "category_labels": category_labels,
+        "groups": groups,
+    }
+
+
+def fit_heads(vectorizer, data):
+    from sklearn.linear_model import LogisticRegression
+
+    topic_model = LogisticRegression(C=10, class_weight="balanced", max_iter=2000)
+    topic_model.fit(vectorizer.transform(data["topic_texts"]), data["topic_labels"])
+    # No intercept, so a query without category evidence gets even odds rather than the commonest category
+    category_model = LogisticRegression(C=20, class_weight="balanced", fit_intercept=False, max_iter=2000)
+    category_model.fit(vectorizer.transform(data["category_texts"]), data["category_labels"])
+    return topic_model, category_model
+
+
+def new_vectorizer():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(analyzer=content_terms, sublinear_tf=True)
+
+
+# On-topic probability of every topic text from a model that did not see it
+def out_of_fold_probabilities(data, folds=CALIBRATION_FOLDS):
+    from sklearn.model_selection import StratifiedKFold
+
+    topic_texts, topic_labels = np.array(data["topic_texts"], dtype=object), np.array(data["topic_labels"])
+    probabilities, fold_ids = np.zeros(len(topic_texts)), np.zeros(len(topic_texts), dtype=int)
+    for fold, (train_index, test_index) in enumerate(StratifiedKFold(folds, shuffle=True, random_state=0).split(topic_texts, topic_labels)):
+        fold_data = {**data, "topic_texts": topic_texts[train_index].tolist(), "topic_labels": topic_labels[train_index].tolist()}
+        vectorizer = new_vectorizer().fit(fold_data["topic_texts"] + fold_data["category_texts"])
+        topic_model, _ = fit_heads(vectorizer, fold_data)
+        probabilities[test_index] = topic_model.predict_proba(vectorizer.transform(topic_texts[test_index].tolist()))[:, 1]
+        fold_ids[test_index] = fold
+    return probabilities, fold_ids
+
+
+# Highest threshold refusing at most max_false_refusals of the held-out on-topic
+# probabilities and none of the distress examples'
+def calibrate_threshold(on_topic_probabilities, distress_probabilities, max_false_refusals=MAX_FALSE_REFUSALS):
+    threshold = float(np.quantile(on_topic_probabilities, max_false_refusals))
+    if len(distress_probabilities):
+        threshold = min(threshold, float(np.min(distress_probabilities)))
+    return threshold
+
+
+def train(csv_path=CORPUS_PATH):
+    data = load_training_data(csv_path)
+    vectorizer = new_vectorizer().fit(data["topic_texts"] + data["category_texts"])
+    topic_model, category_model = fit_heads(vectorizer, data)
+    probabilities, _ = out_of_fold_probabilities(data)
+    labels = np.array(data["topic_labels"])
+    distress = np.isin(np.array(data["topic_texts"], dtype=object), DISTRESS_EXAMPLES)
+    return IntentClassifier(
+        vectorizer.get_feature_names_out().tolist(),
+        vectorizer.idf_,
+        topic_model.coef_[0],
+        topic_model.intercept_[0],
+        category_model.coef_,
+        category_model.intercept_,
+        category_model.classes_.tolist(),
+        calibrate_threshold(probabilities[labels == 1], probabilities[distress]),
+    )
+
+
+# Held-out quality. Each fold's queries are judged at a threshold calibrated on
+# the other folds only; reports the share of on-topic queries falsely refused
+# (overall and among DISTRESS_EXAMPLES) and of off-topic ones refused, and the
+# category accuracy on techniques of queries left out of training (5 folds by
+# query). reject_below, when given, replaces the calibrated thresholds.
+def evaluate(csv_path=CORPUS_PATH, reject_below=REJECT_BELOW):
+    from sklearn.model_selection import GroupKFold
+
+    data = load_training_data(csv_path)
+    probabilities, fold_ids = out_of_fold_probabilities(data)
+    labels = np.array(data["topic_labels"])
+    distress = np.isin(np.array(data["topic_texts"], dtype=object), DISTRESS_EXAMPLES)
+    refused, thresholds = np.zeros(len(labels), dtype=bool), []
+    for fold in range(CALIBRATION_FOLDS):
+        held_out = fold_ids == fold
+        threshold = reject_below
+        if threshold is None:
+            threshold = calibrate_threshold(probabilities[~held_out & (labels == 1)], probabilities[~held_out & distress])
+        thresholds.append(threshold)
+        refused[held_out] = probabilities[held_out] < threshold
+
+    category_texts, category_labels = np.array(data["category_texts"], dtype=object), np.array(data["category_labels"])
+    correct = []
+    for train_index, test_index in GroupKFold(5).split(category_texts, category_labels, data["groups"]):
+        fold = {**data, "category_texts": category_texts[train_index].tolist(), "category_labels": category_labels[train_index].tolist()}
+        vectorizer = new_vectorizer().fit(fold["topic_texts"] + fold["category_texts"])
+        _, category_model = fit_heads(vectorizer, fold)
+        correct += list(category_model.predict(vectorizer.transform(category_texts[test_index].tolist())) == category_labels[test_index])
+    return {
+        "reject_below": float(np.mean(thresholds)),
+        "false_refusal_rate": float(np.mean(refused[labels == 1])),
+        "distress_false_refusal_rate": float(np.mean(refused[distress])),
+        "off_topic_caught": float(np.mean(refused[labels == 0])),
+        "category_accuracy": float(np.mean(correct)),
+    }
+
+
+def build_intent_classifier(csv_path=CORPUS_PATH, model_path=None):
+    classifier = train(csv_path)
+    classifier.save(model_path or cache_path(MODEL_PATH))
+    return classifier
+
+
+# Loaded once per process. Training takes seconds and imports scikit-learn, so
+# it never happens here: without an exported model (or with one from before
+# thresholds were calibrated) this returns None and the app keeps the
+# user-selected category until `python -m mindy.intent train` is run. None
+# too when MINDY_INTENT_CLASSIFIER is off.
+@lru_cache(maxsize=None)
+def get_intent_classifier():
+    if not ENABLED:
+        return None
+    model_path = cache_path(MODEL_PATH)
+    if os.path.exists(model_path):
+        classifier = IntentClassifier.load(model_path)
+        if classifier.reject_below is not None:
+            return classifier
+    print(f"No calibrated intent model at {model_path}; run `python -m mindy.intent train` to enable the intent check.")
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train, evaluate and try the local query intent and category classifier.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train", help="Train on the simulation log and export the model")
+    train_parser.add_argument("--csv", default=CORPUS_PATH, help="Simulation results CSV to train on")
+    train_parser.add_argument("--output", default=None, help="Model path (default: MINDY_INTENT_MODEL in the cache directory)")
+    train_parser.add_argument("--evaluate", action="store_true", help="Also report cross-validated accuracy")
+    classify_parser = subparsers.add_parser("classify", help="Classify queries with the exported model")
+    classify_parser.add_argument("queries", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        output = args.output or cache_path(MODEL_PATH)
+        classifier = build_intent_classifier(args.csv, output)
+        print(f"Exported {len(classifier.vocabulary)} terms and {len(classifier.categories)} categories to {output} "
+              f"({os.path.getsize(output) / 1024:.0f} KiB)")
+        if args.evaluate:
+            scores = evaluate(args.csv)
+            print(f"Exported threshold: refuse below {classifier.reject_below:.3f}")
+            print(f"Held out, below a mean threshold of {scores['reject_below']:.3f}: {scores['false_refusal_rate']:.1%} of "
+                  f"on-topic queries falsely refused ({scores['distress_false_refusal_rate']:.1%} of distress examples), "
+                  f"{scores['off_topic_caught']:.1%} of off-topic ones refused; "
+                  f"category accuracy {scores['category_accuracy']:.1%}")
+    else:
+        model_path = cache_path(MODEL_PATH)
+        if not os.path.exists(model_path):
+            sys.exit(f"No intent model at {model_path}; run `python -m mindy.intent train` first.")
+        started_at = time.perf_counter()
+        classifier = IntentClassifier.load(model_path)
+        print(f"Loaded in {(time.perf_counter() - started_at) * 1000:.1f} ms")
+        for query in args.queries:
+            started_at = time.perf_counter()
+            result = classifier.classify(query)
+            elapsed_us = (time.perf_counter() - started_at) * 1e6
+            verdict = "off-topic" if classifier.is_off_topic(result) else "on-topic"
+            print(f"{query!r}: {verdict} (p={result['on_topic']}), category {classifier.suggest_category(result)} "
+                  f"(p={result['category_probability']}), {elapsed_us:.0f} us")
@@ -0,0 +1,380 @@
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from mindy.config import CACHE_DIR, env_int
+from mindy.ranking import CORPUS_PATH, preprocess_texts
+
+
+INDEX_DIR = os.path.join(CACHE_DIR, "video_index")
+
+# Small appends create small segments; merge them on a background thread once
+# there are more than this many (or run `python -m mindy.local_index --compact`)
+MAX_SEGMENTS = env_int("MINDY_LOCAL_INDEX_MAX_SEGMENTS", 16)
+
+
+# Imported lazily; sklearn is slow to import and only needed once a search runs
+@lru_cache(maxsize=None)
+def stop_words():
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+
+def tokenize(text):
+    excluded = stop_words()
+    return [token for token in preprocess_texts([text])[0].split() if token not in excluded]
+
+
+# One immutable slice of the index. Postings are stored as flat arrays sorted by
+# term and opened memory-mapped, so opening the index reads almost nothing.
+class Segment:
+    def __init__(self, path, base):
+        self.path = path
+        self.base = base
+        with open(os.path.join(path, "terms.json"), encoding="utf-8") as file:
+            self.terms = json.load(file)  # term -> [offset, document frequency]
+        self.doc_ids = np.load(os.path.join(path, "doc_ids.npy"), mmap_mode="r")
+        self.freqs = np.load(os.path.join(path, "freqs.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(path, "lengths.npy"), mmap_mode="r")
+        self.total_length = int(self.lengths.sum())
+
+    def document_frequency(self, term):
+        entry = self.terms.get(term)
+        return entry[1] if entry else 0
+
+    def postings(self, term):
+        offset, count = self.terms[term]
+        return self.doc_ids[offset:offset + count], self.freqs[offset:offset + count]
+
+    @staticmethod
+    def write(path, base, token_lists):
+        postings = defaultdict(list)
+        for position, tokens in enumerate(token_lists):
+            for term, freq in Counter(tokens).items():
+                postings[term].append((base + position, freq))
+
+        terms, doc_ids, freqs = {}, [], []
+        for term in sorted(postings):
+            terms[term] = [len(doc_ids), len(postings[term])]
+            for doc_id, freq in postings[term]:
+                doc_ids.append(doc_id)
+                freqs.append(freq)
+
+        # Write to a temporary directory first so readers never see a partial segment
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "doc_ids.npy"), np.array(doc_ids, dtype=np.int32))
+        np.save(os.path.join(tmp_path, "freqs.npy"), np.array(freqs, dtype=np.int32))
+        np.save(os.path.join(tmp_path, "lengths.npy"), np.array([len(tokens) for tokens in token_lists], dtype=np.int32))
+        with open(os.path.join(tmp_path, "terms.json"), "w", encoding="utf-8") as file:
+            json.dump(terms, file)
+        os.replace(tmp_path, path)
+
+
+# Append-only BM25 index over harvested videos. Document metadata and the list
+# of live segments are kept in SQLite, whose write lock also serializes appends
+# coming from the app and the simulator.
+class LocalVideoIndex:
+    def __init__(self, directory=INDEX_DIR, k1=1.2, b=0.75):
+        self.directory = directory
+        self.db_path = os.path.join(directory, "index.sqlite3")
+        self.k1 = k1
+        self.b = b
+        self._segments = {}
+        self._lock = threading.Lock()
+        self._compacting = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "doc_id INTEGER PRIMARY KEY, video_id TEXT UNIQUE NOT NULL, "
+                "title TEXT NOT NULL, description TEXT NOT NULL, link TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "name TEXT PRIMARY KEY, base INTEGER NOT NULL, count INTEGER NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # Index videos not seen before; returns how many were added
+    def add_videos(self, videos):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            new_videos = {}
+            for video in videos:
+                video_id = video["video_id"]
+                if video_id in new_videos:
+                    continue
+                if conn.execute("SELECT 1 FROM docs WHERE video_id = ?", (video_id,)).fetchone() is None:
+                    new_videos[video_id] = video
+            if not new_videos:
+                conn.execute("ROLLBACK")
+                return 0
+
+            base = conn.execute("SELECT COALESCE(MAX(doc_id) + 1, 0) FROM docs").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO docs (doc_id, video_id, title, description, link) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (base + position, video["video_id"], video["title"], video["description"], video["link"])
+                    for position, video in enumerate(new_videos.values())
+                ],
+            )
+            name = f"seg_{base:010d}_{len(new_videos)}"
+            Segment.write(
+                os.path.join(self.directory, name),
+                base,
+                [tokenize(video["title"] + " " + video["description"]) for video in new_videos.values()],
+            )
+            conn.execute("INSERT INTO segments (name, base, count) VALUES (?, ?, ?)", (name, base, len(new_videos)))
+            conn.execute("COMMIT")
+            segment_count = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        if segment_count > MAX_SEGMENTS:
+            self.compact_in_background()
+        return len(new_videos)
+
+    # Start compact() on a daemon thread unless one is already running, so the
+    # search that appended the last segment does not wait for the merge
+    def compact_in_background(self):
+        if not self._compacting.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.compact()
+            finally:
+                self._compacting.release()
+
+        threading.Thread(target=run, name="mindy-index-compact", daemon=True).start()
+
+    # Merge every segment into one. The merged segment is built from a snapshot
+    # without holding the write lock, then swapped in for the segments it
+    # covers; segments appended meanwhile stay live.
+    def compact(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            old_segments = conn.execute("SELECT name, base, count FROM segments").fetchall()
+            end = max((base + count for _, base, count in old_segments), default=0)
+            rows = conn.execute(
+                "SELECT title, description FROM docs WHERE doc_id < ? ORDER BY doc_id", (end,)
+            ).fetchall()
+            conn.execute("COMMIT")
+            if len(old_segments) <= 1:
+                return
+            old_names = [name for name, _, _ in old_segments]
+            # The process ID keeps merges racing in other processes apart
+            name = f"seg_{0:010d}_{len(rows)}_{os.getpid()}"
+            Segment.write(
+                os.path.join(self.directory, name), 0, [tokenize(title + " " + description) for title, description in rows]
+            )
+
+            conn.execute("BEGIN IMMEDIATE")
+            live = {row[0] for row in conn.execute("SELECT name FROM segments")}
+            if not live >= set(old_names):
+                conn.execute("ROLLBACK")  # Another process compacted these segments first
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                return
+            conn.executemany("DELETE FROM segments WHERE name = ?", [(old_name,) for old_name in old_names])
+            conn.execute("INSERT INTO segments (name, base, count) VALUES (?, ?, ?)", (name, 0, len(rows)))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        for old_name in old_names:
+            shutil.rmtree(os.path.join(self.directory, old_name), ignore_errors=True)
+
+    # Pick up segments appended by other processes and drop merged ones. A
+    # compaction in another process can delete listed segments before they are
+    # opened; the list is then read again, as it names the merged segment.
+    # Segments already open stay readable, as their files are memory-mapped.
+    def _refresh(self, attempts=3):
+        for attempt in range(attempts):
+            conn = self._connect()
+            try:
+                rows = conn.execute("SELECT name, base FROM segments").fetchall()
+            finally:
+                conn.close()
+            with self._lock:
+                live = {name for name, _ in rows}
+                for name in list(self._segments):
+                    if name not in live:
+                        del self._segments[name]
+                try:
+                    for name, base in rows:
+                        if name not in self._segments:
+                            self._segments[name] = Segment(os.path.join(self.directory, name), base)
+                except FileNotFoundError:
+                    if attempt == attempts - 1:
+                        raise
+                    continue
+                return list(self._segments.values())
+
+    # BM25 search; returns (videos, confidence) where confidence is the top score
+    # as a fraction of the best score the query terms could reach
+    def search(self, query, max_results=10):
+        segments = self._refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        doc_count = sum(len(segment.lengths) for segment in segments)
+        if not terms or not doc_count:
+            return [], 0.0
+
+        average_length = sum(segment.total_length for segment in segments) / doc_count
+        scores = np.zeros(max(segment.base + len(segment.lengths) for segment in segments), dtype=np.float64)
+        best_possible = 0.0
+        for term in terms:
+            document_frequency = sum(segment.document_frequency(term) for segment in segments)
+            idf = math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            best_possible += idf * (self.k1 + 1)  # Unseen terms still count, lowering confidence
+            if not document_frequency:
+                continue
+            for segment in segments:
+                if not segment.document_frequency(term):
+                    continue
+                doc_ids, freqs = segment.postings(term)
+                lengths = segment.lengths[doc_ids - segment.base]
+                norm = self.k1 * (1 - self.b + self.b * lengths / average_length)
+                scores[doc_ids] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return [], 0.0
+        top = matched[np.argsort(-scores[matched], kind="stable")[:max_results]]
+
+        conn = self._connect()
+        try:
+            placeholders = ",".join("?" * len(top))
+            rows = conn.execute(
+                f"SELECT doc_id, video_id, title, description, link FROM docs WHERE doc_id IN ({placeholders})",
+                [int(doc_id) for doc_id in top],
+            ).fetchall()
+        finally:
+            conn.close()
+        by_id = {row[0]: row for row in rows}
+        videos = [
+            {"title": by_id[doc_id][2], "description": by_id[doc_id][3], "video_id": by_id[doc_id][1], "link": by_id[doc_id][4]}
+            for doc_id in (int(doc_id) for doc_id in top)
+            if doc_id in by_id
+        ]
+        return videos, float(scores[top[0]] / best_possible)
+
+    def iter_videos(self):
+        conn = self._connect()
+        try:
+            for video_id, title, description, link in conn.execute(
+                "SELECT video_id, title, description, link FROM docs ORDER BY doc_id"
+            ):
+                yield {"title": title, "description": description, "video_id": video_id, "link": link}
+        finally:
+            conn.close()
+
+    # Indexed videos by ID, for the given IDs that are indexed
+    def get_videos(self, video_ids):
+        video_ids = list(dict.fromkeys(video_ids))
+        conn = self._connect()
+        try:
+            videos = {}
+            for start in range(0, len(video_ids), 500):  # Stay under SQLite's bound-parameter limit
+                chunk = video_ids[start:start + 500]
+                for video_id, title, description, link in conn.execute(
+                    f"SELECT video_id, title, description, link FROM docs WHERE video_id IN ({','.join('?' * len(chunk))})", chunk
+                ):
+                    videos[video_id] = {"title": title, "description": description, "video_id": video_id, "link": link}
+            return videos
+        finally:
+            conn.close()
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        finally:
+            conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_local_index():
+    return LocalVideoIndex()
+
+
+# Drop-in stand-in for fetch_youtube_videos answered from the local index. Only
+# relevance order is supported, and duration/definition filters are not applied
+# because harvested results carry no such metadata.
+def search_local_videos(query, max_results=10, order="relevance", video_duration=None, video_definition=None):
+    videos, _ = get_local_index().search(query, max_results)
+    return videos
+
+
+def video_id_from_link(link):
+    return parse_qs(urlparse(link).query).get("v", [""])[0]
+
+
+# Load harvested videos from a simulation results CSV into the index
+def index_simulation_results(csv_path=CORPUS_PATH, index=None):
+    index = index or get_local_index()
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        if not {"Video Title", "Video Description", "Video Link"} <= set(reader.fieldnames):
+            print(f"{csv_path} has no video columns; nothing to index.")
+            return 0
+        videos = [
+            {
+                "title": row["Video Title"],
+                "description": row["Video Description"],
+                "video_id": video_id_from_link(row["Video Link"]),
+                "link": row["Video Link"],
+            }
+            for row in reader
+            if row["Video Link"]
+        ]
+    return index.add_videos(videos)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local video search index.")
+    parser.add_argument("--add", metavar="CSV", help="Index the videos logged in a simulation results CSV")
+    parser.add_argument("--compact", action="store_true", help="Merge all index segments into one")
+    parser.add_argument("--query", help="Search the index")
+    args = parser.parse_args()
+
+    index = get_local_index()
+    if args.add:
+        print(f"Indexed {index_simulation_results(args.add, index)} new videos.")
+    if args.compact:
+        index.compact()
+    if args.query:
+        videos, confidence = index.search(args.query)
+        print(f"Confidence: {confidence:.2f}")
+        for video in videos:
+            print(f"- {video['title']} ({video['link']})")
+    print(f"{len(index)} videos indexed.")
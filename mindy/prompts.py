@@ -0,0 +1,133 @@
+import hashlib
+import os
+
+
+# Categories offered in the app and simulated by the query simulator, with
+# their seed techniques (also precomputed by mindy.warmup)
+CATEGORIES = {
+    "Mindfulness and Meditation": ["mindfulness", "guided meditation", "focus meditation"],
+    "Breathing Exercises": ["deep breathing techniques", "4-7-8 breathing", "box breathing"],
+    "Somatic Practices": ["yoga for relaxation", "tai chi", "progressive muscle relaxation"],
+}
+
+# Model settings shared by every GPT-4 call
+GPT_MODEL = "gpt-4"
+GPT_TEMPERATURE = 0.7
+GPT_MAX_TOKENS = 1500
+SYSTEM_MESSAGE = "You are an expert assistant."
+
+# "markdown" (default) scrapes techniques from the markdown answer; "json" asks
+# for a compact schema-validated answer and renders the markdown locally.
+# Structured outputs need a model that supports them, hence the separate model.
+GPT_OUTPUT_FORMAT = os.getenv("MINDY_GPT_OUTPUT", "markdown")
+GPT_JSON_MODEL = os.getenv("MINDY_GPT_JSON_MODEL", "gpt-4o")
+GPT_JSON_MAX_TOKENS = 600
+
+# Prompt template used by both the Streamlit app and the query simulator
+GPT_PROMPT_TEMPLATE = """
+        ## SYSTEM ROLE
+        You are an expert chatbot designed to provide actionable, insightful, and personalized advice on **Mindfulness**, **Relaxation**, and **Self-Help Techniques**. 
+        If a query is unrelated to these topics, politely inform the user and avoid generating recommendations.
+        Based on the user's query, provide **specific techniques** the user can apply, along with actionable advice
+
+        ## USER QUESTION
+        The user has asked: 
+        "{query}"
+
+        ## CATEGORY CONTEXT
+        {category_instruction}
+
+        ## GUIDELINES
+        1. **Accuracy**:  
+           - Provide actionable techniques tailored to the query 
+           - Prioritize recommendations from CATEGORY CONTEXT and base your suggestions on the user's query.
+           - If the answer cannot be found, explicitly state: "The provided context does not contain this information."
+           - Use actionable language to recommend techniques for relaxation and mindfulness.
+           
+        2. **Actionable Techniques**: Suggest **specific techniques** the user can apply (e.g., guided breathing, mindfulness meditation, progressive muscle relaxation). Explain:
+           - How the technique works.
+           - How it helps address the query.
+           - Steps to apply it.
+
+        3. **Clarity**:  
+           - Use simple, professional, and user-friendly language.  
+           - Ensure the response is well-structured and formatted in Markdown for readability.  
+           
+        4. **Category Relevance**:  
+           - If a category is provided, ensure all suggestions directly address that category.
+           - For example:
+             - For "Stress and Anxiety Relief", focus on techniques like deep breathing, mindfulness exercises, and calming practices.
+             - For "Sleep and Rest", suggest techniques like guided sleep meditations, sleep hygiene tips, and relaxing yoga poses.
+
+        5. **Response Format**:
+           - Include at least two techniques.
+           - Use the following structure:
+    
+        '''
+        # [Custom Title Based on the Query]
+        Provide a meaningful title based on the user’s query and CATEGORY CONTEXT (e.g., "How to Relax and Sleep Better").
+
+        ## Recommendations
+        1. **[Actionable Advice]**: Actionable and insightful advice.
+        1. **[Technique Name]**: Detailed explanation of the technique, why it works, and how to apply it].
+        2. **[Another Technique Name]**: [Detailed explanation].
+
+
+        ## Note
+        Focus on actionable advice. Avoid vague suggestions.
+        '''
+        """
+
+# Prompt for JSON output mode; the answer shape is fixed by mindy.structured
+GPT_JSON_PROMPT_TEMPLATE = """The user asked: "{query}"
+
+{category_instruction}
+
+Recommend 2 to 4 specific, actionable mindfulness, relaxation or self-help techniques for this question.
+For each technique give a short name, a description of 2 to 3 sentences on how to apply it and why it helps,
+and 3 to 5 keywords to search YouTube with. Give the answer a short title based on the question.
+If the question is unrelated to these topics, return no techniques and a title saying so."""
+
+
+def template_hash(template):
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+# Hash of the template, so cached responses are invalidated when the prompt changes
+GPT_PROMPT_TEMPLATE_HASH = template_hash(GPT_PROMPT_TEMPLATE)
+GPT_JSON_PROMPT_TEMPLATE_HASH = template_hash(GPT_JSON_PROMPT_TEMPLATE)
+
+
+# Dynamically adjust the prompt based on the selected category
+def build_category_instruction(selected_category):
+    if selected_category != "All":
+        return (
+            f"Focus your recommendations specifically on the category: **{selected_category}**. "
+            "Only suggest techniques and advice that are directly relevant to this category. "
+            "If the query falls outside the scope of this category, state: 'The provided context does not contain this information.'"
+        )
+    return (
+        "Provide general recommendations not limited to any specific category. "
+        "Cover a diverse range of actionable techniques related to mindfulness, relaxation, and self-help."
+    )
+
+
+def build_gpt_prompt(query, selected_category):
+    return GPT_PROMPT_TEMPLATE.format(
+        query=query,
+        category_instruction=build_category_instruction(selected_category),
+    )
+
+
+def build_json_prompt(query, selected_category):
+    return GPT_JSON_PROMPT_TEMPLATE.format(
+        query=query,
+        category_instruction=build_category_instruction(selected_category),
+    )
+
+
+def build_messages(gpt_prompt):
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": gpt_prompt},
+    ]
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from functools import lru_cache
+
+import numpy as np
+
+from mindy.cache import make_cache_key, normalize_query
+from mindy.config import cache_path, env_flag, env_float, env_int
+from mindy.prompts import GPT_MODEL, GPT_PROMPT_TEMPLATE_HASH, GPT_TEMPERATURE
+from mindy.telemetry import record_cache
+
+
+# Off by default: it loads a sentence-embedding model and answers paraphrases
+# with a previous response instead of a fresh one
+SEMANTIC_CACHE_ENABLED = env_flag("MINDY_SEMANTIC_CACHE", False)
+SEMANTIC_CACHE_THRESHOLD = env_float("MINDY_SEMANTIC_CACHE_THRESHOLD", 0.85)
+SEMANTIC_CACHE_TABLE = "semantic_queries"
+
+
+# Answers are only reused for the same category, model and prompt
+def answer_scope(selected_category, model, temperature, prompt_hash=GPT_PROMPT_TEMPLATE_HASH):
+    return make_cache_key("gpt", selected_category, model, temperature, prompt_hash)
+
+
+def entry_key(query, scope):
+    return make_cache_key("semantic_query", query, scope)
+
+
+# Bounded in-memory index of (query embedding, answer) pairs. A lookup returns
+# the closest previous query in the same scope when its cosine similarity is at
+# least `threshold`. When full, the least recently used entry is replaced.
+# With a path, every entry is also a row of an SQLite table next to the other
+# caches, so an insert writes one row and processes sharing the file keep each
+# other's answers.
+class SemanticQueryCache:
+    def __init__(self, embed, threshold=0.85, max_entries=1000, ttl_seconds=None, path=None, table=SEMANTIC_CACHE_TABLE):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.table = table
+        self.embeddings = None  # Allocated on first insert, once the dimension is known
+        self.entries = []  # One dict per row: query, scope, answer, latency, created_at, last_access
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "key TEXT PRIMARY KEY, query TEXT NOT NULL, scope TEXT NOT NULL, answer TEXT NOT NULL, "
+                    "latency REAL NOT NULL, embedding BLOB NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+            self.load()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def embed_query(self, query):
+        return self.embed([normalize_query(query)])[0]
+
+    def _is_expired(self, entry, now):
+        return self.ttl_seconds is not None and now - entry["created_at"] > self.ttl_seconds
+
+    # Return (entry, similarity, embedding). entry is None on a miss; the
+    # embedding is returned either way so add() does not compute it again.
+    def lookup(self, query, scope):
+        started_at = time.monotonic()
+        embedding = self.embed_query(query)
+        now = time.time()
+        entry, similarity = None, 0.0
+        with self._lock:
+            rows = [
+                row for row, existing in enumerate(self.entries)
+                if existing["scope"] == scope and not self._is_expired(existing, now)
+            ]
+            if rows:
+                similarities = self.embeddings[rows] @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry, similarity = self.entries[rows[best]], float(similarities[best])
+                    entry["last_access"] = now
+                    self.hits += 1
+                    # Time the original call took, minus the time spent on this lookup
+                    self.latency_saved += max(entry["latency"] - (time.monotonic() - started_at), 0.0)
+            if entry is None:
+                self.misses += 1
+        if entry is not None and self.path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, entry_key(entry["query"], scope)))
+        record_cache("semantic_query", hit=entry is not None)
+        return entry, similarity, embedding
+
+    # Remember an answer and how long it took to generate (seconds)
+    def add(self, query, scope, embedding, answer, latency):
+        now = time.time()
+        entry = {
+            "query": normalize_query(query),
+            "scope": scope,
+            "answer": answer,
+            "latency": latency,
+            "created_at": now,
+            "last_access": now,
+        }
+        with self._lock:
+            if self.embeddings is None:
+                self.embeddings = np.zeros((self.max_entries, len(embedding)), dtype=np.float32)
+            row = next(
+                (row for row, existing in enumerate(self.entries)
+                 if existing["query"] == entry["query"] and existing["scope"] == scope),
+                None,
+            )
+            if row is None and len(self.entries) < self.max_entries:
+                row = len(self.entries)
+                self.entries.append(entry)
+            else:
+                if row is None:
+                    row = min(range(len(self.entries)), key=lambda position: self.entries[position]["last_access"])
+                self.entries[row] = entry
+            self.embeddings[row] = embedding
+        if self.path:
+            self._save(entry, embedding)
+
+    # Write one row, outside the lock, and trim the table the way SQLiteCache does
+    def _save(self, entry, embedding):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, query, scope, answer, latency, embedding, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry_key(entry["query"], entry["scope"]), entry["query"], entry["scope"], json.dumps(entry["answer"]),
+                    entry["latency"], np.asarray(embedding, dtype=np.float32).tobytes(), entry["created_at"], entry["last_access"],
+                ),
+            )
+            if self.ttl_seconds is not None:
+                conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (entry["created_at"] - self.ttl_seconds,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    # Read the most recently used entries that fit and have not expired,
+    # including those added by other processes
+    def load(self):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                f"SELECT query, scope, answer, latency, embedding, created_at, last_access FROM {self.table} "
+                "WHERE created_at >= ? ORDER BY last_access DESC LIMIT ?",
+                (now - self.ttl_seconds if self.ttl_seconds is not None else float("-inf"), self.max_entries),
+            ).fetchall()
+        entries = [
+            {"query": query, "scope": scope, "answer": json.loads(answer), "latency": latency,
+             "created_at": created_at, "last_access": last_access}
+            for query, scope, answer, latency, _, created_at, last_access in rows
+        ]
+        with self._lock:
+            self.entries = entries
+            self.embeddings = None
+            if rows:
+                embeddings = np.stack([np.frombuffer(row[4], dtype=np.float32) for row in rows])
+                self.embeddings = np.zeros((self.max_entries, embeddings.shape[1]), dtype=np.float32)
+                self.embeddings[:len(rows)] = embeddings
+
+    def clear(self):
+        with self._lock:
+            self.entries = []
+            self.embeddings = None
+        if self.path:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": self.latency_saved,
+        }
+
+
+# Process-wide semantic cache in front of the GPT call, or None when disabled
+@lru_cache(maxsize=None)
+def get_semantic_query_cache():
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    from mindy.semantic import embed_texts  # Imported lazily; loads sentence-transformers
+
+    return SemanticQueryCache(
+        embed_texts,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=env_int("MINDY_SEMANTIC_CACHE_MAX_ENTRIES", 1000),
+        ttl_seconds=env_float("MINDY_GPT_CACHE_TTL", 7 * 24 * 3600),
+        path=cache_path("mindy_cache.sqlite3") if env_flag("MINDY_SEMANTIC_CACHE_PERSIST", True) else None,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the semantic query cache.")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached answer")
+    parser.add_argument("--query", help="Show the cached query closest to this one")
+    parser.add_argument("--category", default="All", help="Category used with --query")
+    args = parser.parse_args()
+
+    semantic_cache = get_semantic_query_cache()
+    if semantic_cache is None:
+        parser.exit(1, "The semantic query cache is disabled; set MINDY_SEMANTIC_CACHE=1.\n")
+    if args.clear:
+        semantic_cache.clear()
+    if args.query:
+        entry, similarity, _ = semantic_cache.lookup(args.query, answer_scope(args.category, GPT_MODEL, GPT_TEMPERATURE))
+        print(f"Reused '{entry['query']}' (similarity {similarity:.3f})" if entry else "No cached query is similar enough.")
+    print(f"{len(semantic_cache.entries)} queries cached.")
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")  # YouTube quotas reset at midnight Pacific Time
+except Exception:
+    QUOTA_TIMEZONE = timezone.utc
+
+
+# Persistent ledger of API units spent per day, shared across processes.
+# Background work (simulations, warmups) leaves background_reserve_units of the
+# budget to interactive users.
+class QuotaLedger:
+    def __init__(self, path, daily_limit, reserve_units=0, background_reserve_units=0):
+        self.path = path
+        self.daily_limit = daily_limit
+        self.reserve_units = reserve_units
+        self.background_reserve_units = background_reserve_units
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota_ledger ("
+                "day TEXT NOT NULL, endpoint TEXT NOT NULL, units INTEGER NOT NULL, "
+                "PRIMARY KEY (day, endpoint))"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def today():
+        return datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+    def spent_today(self):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(units), 0) FROM quota_ledger WHERE day = ?", (self.today(),)
+            ).fetchone()
+            return row[0]
+        finally:
+            conn.close()
+
+    def budget(self, background=False):
+        return self.daily_limit - self.reserve_units - (self.background_reserve_units if background else 0)
+
+    def remaining(self, background=False):
+        return max(self.budget(background) - self.spent_today(), 0)
+
+    # Atomically record the units if they fit in today's budget; refuse otherwise
+    def try_spend(self, units, endpoint, background=False):
+        day = self.today()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            spent = conn.execute(
+                "SELECT COALESCE(SUM(units), 0) FROM quota_ledger WHERE day = ?", (day,)
+            ).fetchone()[0]
+            if spent + units > self.budget(background):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO quota_ledger (day, endpoint, units) VALUES (?, ?, ?) "
+                "ON CONFLICT (day, endpoint) DO UPDATE SET units = units + excluded.units",
+                (day, endpoint, units),
+            )
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def usage(self, day=None):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT endpoint, units FROM quota_ledger WHERE day = ?", (day or self.today(),)
+            ).fetchall()
+            return dict(rows)
+        finally:
+            conn.close()
@@ -0,0 +1,382 @@
+import argparse
+import csv
+import math
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from mindy.config import ROOT_DIR, cache_path, env_float
+from mindy.telemetry import span
+
+
+# Harvested video corpus the IDF model is built from
+CORPUS_PATH = os.path.join(ROOT_DIR, "data analysis", "simulation_results.csv")
+IDF_MODEL_PATH = "ranking_idf.npz"
+
+# "tfidf" (default) or "semantic" for sentence-embedding similarity
+RANKING_BACKEND = os.getenv("MINDY_RANKING_BACKEND", "tfidf")
+
+# Columns used as corpus text; older simulation logs have no video columns,
+# so fall back to the technique text in that case
+VIDEO_TEXT_COLUMNS = ["Video Title", "Video Description"]
+TECHNIQUE_TEXT_COLUMNS = ["Technique", "Description", "Keywords"]
+
+SPECIAL_CHARACTERS = re.compile(r"[^a-zA-Z0-9\s]")
+
+# How much a video's quality (from videos.list statistics) can raise its text
+# similarity: a score is multiplied by up to 1 + QUALITY_WEIGHT
+QUALITY_WEIGHT = env_float("MINDY_RANKING_QUALITY_WEIGHT", 0.25)
+
+
+def preprocess_texts(texts):
+    # Convert to lowercase and remove punctuation and special characters
+    return [SPECIAL_CHARACTERS.sub("", text.lower()) for text in texts]
+
+
+def video_text(video):
+    return video["title"] + " " + video["description"]
+
+
+# 0 to 1 from the view count (log scale, 10M views is 1) and the like rate (5%
+# is 1); None for videos without statistics
+def video_quality(video):
+    views = video.get("view_count")
+    if views is None:
+        return None
+    popularity = min(math.log10(views + 1) / 7, 1.0)
+    engagement = min((video.get("like_count") or 0) / max(views, 1) / 0.05, 1.0)
+    return 0.7 * popularity + 0.3 * engagement
+
+
+# video_quality over arrays of counts, NaN where there are no statistics
+def quality_scores(view_counts, like_counts):
+    popularity = np.minimum(np.log10(view_counts + 1) / 7, 1.0)
+    engagement = np.minimum(np.nan_to_num(like_counts) / np.maximum(view_counts, 1) / 0.05, 1.0)
+    return 0.7 * popularity + 0.3 * engagement
+
+
+# Positions of the k largest values, best first, without sorting the rest;
+# equal values keep their order, like a stable sort
+def top_k_indices(values, k):
+    if k <= 0:
+        return np.arange(0)
+    if k < len(values):
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        above = np.flatnonzero(values > threshold)
+        selected = np.concatenate([above, np.flatnonzero(values == threshold)[:k - len(above)]])
+    else:
+        selected = np.arange(len(values))
+    return selected[np.argsort(-values[selected], kind="stable")]
+
+
+# Candidate videos stored as columns rather than one dict per video: IDs in a
+# fixed-width array, statistics in float arrays (NaN when unknown) and texts in
+# object arrays. Dicts are only built for the videos a ranking returns.
+class CandidatePool:
+    DETAIL_COLUMNS = ("view_count", "like_count", "duration_seconds")
+
+    def __init__(self, video_ids=(), titles=(), descriptions=(), details=None, definitions=None, enriched=None):
+        self.video_ids = np.array(video_ids, dtype="U")
+        self.titles = np.array(titles, dtype=object)
+        self.descriptions = np.array(descriptions, dtype=object)
+        count = len(self.video_ids)
+        self.details = details if details is not None else np.full((count, len(self.DETAIL_COLUMNS)), np.nan)
+        self.definitions = definitions if definitions is not None else np.full(count, None, dtype=object)
+        self.enriched = enriched if enriched is not None else np.zeros(count, dtype=bool)
+
+    # Pool of video dicts, keeping the first of any repeated ID
+    @classmethod
+    def from_videos(cls, videos):
+        unique_videos = {}
+        for video in videos:
+            unique_videos.setdefault(video["video_id"], video)
+        videos = list(unique_videos.values())
+        pool = cls(
+            [video["video_id"] for video in videos],
+            [video["title"] for video in videos],
+            [video["description"] for video in videos],
+        )
+        pool.add_details({video["video_id"]: video for video in videos if "view_count" in video})
+        return pool
+
+    # One pool of the union of several, in order of first appearance, and for
+    # each input pool the positions of its videos in the union
+    @classmethod
+    def merge(cls, pools):
+        if not pools:
+            return cls(), []
+        video_ids = np.concatenate([pool.video_ids for pool in pools])
+        _, first, inverse = np.unique(video_ids, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        columns = np.empty(len(order), dtype=np.intp)
+        columns[order] = np.arange(len(order))
+        positions = np.split(columns[inverse.ravel()], np.cumsum([len(pool) for pool in pools])[:-1])
+        rows = first[order]
+        merged = cls(
+            video_ids[rows],
+            np.concatenate([pool.titles for pool in pools])[rows],
+            np.concatenate([pool.descriptions for pool in pools])[rows],
+            np.concatenate([pool.details for pool in pools])[rows],
+            np.concatenate([pool.definitions for pool in pools])[rows],
+            np.concatenate([pool.enriched for pool in pools])[rows],
+        )
+        return merged, positions
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.video(position) for position in range(len(self))[index]]
+        return self.video(index)
+
+    def __iter__(self):
+        return (self.video(position) for position in range(len(self)))
+
+    # Fill in statistics and content details from a video ID -> details mapping
+    def add_details(self, details):
+        for position, video_id in enumerate(self.video_ids):
+            video_details = details.get(video_id)
+            if video_details is None:
+                continue
+            for column, name in enumerate(self.DETAIL_COLUMNS):
+                value = video_details.get(name)
+                self.details[position, column] = np.nan if value is None else value
+            self.definitions[position] = video_details.get("definition")
+            self.enriched[position] = True
+
+    def texts(self):
+        return [title + " " + description for title, description in zip(self.titles, self.descriptions)]
+
+    def quality_scores(self):
+        return quality_scores(self.details[:, 0], self.details[:, 1])
+
+    def video(self, position):
+        video_id = str(self.video_ids[position])
+        video = {
+            "title": self.titles[position],
+            "description": self.descriptions[position],
+            "video_id": video_id,
+            "link": f"https://www.youtube.com/watch?v={video_id}",
+        }
+        if self.enriched[position]:
+            for column, name in enumerate(self.DETAIL_COLUMNS):
+                value = self.details[position, column]
+                video[name] = None if np.isnan(value) else int(value)
+            video["definition"] = self.definitions[position]
+        return video
+
+
+def load_corpus_texts(csv_path=CORPUS_PATH):
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        columns = VIDEO_TEXT_COLUMNS if set(VIDEO_TEXT_COLUMNS) <= set(reader.fieldnames) else TECHNIQUE_TEXT_COLUMNS
+        return [" ".join(row[column] or "" for column in columns) for row in reader]
+
+
+# Shared ranking logic; subclasses provide score(queries, videos), a matrix of
+# similarities with one row per query and one column per video. Rankers with a
+# retrieval index also add up to `neighbours` retrieved videos per query.
+class Ranker:
+    neighbours = 0
+
+    # Rank each query's candidate videos in a single pass. Videos are scored once
+    # even when several queries share them; with dedupe, a video is only kept
+    # under the query it matches best (ties go to the earlier query).
+    def rank_many(self, queries, video_lists, dedupe=False):
+        unique_videos = {}
+        for videos in video_lists:
+            for video in videos:
+                unique_videos.setdefault(video["video_id"], video)
+        if not unique_videos:
+            return [[] for _ in queries]
+
+        columns = {video_id: column for column, video_id in enumerate(unique_videos)}
+        with span("rank", backend=type(self).__name__, queries=len(queries), videos=len(unique_videos)):
+            scores = self.score(queries, list(unique_videos.values()))
+
+        best_row = {}
+        if dedupe:
+            for row, videos in enumerate(video_lists):
+                for video in videos:
+                    video_id = video["video_id"]
+                    current = best_row.get(video_id)
+                    if current is None or scores[row, columns[video_id]] > scores[current, columns[video_id]]:
+                        best_row[video_id] = row
+
+        ranked_lists = []
+        for row, videos in enumerate(video_lists):
+            kept = [video for video in videos if not dedupe or best_row[video["video_id"]] == row]
+            video_scores = np.array([scores[row, columns[video["video_id"]]] for video in kept])
+            qualities = [video_quality(video) for video in kept]
+            boosts = np.array([1.0 + QUALITY_WEIGHT * (quality or 0.0) for quality in qualities])
+            ranked = []
+            # Stable sort keeps the original YouTube order when nothing matches
+            for position in np.argsort(-video_scores * boosts, kind="stable"):
+                video = dict(kept[position])
+                video["similarity_score"] = float(video_scores[position])
+                if qualities[position] is not None:
+                    video["quality_score"] = qualities[position]
+                ranked.append(video)
+            ranked_lists.append(ranked)
+        return ranked_lists
+
+    def rank(self, query, videos):
+        return self.rank_many([query], [videos])[0]
+
+    # Up to k candidates per query from the ranker's own retrieval index;
+    # rankers without one retrieve nothing
+    def retrieve(self, queries, k):
+        return [[] for _ in queries]
+
+    # Each query's searched candidates (a list of videos or a CandidatePool)
+    # plus up to self.neighbours retrieved ones that are not among them yet
+    def with_neighbours(self, queries, video_lists):
+        if self.neighbours <= 0:
+            return video_lists
+        merged_lists = []
+        for videos, neighbours in zip(video_lists, self.retrieve(queries, self.neighbours)):
+            if isinstance(videos, CandidatePool):
+                merged_lists.append(CandidatePool.merge([videos, CandidatePool.from_videos(neighbours)])[0])
+            else:
+                searched = {video["video_id"] for video in videos}
+                merged_lists.append(list(videos) + [video for video in neighbours if video["video_id"] not in searched])
+        return merged_lists
+
+    # Similarities against a CandidatePool; rankers with a faster path for
+    # known videos override this
+    def score_pool(self, queries, pool):
+        return self.score_texts(queries, pool.texts())
+
+    # The k best videos of each query's candidate pool (a CandidatePool or a
+    # list of videos). Every pool is scored in one product over their union,
+    # quality boosts are applied as a vector, and only the k best of each pool
+    # are selected and sorted. Dedupe works as in rank_many.
+    def top_k_many(self, queries, pools, k, dedupe=False):
+        pools = [pool if isinstance(pool, CandidatePool) else CandidatePool.from_videos(pool) for pool in pools]
+        merged, positions = CandidatePool.merge(pools)
+        if not len(merged):
+            return [[] for _ in queries]
+
+        with span("rank", backend=type(self).__name__, queries=len(queries), videos=len(merged), top_k=k):
+            scores = np.asarray(self.score_pool(queries, merged), dtype=np.float64)
+            member = np.zeros(scores.shape, dtype=bool)
+            for row, columns in enumerate(positions):
+                member[row, columns] = True
+            if dedupe:
+                best_row = np.where(member, scores, -np.inf).argmax(axis=0)
+                member &= best_row == np.arange(len(queries))[:, None]
+            qualities = merged.quality_scores()
+            boosted = scores * (1.0 + QUALITY_WEIGHT * np.nan_to_num(qualities))
+
+            ranked_lists = []
+            for row, columns in enumerate(positions):
+                # Candidates in their pool's order, so ties keep the YouTube order
+                candidates = columns[member[row, columns]]
+                ranked = []
+                for column in candidates[top_k_indices(boosted[row, candidates], k)]:
+                    video = merged.video(column)
+                    video["similarity_score"] = float(scores[row, column])
+                    if not np.isnan(qualities[column]):
+                        video["quality_score"] = float(qualities[column])
+                    ranked.append(video)
+                ranked_lists.append(ranked)
+        return ranked_lists
+
+    def top_k(self, query, pool, k):
+        return self.top_k_many([query], [pool], k)[0]
+
+
+# Keep each video only in the ranked list where it scored highest (ties go to
+# the earlier list), using the similarity scores the lists already carry, so
+# lists ranked separately are deduplicated without scoring them again
+def dedupe_ranked(ranked_lists):
+    best = {}
+    for row, ranked in enumerate(ranked_lists):
+        for video in ranked:
+            score = video.get("similarity_score", 0.0)
+            current = best.get(video["video_id"])
+            if current is None or score > current[1]:
+                best[video["video_id"]] = (row, score)
+    return [[video for video in ranked if best[video["video_id"]][0] == row] for row, ranked in enumerate(ranked_lists)]
+
+
+# TF-IDF ranking over a stateless hashed vocabulary. The IDF weights are learned
+# once from the harvested corpus and persisted, instead of being refit on the
+# handful of videos returned for each technique.
+class RankingEngine(Ranker):
+    def __init__(self, idf, n_features):
+        from sklearn.feature_extraction.text import HashingVectorizer  # Imported lazily; sklearn is slow to import
+
+        self.idf = idf
+        self.n_features = n_features
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features, stop_words="english", alternate_sign=False, norm=None
+        )
+
+    @classmethod
+    def fit(cls, corpus_texts, n_features=2 ** 18):
+        engine = cls(np.ones(n_features, dtype=np.float32), n_features)
+        counts = engine.vectorizer.transform(preprocess_texts(corpus_texts))
+        document_frequency = np.bincount(counts.indices, minlength=n_features)
+        # Smoothed IDF, as in sklearn's TfidfVectorizer
+        engine.idf = (np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+        return engine
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as model:
+            return cls(model["idf"], int(model["n_features"]))
+
+    def save(self, path):
+        np.savez_compressed(path, idf=self.idf, n_features=self.n_features)
+
+    # L2-normalized TF-IDF rows for a batch of texts
+    def transform(self, texts):
+        from sklearn.preprocessing import normalize
+
+        counts = self.vectorizer.transform(preprocess_texts(texts))
+        counts.data *= self.idf[counts.indices]
+        return normalize(counts)
+
+    # Cosine similarity of every query against every text in one sparse product
+    def score_texts(self, queries, texts):
+        return (self.transform(queries) @ self.transform(texts).T).toarray()
+
+    def score(self, queries, videos):
+        return self.score_texts(queries, [video_text(video) for video in videos])
+
+
+def build_ranking_engine(csv_path=CORPUS_PATH, model_path=None):
+    engine = RankingEngine.fit(load_corpus_texts(csv_path))
+    engine.save(model_path or cache_path(IDF_MODEL_PATH))
+    return engine
+
+
+# Loaded once per process; built from the corpus on first use
+@lru_cache(maxsize=None)
+def get_ranking_engine():
+    model_path = cache_path(IDF_MODEL_PATH)
+    if os.path.exists(model_path):
+        return RankingEngine.load(model_path)
+    return build_ranking_engine(model_path=model_path)
+
+
+# Ranker selected by MINDY_RANKING_BACKEND
+@lru_cache(maxsize=None)
+def get_ranker():
+    if RANKING_BACKEND == "semantic":
+        from mindy.semantic import get_semantic_ranker  # Imported lazily; loads sentence-transformers
+        return get_semantic_ranker()
+    return get_ranking_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the persistent IDF model used to rank videos.")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="Simulation results CSV to learn IDF weights from")
+    args = parser.parse_args()
+
+    engine = build_ranking_engine(args.corpus)
+    print(f"Built IDF model over {int(np.count_nonzero(engine.idf != engine.idf.max()))} hashed terms.")
@@ -0,0 +1,53 @@
+import random
+import threading
+import time
+
+
+# Thread-safe token bucket: `rate` tokens are added per second up to `capacity`.
+# A rate of None or 0 means unlimited.
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate or 1, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    # Block until `tokens` are available, then take them
+    def acquire(self, tokens=1):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_seconds = (tokens - self.tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+# Exponential backoff with full jitter: sleep a random time up to base * 2^attempt
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+# Call fn(), retrying failures with jittered exponential backoff. Exceptions listed
+# in give_up_on are raised immediately since retrying them cannot help.
+def retry_with_backoff(fn, retries=3, base_delay=1.0, max_delay=30.0, give_up_on=(), on_retry=None):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except give_up_on:
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if on_retry is not None:
+                on_retry(attempt + 1, delay, e)
+            time.sleep(delay)
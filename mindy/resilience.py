@@ -0,0 +1,368 @@
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+from mindy.concurrency import submit_timed
+from mindy.config import env_flag, env_float, env_int
+from mindy.rate_limit import backoff_delay, retry_with_backoff
+from mindy.stats import percentile
+from mindy.telemetry import record_gpt_event, record_gpt_latency
+
+
+# Every live GPT call is streamed, and an attempt has DEADLINE_SECONDS to
+# produce its first token. Failed attempts are retried with jittered backoff.
+# An attempt on the primary model that runs past its deadline, or that keeps
+# failing, falls back to FALLBACK_MODEL (empty: no fallback). Once an answer
+# is flowing it is kept, and a stall in it is cut by READ_TIMEOUT_SECONDS.
+DEADLINE_SECONDS = env_float("MINDY_GPT_DEADLINE", 20.0)
+FALLBACK_MODEL = os.getenv("MINDY_GPT_FALLBACK_MODEL", "gpt-4o-mini")
+FALLBACK_DEADLINE_SECONDS = env_float("MINDY_GPT_FALLBACK_DEADLINE", 15.0)
+READ_TIMEOUT_SECONDS = env_float("MINDY_GPT_READ_TIMEOUT", 30.0)
+RETRIES = env_int("MINDY_GPT_RETRIES", 2)
+RETRY_BASE_DELAY = env_float("MINDY_GPT_RETRY_BASE_DELAY", 0.5)
+RETRY_MAX_DELAY = 4.0
+
+# Hedging: when an attempt has no token after the HEDGE_PERCENTILE of the
+# model's recent first-token latencies (HEDGE_AFTER_SECONDS until
+# HEDGE_MIN_SAMPLES are in), a second attempt is sent and the slower of the two
+# is closed. At most HEDGE_BUDGET of the calls are hedged, so a slow upstream
+# does not get twice the traffic.
+HEDGE_ENABLED = env_flag("MINDY_GPT_HEDGE", False)
+HEDGE_PERCENTILE = env_float("MINDY_GPT_HEDGE_PERCENTILE", 0.95)
+HEDGE_AFTER_SECONDS = env_float("MINDY_GPT_HEDGE_AFTER", 5.0)
+HEDGE_MIN_SAMPLES = env_int("MINDY_GPT_HEDGE_MIN_SAMPLES", 20)
+HEDGE_BUDGET = env_float("MINDY_GPT_HEDGE_BUDGET", 0.1)
+LATENCY_WINDOW = env_int("MINDY_GPT_LATENCY_WINDOW", 500)
+
+
+class GPTDeadlineError(Exception):
+    pass
+
+
+class GPTUnavailableError(Exception):
+    pass
+
+
+# Errors retrying cannot fix; the fallback model is still tried
+def non_retryable_errors():
+    import openai
+
+    return (
+        GPTDeadlineError,
+        openai.BadRequestError,
+        openai.AuthenticationError,
+        openai.PermissionDeniedError,
+        openai.NotFoundError,
+        openai.UnprocessableEntityError,
+    )
+
+
+# Recent first-token latencies of one model
+class LatencyTracker:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def observe(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    # Nearest-rank percentile of the window, None before the first sample
+    def percentile(self, fraction):
+        with self._lock:
+            samples = list(self.samples)
+        return percentile(samples, fraction) if samples else None
+
+
+# A streamed answer whose first content chunk has arrived. Iterating it
+# replays the events read so far, then reads the rest; closing it drops the
+# connection, which stops the generation upstream.
+class OpenedStream:
+    def __init__(self, model, stream, events, buffered, first_token_seconds):
+        self.model = model
+        self.stream = stream
+        self.events = events
+        self.buffered = buffered
+        self.first_token_seconds = first_token_seconds
+
+    def __iter__(self):
+        yield from self.buffered
+        yield from self.events
+
+    async def __aiter__(self):
+        for event in self.buffered:
+            yield event
+        async for event in self.events:
+            yield event
+
+    def close(self):
+        self.stream.close()
+
+    async def aclose(self):
+        await self.stream.close()
+
+
+def has_content(event):
+    return bool(event.choices and event.choices[0].delta.content)
+
+
+def stream_params(params):
+    return {**params, "stream": True, "stream_options": {"include_usage": True}, "timeout": READ_TIMEOUT_SECONDS}
+
+
+# One attempt, run on a worker thread: open the stream and read up to the
+# first content chunk, giving up early once the attempt has lost
+def open_stream(create, params, cancelled):
+    started_at = time.monotonic()
+    stream = create(**stream_params(params))
+    events = iter(stream)
+    buffered = []
+    try:
+        for event in events:
+            buffered.append(event)
+            if has_content(event) or cancelled.is_set():
+                break
+    except BaseException:
+        stream.close()
+        raise
+    return OpenedStream(params["model"], stream, events, buffered, time.monotonic() - started_at)
+
+
+async def open_stream_async(client, params):
+    started_at = time.monotonic()
+    stream = await client.chat.completions.create(**stream_params(params))
+    events = stream.__aiter__()
+    buffered = []
+    try:
+        async for event in events:
+            buffered.append(event)
+            if has_content(event):
+                break
+    except BaseException:  # Includes the cancellation of a losing attempt
+        await stream.close()
+        raise
+    return OpenedStream(params["model"], stream, events, buffered, time.monotonic() - started_at)
+
+
+def close_result(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+# Bounded pool for the attempts; each holds a thread only until its first token
+@lru_cache(maxsize=None)
+def get_gpt_executor():
+    return ThreadPoolExecutor(max_workers=env_int("MINDY_GPT_WORKERS", 32), thread_name_prefix="mindy-gpt")
+
+
+# Deadlines, retries, hedging and fallback around chat completions, with
+# per-model latency tracking that sets the hedge threshold. `create` is a
+# synchronous chat.completions.create; the async methods take an AsyncOpenAI client.
+class ResilientCompletions:
+    def __init__(
+        self,
+        create=None,
+        deadline=DEADLINE_SECONDS,
+        fallback_model=FALLBACK_MODEL,
+        fallback_deadline=FALLBACK_DEADLINE_SECONDS,
+        retries=RETRIES,
+        retry_base_delay=RETRY_BASE_DELAY,
+        hedge=HEDGE_ENABLED,
+        hedge_percentile=HEDGE_PERCENTILE,
+        hedge_after=HEDGE_AFTER_SECONDS,
+        hedge_min_samples=HEDGE_MIN_SAMPLES,
+        hedge_budget=HEDGE_BUDGET,
+        executor=None,
+    ):
+        self.create = create
+        self.deadline = deadline
+        self.fallback_model = fallback_model
+        self.fallback_deadline = fallback_deadline
+        self.retries = retries
+        self.retry_base_delay = retry_base_delay
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_after = hedge_after
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_budget = hedge_budget
+        self.executor = executor
+        self.latencies = defaultdict(LatencyTracker)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.deadlines_missed = 0
+        self._lock = threading.Lock()
+
+    # (model, deadline) pairs to try in order
+    def models(self, model):
+        models = [(model, self.deadline)]
+        if self.fallback_model and self.fallback_model != model:
+            models.append((self.fallback_model, self.fallback_deadline))
+        return models
+
+    def hedge_threshold(self, model):
+        tracker = self.latencies[model]
+        if len(tracker) < self.hedge_min_samples:
+            return self.hedge_after
+        return tracker.percentile(self.hedge_percentile)
+
+    def _count(self, counter, model):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        record_gpt_event(counter, model)
+
+    def _take_hedge(self, model):
+        with self._lock:
+            if self.hedges >= self.hedge_budget * self.calls + 1:
+                return False
+            self.hedges += 1
+        record_gpt_event("hedges", model)
+        return True
+
+    def _won(self, opened, hedged):
+        self.latencies[opened.model].observe(opened.first_token_seconds)
+        record_gpt_latency(opened.model, opened.first_token_seconds)
+        if hedged:
+            self._count("hedge_wins", opened.model)
+        return opened
+
+    # The deadline counts as a latency sample, so a model that keeps missing
+    # it gets hedged sooner
+    def _missed(self, model, deadline):
+        self.latencies[model].observe(deadline)
+        self._count("deadlines_missed", model)
+        return GPTDeadlineError(f"{model} sent no token within {deadline:g}s")
+
+    # Time to wait before the next check: the hedge time, if still ahead, or the deadline
+    @staticmethod
+    def _wait_time(started_at, hedge_at, deadline):
+        wake_at = started_at + deadline
+        if hedge_at is not None:
+            wake_at = min(wake_at, hedge_at)
+        return max(wake_at - time.monotonic(), 0)
+
+    def _start(self, params, hedged=False):
+        cancelled = threading.Event()
+        future = submit_timed(open_stream, self.create, params, cancelled, executor=self.executor or get_gpt_executor())
+        future.cancelled_event = cancelled
+        future.hedged = hedged
+        return future
+
+    # One attempt, plus a hedge if it is slow; returns the first stream to produce a token
+    def _race(self, params, deadline):
+        model = params["model"]
+        started_at = time.monotonic()
+        hedge_at = started_at + self.hedge_threshold(model) if self.hedge else None
+        pending = [self._start(params)]
+        error = None
+        try:
+            while pending:
+                done, _ = wait(pending, timeout=self._wait_time(started_at, hedge_at, deadline), return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    if future.exception() is None:
+                        return self._won(future.result(), future.hedged)
+                    error = future.exception()
+                now = time.monotonic()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if pending and self._take_hedge(model):
+                        pending.append(self._start(params, hedged=True))
+                if pending and now - started_at >= deadline:
+                    raise self._missed(model, deadline)
+            raise error
+        finally:
+            for future in pending:
+                future.cancelled_event.set()
+                future.cancel()
+                future.add_done_callback(close_result)
+
+    # Open a streamed completion for chat.completions.create params. Raises
+    # GPTUnavailableError once the primary and fallback models have both failed.
+    def open(self, params):
+        with self._lock:
+            self.calls += 1
+        error = None
+        for index, (model, deadline) in enumerate(self.models(params["model"])):
+            if index:
+                self._count("fallbacks", model)
+            try:
+                return retry_with_backoff(
+                    lambda: self._race({**params, "model": model}, deadline),
+                    retries=self.retries,
+                    base_delay=self.retry_base_delay,
+                    max_delay=RETRY_MAX_DELAY,
+                    give_up_on=non_retryable_errors(),
+                )
+            except Exception as e:
+                error = e
+        raise GPTUnavailableError(f"No answer from {' or '.join(model for model, _ in self.models(params['model']))}: {error}") from error
+
+    async def _race_async(self, client, params, deadline):
+        model = params["model"]
+        started_at = time.monotonic()
+        hedge_at = started_at + self.hedge_threshold(model) if self.hedge else None
+        pending = {asyncio.create_task(open_stream_async(client, params)): False}  # task -> hedged
+        error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=self._wait_time(started_at, hedge_at, deadline), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    hedged = pending.pop(task)
+                    if task.exception() is None:
+                        return self._won(task.result(), hedged)
+                    error = task.exception()
+                now = time.monotonic()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if pending and self._take_hedge(model):
+                        pending[asyncio.create_task(open_stream_async(client, params))] = True
+                if pending and now - started_at >= deadline:
+                    raise self._missed(model, deadline)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()  # A loser that already has its stream open is closed instead
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    await task.result().aclose()
+
+    async def open_async(self, client, params):
+        with self._lock:
+            self.calls += 1
+        give_up_on = non_retryable_errors()
+        error = None
+        for index, (model, deadline) in enumerate(self.models(params["model"])):
+            if index:
+                self._count("fallbacks", model)
+            for attempt in range(self.retries + 1):
+                try:
+                    return await self._race_async(client, {**params, "model": model}, deadline)
+                except give_up_on as e:
+                    error = e
+                    break
+                except Exception as e:
+                    error = e
+                    if attempt < self.retries:
+                        await asyncio.sleep(backoff_delay(attempt, self.retry_base_delay, RETRY_MAX_DELAY))
+        raise GPTUnavailableError(f"No answer from {' or '.join(model for model, _ in self.models(params['model']))}: {error}") from error
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "deadlines_missed": self.deadlines_missed,
+            "first_token_p50": {model: tracker.percentile(0.5) for model, tracker in self.latencies.items()},
+            "hedge_after": {model: self.hedge_threshold(model) for model in self.latencies},
+        }
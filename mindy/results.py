@@ -0,0 +1,231 @@
+import argparse
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+
+from mindy.config import ROOT_DIR
+
+
+# Simulation results as Parquet files partitioned by run (hive layout,
+# run_id=<id>/part-00000.parquet). Each run appends its own partition, and
+# readers only open the columns and row groups a query needs, so the store
+# can grow well past memory.
+RESULTS_DIR = os.getenv("MINDY_RESULTS_DIR", os.path.join(ROOT_DIR, "data analysis", "results"))
+ROWS_PER_FILE = 100_000
+
+# Column names match the simulation CSV, so analyses work on either source
+COLUMNS = [
+    ("Query ID", "int32"),
+    ("Query", "string"),
+    ("Category", "string"),
+    ("Technique", "string"),
+    ("Description", "string"),
+    ("Keywords", "string"),
+    ("Video Title", "string"),
+    ("Video Description", "string"),
+    ("Similarity Score", "float64"),
+    ("Video Link", "string"),
+]
+RUN_ID_COLUMN = "run_id"
+
+
+# pyarrow is imported on first use so the app and simulator start without it
+def results_schema(with_run_id=False):
+    import pyarrow as pa
+    fields = [pa.field(name, getattr(pa, type_name)()) for name, type_name in COLUMNS]
+    if with_run_id:
+        fields.append(pa.field(RUN_ID_COLUMN, pa.string()))
+    return pa.schema(fields)
+
+
+def new_run_id():
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+
+
+# Buffers rows and writes every rows_per_group of them as one row group of the
+# run's current file, which is finished after rows_per_file rows. A file is
+# filled under a hidden temporary name (skipped by dataset readers) and renamed
+# once complete, so readers never see a partial file. Rows are lists or dicts
+# in COLUMNS order.
+class ResultWriter:
+    def __init__(self, run_id=None, store_dir=RESULTS_DIR, rows_per_file=ROWS_PER_FILE, rows_per_group=None, overwrite=False):
+        self.run_id = run_id or new_run_id()
+        self.partition_dir = os.path.join(store_dir, f"{RUN_ID_COLUMN}={self.run_id}")
+        self.rows_per_file = rows_per_file
+        self.rows_per_group = rows_per_group or rows_per_file
+        self.rows = []
+        self.file_writer = None  # pq.ParquetWriter of the file being filled
+        self.file_rows = 0
+        self.files_written = 0
+        self.rows_written = 0
+        if overwrite and os.path.isdir(self.partition_dir):
+            shutil.rmtree(self.partition_dir)  # Rewrite the whole run, e.g. after a resumed simulation
+        os.makedirs(self.partition_dir, exist_ok=True)
+        self.file_number = len([name for name in os.listdir(self.partition_dir) if name.endswith(".parquet")])
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.rows_per_group:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def append_table(self, table):
+        self.flush()
+        self._write(table.cast(results_schema()))
+
+    # Write the buffered rows as a row group
+    def flush(self):
+        if not self.rows:
+            return
+        import pyarrow as pa
+
+        names = [name for name, _ in COLUMNS]
+        rows = [row if isinstance(row, dict) else dict(zip(names, row)) for row in self.rows]
+        self.rows = []
+        self._write(pa.Table.from_pylist(rows, schema=results_schema()))
+
+    def _paths(self):
+        name = f"part-{self.file_number:05d}.parquet"
+        return os.path.join(self.partition_dir, name), os.path.join(self.partition_dir, f".{name}.tmp")
+
+    def _write(self, table):
+        import pyarrow.parquet as pq
+
+        if self.file_writer is None:
+            self.file_writer = pq.ParquetWriter(self._paths()[1], results_schema(), compression="zstd")
+        self.file_writer.write_table(table)
+        self.file_rows += table.num_rows
+        self.rows_written += table.num_rows
+        if self.file_rows >= self.rows_per_file:
+            self._finish_file()
+
+    def _finish_file(self):
+        path, tmp_path = self._paths()
+        self.file_writer.close()
+        self.file_writer = None
+        os.replace(tmp_path, path)
+        self.file_number += 1
+        self.files_written += 1
+        self.file_rows = 0
+
+    def close(self):
+        self.flush()
+        if self.file_writer is not None:
+            self._finish_file()
+
+    # Drop the unfinished file; e.g. a failed simulation rebuilds it from its journal
+    def discard(self):
+        self.rows = []
+        if self.file_writer is not None:
+            self.file_writer.close()
+            self.file_writer = None
+            os.remove(self._paths()[1])
+            self.rows_written -= self.file_rows
+            self.file_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+def results_dataset(store_dir=RESULTS_DIR):
+    import pyarrow.dataset as ds
+    return ds.dataset(store_dir, format="parquet", partitioning="hive", schema=results_schema(with_run_id=True))
+
+
+# Filters are a pyarrow expression or DNF tuples as in pandas.read_parquet,
+# e.g. [("Category", "==", "All"), ("Similarity Score", ">", 0.2)]
+def filter_expression(filters=None, run_ids=None):
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    expression = None
+    if filters is not None:
+        expression = filters if isinstance(filters, ds.Expression) else pq.filters_to_expression(filters)
+    if run_ids is not None:
+        run_filter = ds.field(RUN_ID_COLUMN).isin(list(run_ids))
+        expression = run_filter if expression is None else expression & run_filter
+    return expression
+
+
+# Record batches with only the requested columns and matching rows; partitions
+# and row groups excluded by the filter are skipped without being read
+def iter_results(columns=None, filters=None, run_ids=None, store_dir=RESULTS_DIR, batch_size=65_536):
+    scanner = results_dataset(store_dir).scanner(
+        columns=columns, filter=filter_expression(filters, run_ids), batch_size=batch_size
+    )
+    yield from scanner.to_batches()
+
+
+def read_results_table(columns=None, filters=None, run_ids=None, store_dir=RESULTS_DIR):
+    return results_dataset(store_dir).to_table(columns=columns, filter=filter_expression(filters, run_ids))
+
+
+def read_results(columns=None, filters=None, run_ids=None, store_dir=RESULTS_DIR):
+    return read_results_table(columns, filters, run_ids, store_dir).to_pandas()
+
+
+def list_runs(store_dir=RESULTS_DIR):
+    if not os.path.isdir(store_dir):
+        return []
+    prefix = f"{RUN_ID_COLUMN}="
+    return sorted(name[len(prefix):] for name in os.listdir(store_dir) if name.startswith(prefix))
+
+
+# Stream a simulation CSV into the store in blocks, filling columns it lacks
+# (older runs logged no videos) with nulls. Returns the writer's row count.
+def convert_csv(csv_path, run_id="legacy-csv", store_dir=RESULTS_DIR, block_size=16 << 20):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    schema = results_schema()
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types={name: schema.field(name).type for name in schema.names}),
+    )
+    with ResultWriter(run_id, store_dir=store_dir, overwrite=True) as writer:
+        pending = []
+        pending_rows = 0
+        for batch in reader:
+            columns = [
+                batch.column(name) if name in batch.schema.names else pa.nulls(batch.num_rows, schema.field(name).type)
+                for name in schema.names
+            ]
+            pending.append(pa.RecordBatch.from_arrays(columns, schema=schema))
+            pending_rows += batch.num_rows
+            if pending_rows >= writer.rows_per_file:
+                writer.append_table(pa.Table.from_batches(pending, schema=schema))
+                pending, pending_rows = [], 0
+        if pending:
+            writer.append_table(pa.Table.from_batches(pending, schema=schema))
+    return writer.rows_written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the partitioned Parquet store of simulation results.")
+    parser.add_argument("--store", default=RESULTS_DIR, help="Store directory")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    convert = subcommands.add_parser("convert", help="Import a simulation results CSV as one run")
+    convert.add_argument("csv_path", nargs="?", default=os.path.join(ROOT_DIR, "data analysis", "simulation_results.csv"))
+    convert.add_argument("--run-id", default="legacy-csv", help="Run ID to store the rows under (replaces that run)")
+    subcommands.add_parser("runs", help="List stored runs with their row counts")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        rows = convert_csv(args.csv_path, run_id=args.run_id, store_dir=args.store)
+        print(f"Stored {rows} rows from {args.csv_path} as run {args.run_id} in {args.store}.")
+    else:
+        for run_id in list_runs(args.store):
+            rows = read_results_table(columns=[], run_ids=[run_id], store_dir=args.store).num_rows
+            print(f"{run_id}\t{rows} rows")
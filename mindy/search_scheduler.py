@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+
+from mindy.config import env_float, env_int
+from mindy.youtube import cached_youtube_search, canonical_query, query_terms, video_cache_key
+
+
+# Also merge a search into a recent one with the same filters whose terms
+# overlap at least this much (Jaccard); 1 turns merging off
+NEAR_DUPLICATE_JACCARD = env_float("MINDY_SEARCH_DEDUP_JACCARD", 0.9)
+RECENT_SEARCHES = env_int("MINDY_SEARCH_DEDUP_WINDOW", 2048)
+
+
+def search_filters(request_params):
+    return tuple(sorted((key, value) for key, value in request_params.items() if key != "q"))
+
+
+# Deduplicates searches across techniques and sessions: equivalent requests
+# share one cache key (see mindy.youtube.canonical_query), near-duplicates are
+# pointed at a recent equivalent search, and a search already running for
+# another caller is waited on instead of repeated.
+# Quota is spent through the ledger, so interactive searches can use the whole
+# day's budget while background ones leave the interactive reserve.
+class SearchScheduler:
+    def __init__(self, near_duplicate_jaccard=NEAR_DUPLICATE_JACCARD, window=RECENT_SEARCHES):
+        self.near_duplicate_jaccard = near_duplicate_jaccard
+        self.window = window
+        self.searches = 0
+        self.shared = 0
+        self.merged = 0
+        self._in_flight = {}
+        self._recent = OrderedDict()  # (filters, canonical query) -> (terms, query sent)
+        self._lock = threading.Lock()
+
+    def _near_duplicate(self, filters, terms):
+        if self.near_duplicate_jaccard >= 1 or not terms:
+            return None
+        for (recent_filters, _), (recent_terms, sent) in reversed(self._recent.items()):
+            if recent_filters == filters and len(terms & recent_terms) / len(terms | recent_terms) >= self.near_duplicate_jaccard:
+                return sent
+        return None
+
+    # The request to send: unchanged, unless it is merged into a recent
+    # near-duplicate, whose query (as that caller sent it) it then takes over.
+    # The canonical query is only ever used as the key.
+    def merge_request(self, request_params):
+        terms = query_terms(request_params["q"])
+        if not terms:
+            return request_params
+        key = (search_filters(request_params), canonical_query(request_params["q"]))
+        with self._lock:
+            if key not in self._recent:
+                match = self._near_duplicate(key[0], terms)
+                if match is not None:
+                    self.merged += 1
+                    request_params = {**request_params, "q": match}
+                    key = (key[0], canonical_query(match))
+            self._recent[key] = self._recent.get(key, (terms, request_params["q"]))
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.window:
+                self._recent.popitem(last=False)
+        return request_params
+
+    def search(self, youtube, request_params, background=False):
+        request_params = self.merge_request(request_params)
+        key = video_cache_key(request_params)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.searches += 1
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            videos = cached_youtube_search(youtube, request_params, background=background)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(videos)
+            return videos
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self):
+        return {"searches": self.searches, "shared": self.shared, "merged": self.merged}
+
+
+# One scheduler per process, shared by every session
+@lru_cache(maxsize=None)
+def get_search_scheduler():
+    return SearchScheduler()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from mindy.config import CACHE_DIR, env_int
+from mindy.local_index import get_local_index
+from mindy.ranking import Ranker, video_text
+
+try:
+    import faiss
+except ImportError:
+    faiss = None  # Fall back to exact search with numpy
+
+
+EMBEDDING_MODEL = os.getenv("MINDY_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = env_int("MINDY_EMBEDDING_BATCH_SIZE", 64)
+EMBEDDING_DIR = os.path.join(CACHE_DIR, "video_embeddings")
+
+# Harvested videos retrieved from the ANN index and ranked along with each
+# technique's search results; 0 ranks the search results only
+NEIGHBOURS = env_int("MINDY_SEMANTIC_NEIGHBOURS", 5)
+
+
+# Loaded once per process; Streamlit reruns reuse the imported module
+@lru_cache(maxsize=None)
+def get_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+# Embed a batch of texts as L2-normalized float32 rows, so dot products are cosines
+def embed_texts(texts):
+    model = get_embedding_model()
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    return model.encode(
+        list(texts), batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True, convert_to_numpy=True
+    ).astype(np.float32)
+
+
+# Same embeddings, encoded by one worker process per CPU core; for offline
+# jobs large enough to pay for starting the workers
+def embed_texts_multiprocess(texts, processes=None):
+    model = get_embedding_model()
+    pool = model.start_multi_process_pool(["cpu"] * (processes or os.cpu_count() or 1))
+    try:
+        return model.encode_multi_process(
+            list(texts), pool, batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True
+        ).astype(np.float32)
+    finally:
+        model.stop_multi_process_pool(pool)
+
+
+# Video embeddings computed offline: a memory-mapped matrix, the video id of each
+# row, and an HNSW index over the rows for approximate nearest-neighbour search
+class VideoEmbeddingStore:
+    def __init__(self, directory=EMBEDDING_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "video_ids.json"), encoding="utf-8") as file:
+            self.video_ids = json.load(file)
+        self.rows = {video_id: row for row, video_id in enumerate(self.video_ids)}
+        self.embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+
+        index_path = os.path.join(directory, "videos.faiss")
+        self.ann_index = faiss.read_index(index_path) if faiss is not None and os.path.exists(index_path) else None
+
+    @classmethod
+    def build(cls, videos, directory=EMBEDDING_DIR):
+        videos = list(videos)
+        embeddings = embed_texts([video_text(video) for video in videos])
+
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "embeddings.npy"), embeddings)
+        with open(os.path.join(directory, "video_ids.json"), "w", encoding="utf-8") as file:
+            json.dump([video["video_id"] for video in videos], file)
+        if faiss is not None and len(embeddings):
+            ann_index = faiss.IndexHNSWFlat(embeddings.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            ann_index.add(embeddings)
+            faiss.write_index(ann_index, os.path.join(directory, "videos.faiss"))
+        return cls(directory)
+
+    @classmethod
+    def load(cls, directory=EMBEDDING_DIR):
+        if not os.path.exists(os.path.join(directory, "video_ids.json")):
+            return None
+        return cls(directory)
+
+    # Nearest videos for each query embedding, as lists of (video_id, score)
+    def search(self, query_embeddings, k=10):
+        if self.ann_index is not None:
+            scores, rows = self.ann_index.search(np.ascontiguousarray(query_embeddings, dtype=np.float32), k)
+        else:
+            similarities = query_embeddings @ np.asarray(self.embeddings).T
+            rows = np.argsort(-similarities, axis=1)[:, :k]
+            scores = np.take_along_axis(similarities, rows, axis=1)
+        return [
+            [(self.video_ids[row], float(score)) for row, score in zip(row_ids, row_scores) if row >= 0]
+            for row_ids, row_scores in zip(rows, scores)
+        ]
+
+
+# Ranks by cosine similarity of sentence embeddings. Queries are embedded in one
+# batch, and videos reuse their precomputed embedding when one exists.
+class SemanticRanker(Ranker):
+    def __init__(self, store=None, neighbours=NEIGHBOURS):
+        self.store = store
+        self.neighbours = neighbours
+
+    # Embeddings for videos given by ID, embedding text_of(position) only for
+    # videos without a stored embedding
+    def embed_ids(self, video_ids, text_of):
+        embeddings = np.zeros((len(video_ids), get_embedding_model().get_sentence_embedding_dimension()), dtype=np.float32)
+        missing = []
+        for position, video_id in enumerate(video_ids):
+            row = self.store.rows.get(video_id) if self.store is not None else None
+            if row is None:
+                missing.append(position)
+            else:
+                embeddings[position] = self.store.embeddings[row]
+        if missing:
+            embeddings[missing] = embed_texts([text_of(position) for position in missing])
+        return embeddings
+
+    def embed_videos(self, videos):
+        return self.embed_ids([video["video_id"] for video in videos], lambda position: video_text(videos[position]))
+
+    def score(self, queries, videos):
+        return embed_texts(queries) @ self.embed_videos(videos).T
+
+    def score_texts(self, queries, texts):
+        return embed_texts(queries) @ embed_texts(texts).T
+
+    def score_pool(self, queries, pool):
+        return embed_texts(queries) @ self.embed_ids(
+            [str(video_id) for video_id in pool.video_ids],
+            lambda position: pool.titles[position] + " " + pool.descriptions[position],
+        ).T
+
+    # The closest harvested videos for each query from the ANN index, with
+    # their titles and links from the local index they were embedded from
+    def retrieve(self, queries, k):
+        if self.store is None or k <= 0:
+            return [[] for _ in queries]
+        neighbours = self.store.search(embed_texts(queries), k)
+        videos = get_local_index().get_videos([video_id for row in neighbours for video_id, _ in row])
+        return [[videos[video_id] for video_id, _ in row if video_id in videos] for row in neighbours]
+
+
+@lru_cache(maxsize=None)
+def get_semantic_ranker():
+    return SemanticRanker(VideoEmbeddingStore.load())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute video embeddings and the ANN index from the local video index.")
+    parser.parse_args()
+
+    store = VideoEmbeddingStore.build(get_local_index().iter_videos())
+    print(f"Embedded {len(store.video_ids)} videos with {EMBEDDING_MODEL} into {EMBEDDING_DIR}.")
@@ -0,0 +1,330 @@
+import argparse
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+
+from mindy.config import env_float, env_int
+from mindy.extraction import techniques_from_answer
+from mindy.gpt import completion_cache_keys, get_resilient_completions, request_completion_async
+from mindy.prompts import GPT_OUTPUT_FORMAT
+from mindy.ranking import get_ranker
+from mindy.resilience import GPTUnavailableError
+from mindy.search_scheduler import get_search_scheduler
+from mindy.structured import InvalidRecommendationsError, parse_recommendations, render_markdown
+from mindy.telemetry import TELEMETRY_ENABLED, metrics, start_trace
+from mindy.youtube import (
+    QuotaExceededError,
+    build_youtube_client,
+    cached_youtube_search_async,
+    enrich_videos,
+    video_cache_key,
+)
+
+
+# Headless recommendation API: the generate -> extract -> fetch -> rank flow of
+# the app as HTTP endpoints, served by one event loop per worker. Upstream calls
+# go through pooled async clients, identical in-flight GPT calls and searches
+# are coalesced into one, and load beyond the limits below is shed with 503s
+# instead of queueing without bound.
+MAX_IN_FLIGHT = env_int("MINDY_SERVICE_MAX_IN_FLIGHT", 256)
+GPT_CONCURRENCY = env_int("MINDY_SERVICE_GPT_CONCURRENCY", 32)
+YOUTUBE_CONCURRENCY = env_int("MINDY_SERVICE_YOUTUBE_CONCURRENCY", 32)
+QUEUE_TIMEOUT = env_float("MINDY_SERVICE_QUEUE_TIMEOUT", 10.0)  # Seconds to wait for an upstream slot
+HTTP_POOL_SIZE = env_int("MINDY_SERVICE_HTTP_POOL", 64)
+RETRY_AFTER_SECONDS = "1"
+
+# Search parameters used by the simulator for technique videos
+SEARCH_DEFAULTS = {"part": "snippet", "type": "video", "order": "relevance", "videoDuration": "medium", "videoDefinition": "high"}
+
+
+class ServiceBusyError(Exception):
+    pass
+
+
+# Callers asking for a result that is already being computed await the same
+# task instead of starting another upstream call. The task is shielded, so a
+# client disconnecting does not cancel it for the others.
+class Coalescer:
+    def __init__(self, name):
+        self.name = name
+        self.in_flight = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, make_call):
+        task = self.in_flight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(make_call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.finish(key, done))
+        else:
+            self.coalesced += 1
+            if TELEMETRY_ENABLED:
+                metrics.inc("mindy_service_coalesced_total", description="Calls served by an in-flight call", call=self.name)
+        return await asyncio.shield(task)
+
+    def finish(self, key, task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller has gone away
+
+
+# Wait for a slot to call an upstream API, or give up after QUEUE_TIMEOUT
+@asynccontextmanager
+async def upstream_slot(semaphore, name):
+    try:
+        await asyncio.wait_for(semaphore.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ServiceBusyError(f"Timed out waiting for a {name} slot") from None
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+# Clients, limits and coalescers shared by every request in a worker
+class ServiceState:
+    def __init__(self, openai_client, http_client, youtube):
+        self.openai_client = openai_client
+        self.http_client = http_client
+        self.youtube = youtube  # Discovery client for the batched videos.list enrichment
+        self.youtube_api_key = os.getenv("YOUTUBE_API_KEY")
+        self.gpt_slots = asyncio.Semaphore(GPT_CONCURRENCY)
+        self.youtube_slots = asyncio.Semaphore(YOUTUBE_CONCURRENCY)
+        self.gpt_calls = Coalescer("gpt")
+        self.searches = Coalescer("youtube.search")
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def completion(self, query, category, output_format, bypass_cache=False):
+        async def call():
+            async with upstream_slot(self.gpt_slots, "GPT"):
+                return await request_completion_async(
+                    self.openai_client, query, category, output_format, bypass_cache=bypass_cache
+                )
+
+        cache_key, _ = completion_cache_keys(query, category, output_format)
+        return await self.gpt_calls.run((cache_key, bypass_cache), call)
+
+    # Keyed and merged like the app's searches, so equivalent keyword sets share a call
+    async def search(self, request_params):
+        request_params = get_search_scheduler().merge_request(request_params)
+
+        async def call():
+            async with upstream_slot(self.youtube_slots, "YouTube"):
+                return await cached_youtube_search_async(self.http_client, self.youtube_api_key, request_params)
+
+        return await self.searches.run(video_cache_key(request_params), call)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "coalescing": {
+                coalescer.name: {"started": coalescer.started, "coalesced": coalescer.coalesced}
+                for coalescer in (self.gpt_calls, self.searches)
+            },
+            "gpt_calls": get_resilient_completions().stats(),
+        }
+
+
+@asynccontextmanager
+async def lifespan(app):
+    import httpx
+    import openai  # The OpenAI SDK takes about a second to import
+
+    limits = httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+    # Retries, deadlines and the fallback model are handled by mindy.resilience
+    openai_client = openai.AsyncOpenAI(max_retries=0, http_client=openai.DefaultAsyncHttpxClient(limits=limits))
+    http_client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(15.0))
+    await asyncio.to_thread(get_ranker)  # Load the ranking model before the first request
+    youtube = await asyncio.to_thread(build_youtube_client, os.getenv("YOUTUBE_API_KEY"))
+    app.state.service = ServiceState(openai_client, http_client, youtube)
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+        await openai_client.close()
+
+
+app = FastAPI(title="Mindy recommendations", lifespan=lifespan)
+
+
+# Shed load once MAX_IN_FLIGHT requests are being served; health checks and
+# metrics are always answered
+@app.middleware("http")
+async def admission_control(request, call_next):
+    service = request.app.state.service
+    if request.url.path in ("/healthz", "/metrics"):
+        return await call_next(request)
+    if service.in_flight >= MAX_IN_FLIGHT:
+        service.rejected += 1
+        return JSONResponse(
+            {"detail": "Too many requests in flight"}, status_code=503, headers={"Retry-After": RETRY_AFTER_SECONDS}
+        )
+    service.in_flight += 1
+    try:
+        return await call_next(request)
+    finally:
+        service.in_flight -= 1
+
+
+@app.exception_handler(ServiceBusyError)
+async def busy_handler(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+
+@app.exception_handler(QuotaExceededError)
+async def quota_handler(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=429)
+
+
+@app.exception_handler(GPTUnavailableError)
+async def gpt_unavailable_handler(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+
+@app.exception_handler(InvalidRecommendationsError)
+async def invalid_answer_handler(request, exc):
+    return JSONResponse({"detail": f"Invalid model answer: {exc}"}, status_code=502)
+
+
+class RecommendationRequest(BaseModel):
+    query: str = Field(min_length=1)
+    category: str = "All"
+    output_format: str = GPT_OUTPUT_FORMAT
+    bypass_cache: bool = False
+
+
+class ExtractRequest(BaseModel):
+    text: str
+    output_format: str = GPT_OUTPUT_FORMAT
+
+
+class VideoRequest(BaseModel):
+    technique: str = Field(min_length=1)
+    keywords: list[str] = []
+    max_results: int = Field(5, ge=1, le=50)
+
+
+class RankRequest(BaseModel):
+    query: str
+    videos: list[dict]
+
+
+class PipelineRequest(RecommendationRequest):
+    max_results: int = Field(5, ge=1, le=50)
+    top_n: int = Field(3, ge=1, le=50)
+
+
+def enriched_query(technique_data):
+    return " ".join([technique_data["technique"]] + list(technique_data["keywords"]))
+
+
+def check_output_format(output_format):
+    if output_format not in ("markdown", "json"):
+        raise HTTPException(422, f"Unknown output format {output_format!r}")
+
+
+async def recommend(service, request):
+    check_output_format(request.output_format)
+    answer = await service.completion(request.query, request.category, request.output_format, request.bypass_cache)
+    techniques = techniques_from_answer(answer, request.output_format)
+    if request.output_format == "json":
+        answer = render_markdown(parse_recommendations(answer))
+    return answer, techniques
+
+
+async def technique_videos(service, technique_data, max_results):
+    return await service.search({**SEARCH_DEFAULTS, "q": enriched_query(technique_data), "maxResults": max_results})
+
+
+@app.get("/healthz")
+async def healthz(request: Request):
+    return {"status": "ok", **request.app.state.service.stats()}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# GPT recommendations and the techniques extracted from them
+@app.post("/recommendations")
+async def recommendations_endpoint(body: RecommendationRequest, request: Request):
+    with start_trace("service.recommendations", query=body.query, category=body.category):
+        answer, techniques = await recommend(request.app.state.service, body)
+    return {"recommendations": answer, "techniques": techniques}
+
+
+@app.post("/extract")
+async def extract_endpoint(body: ExtractRequest):
+    check_output_format(body.output_format)
+    return {"techniques": techniques_from_answer(body.text, body.output_format)}
+
+
+# Ranked videos for one technique
+@app.post("/videos")
+async def videos_endpoint(body: VideoRequest, request: Request):
+    technique_data = {"technique": body.technique, "keywords": body.keywords}
+    with start_trace("service.videos", technique=body.technique):
+        service = request.app.state.service
+        query = enriched_query(technique_data)
+        videos = await technique_videos(service, technique_data, body.max_results)
+        video_lists = await asyncio.to_thread(get_ranker().with_neighbours, [query], [videos])
+        videos = (await asyncio.to_thread(enrich_videos, service.youtube, video_lists))[0]
+        ranked = await asyncio.to_thread(get_ranker().rank, query, videos)
+    return {"videos": ranked}
+
+
+@app.post("/rank")
+async def rank_endpoint(body: RankRequest):
+    return {"videos": await asyncio.to_thread(get_ranker().rank, body.query, body.videos)}
+
+
+# The whole flow: recommendations, then every technique's videos fetched
+# concurrently, enriched in one videos.list call and ranked in one pass. A technique whose search fails is
+# returned without videos, as in the app.
+@app.post("/pipeline")
+async def pipeline_endpoint(body: PipelineRequest, request: Request):
+    service = request.app.state.service
+    with start_trace("service.pipeline", query=body.query, category=body.category):
+        answer, techniques = await recommend(service, body)
+        results = await asyncio.gather(
+            *(technique_videos(service, technique_data, body.max_results) for technique_data in techniques),
+            return_exceptions=True,
+        )
+        queries = [enriched_query(technique_data) for technique_data in techniques]
+        video_lists = [[] if isinstance(result, Exception) else result for result in results]
+        video_lists = await asyncio.to_thread(get_ranker().with_neighbours, queries, video_lists)
+        video_lists = await asyncio.to_thread(enrich_videos, service.youtube, video_lists)
+        ranked_lists = await asyncio.to_thread(get_ranker().rank_many, queries, video_lists)
+    return {
+        "recommendations": answer,
+        "techniques": [
+            {
+                **technique_data,
+                "videos": ranked[:body.top_n],
+                **({"error": f"{type(result).__name__}: {result}"} if isinstance(result, Exception) else {}),
+            }
+            for technique_data, ranked, result in zip(techniques, ranked_lists, results)
+        ],
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the recommendation pipeline as an HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own event loop")
+    args = parser.parse_args()
+
+    uvicorn.run("mindy.service:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
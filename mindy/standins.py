@@ -0,0 +1,494 @@
+import argparse
+import csv
+import email.parser
+import email.policy
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from mindy.ranking import CORPUS_PATH
+
+
+# Results a search pages through before nextPageToken runs out
+SEARCH_TOTAL_RESULTS = 500
+
+# Lognormal latency around a median (seconds); sigma controls the tail
+class LatencyModel:
+    def __init__(self, median, sigma=0.5):
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self, rng):
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.sigma * rng.gauss(0, 1))
+
+
+# GPT answers and search results replayed from a simulation results CSV. Logged
+# techniques are rendered back into the markdown format the prompt asks for;
+# when the log has no video columns, techniques double as video snippets.
+class ReplayPayloads:
+    def __init__(self, csv_path=CORPUS_PATH):
+        self.answers = defaultdict(list)
+        self.videos = []
+        with open(csv_path, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            has_videos = {"Video Title", "Video Description", "Video Link"} <= set(reader.fieldnames)
+            for row in reader:
+                self.answers[(row["Query"], row["Category"])].append(row)
+                if has_videos:
+                    video_id = parse_qs(urlparse(row["Video Link"]).query).get("v", [""])[0]
+                    self.videos.append((video_id, row["Video Title"], row["Video Description"]))
+                else:
+                    video_id = hashlib.sha1((row["Technique"] + row["Description"]).encode("utf-8")).hexdigest()[:11]
+                    self.videos.append((video_id, row["Technique"], row["Description"]))
+        self.answer_keys = sorted(self.answers)
+
+    @staticmethod
+    def stable_index(text, modulo):
+        return int(hashlib.sha1(text.encode("utf-8")).hexdigest(), 16) % modulo
+
+    # Rows logged for the query quoted in the prompt, or a stable pick otherwise
+    def answer_rows(self, prompt):
+        query = prompt.split('The user has asked: ', 1)[-1].split('"')[1] if '"' in prompt else ""
+        category = prompt.split("category: **", 1)[1].split("**", 1)[0] if "category: **" in prompt else "All"
+        rows = self.answers.get((query, category)) or self.answers.get((query, "All"))
+        if not rows:
+            key = self.answer_keys[self.stable_index(prompt, len(self.answer_keys))]
+            query, rows = key[0], self.answers[key]
+        return query, rows
+
+    def completion(self, prompt):
+        query, rows = self.answer_rows(prompt)
+        lines = [f"# {query}", "", "## Recommendations"]
+        lines += [f"{number}. **{row['Technique']}**: {row['Description']}" for number, row in enumerate(rows, start=1)]
+        lines += ["", "## Note", "Focus on actionable advice. Avoid vague suggestions."]
+        return "\n".join(lines)
+
+    # JSON output mode answer, following the prompt's 2 to 3 sentence descriptions
+    def structured_completion(self, prompt):
+        query, rows = self.answer_rows(prompt)
+        return json.dumps({
+            "title": query,
+            "techniques": [
+                {
+                    "name": row["Technique"],
+                    "description": " ".join(re.split(r"(?<=[.!?])\s+", row["Description"])[:2]),
+                    "keywords": row["Keywords"].split()[:5],
+                }
+                for row in rows
+            ],
+        })
+
+    def video_details(self, video_id):
+        seed = self.stable_index(video_id, 2 ** 32)
+        views = int(10 ** (2 + (seed % 1000) / 200))  # 100 to 10M, log-uniform
+        seconds = 60 + seed % 1800
+        return {
+            "kind": "youtube#video",
+            "id": video_id,
+            "contentDetails": {"duration": f"PT{seconds // 60}M{seconds % 60}S", "definition": "hd" if seed % 3 else "sd"},
+            "statistics": {"viewCount": str(views), "likeCount": str(views * (seed % 60) // 1000)},
+        }
+
+    def search(self, query, max_results, offset=0):
+        start = self.stable_index(query, len(self.videos)) + offset
+        return [
+            {
+                "kind": "youtube#searchResult",
+                "id": {"kind": "youtube#video", "videoId": video_id},
+                "snippet": {"title": title, "description": description},
+            }
+            for video_id, title, description in (
+                self.videos[(start + position) % len(self.videos)] for position in range(max_results)
+            )
+        ]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Fail a request at the configured rate, like a throttled or flaky upstream
+    def maybe_fail(self, error_rate):
+        if self.server.draw() >= error_rate:
+            return False
+        status = 429 if self.server.draw() < 0.5 else 500
+        self.send_json(status, {"error": {"code": status, "message": "Injected stand-in failure"}})
+        return True
+
+    # OpenAI paths with or without the /v1 prefix of the base URL
+    def openai_path(self):
+        path = urlparse(self.path).path.rstrip("/")
+        return path[len("/v1"):] if path.startswith("/v1/") else path
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        path = self.openai_path()
+        if path == "/files":
+            self.upload_file()
+        elif path == "/batches":
+            self.create_batch()
+        elif path == "/chat/completions":
+            self.chat_completion()
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def chat_completion(self):
+        request = json.loads(self.read_body() or b"{}")
+        self.server.count("chat.completions")
+        if self.maybe_fail(self.server.openai_error_rate):
+            return
+
+        content, usage = self.server.completion_content(request)
+        # Generation time grows with the length of the answer
+        latency = self.server.sample_latency(self.server.openai_latency)
+        latency += self.server.openai_token_latency * usage["completion_tokens"]
+        completion_id = f"chatcmpl-standin-{int(time.time() * 1000)}"
+        if not request.get("stream"):
+            time.sleep(latency)
+            self.send_json(200, self.server.completion_response(request, content, usage))
+            return
+
+        # Stream line by line: a fifth of the latency before the first token, the rest spread over the lines
+        chunks = [line + "\n" for line in content.split("\n")]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(latency * 0.2)
+        try:
+            for chunk in chunks:
+                event = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": request.get("model", "gpt-4"),
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(latency * 0.8 / len(chunks))
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream, as a hedged call does with the slower answer
+            self.server.count("chat.completions.cancelled")
+            self.close_connection = True
+            return
+        if request.get("stream_options", {}).get("include_usage"):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4"),
+                "choices": [],
+                "usage": usage,
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    # files.create sends multipart/form-data with "purpose" and "file" fields
+    def upload_file(self):
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8")
+        form = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(header + self.read_body())
+        fields = {
+            part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+            for part in form.iter_parts()
+        }
+        filename, data = fields["file"]
+        purpose = fields.get("purpose", (None, b"batch"))[1].decode("utf-8")
+        self.send_json(200, self.server.add_file(data, filename or "upload.jsonl", purpose))
+
+    def create_batch(self):
+        request = json.loads(self.read_body() or b"{}")
+        if request.get("input_file_id") not in self.server.files:
+            self.send_json(404, {"error": {"message": f"No such file: {request.get('input_file_id')}"}})
+            return
+        self.send_json(200, self.server.start_batch(request))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = self.openai_path()
+        if path.startswith("/batches/"):
+            batch = self.server.batches.get(path.split("/")[2])
+            if batch is None:
+                self.send_json(404, {"error": {"message": f"Unknown batch {path}"}})
+            else:
+                self.send_json(200, batch)
+            return
+        if path.startswith("/files/") and path.endswith("/content"):
+            stored = self.server.files.get(path.split("/")[2])
+            if stored is None:
+                self.send_json(404, {"error": {"message": f"Unknown file {path}"}})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(stored["data"])))
+            self.end_headers()
+            self.wfile.write(stored["data"])
+            return
+        if url.path.rstrip("/") == "/youtube/v3/videos":
+            self.video_details(parse_qs(url.query))
+            return
+        if url.path.rstrip("/") != "/youtube/v3/search":
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        self.server.count("youtube.search")
+        if self.maybe_fail(self.server.youtube_error_rate):
+            return
+
+        # Pages up to SEARCH_TOTAL_RESULTS, like the live API; the page token is
+        # simply the offset of the page's first result
+        params = parse_qs(url.query)
+        offset = int(params.get("pageToken", ["0"])[0])
+        max_results = min(int(params.get("maxResults", ["5"])[0]), SEARCH_TOTAL_RESULTS - offset)
+        time.sleep(self.server.sample_latency(self.server.youtube_latency))
+        response = {
+            "kind": "youtube#searchListResponse",
+            "pageInfo": {"totalResults": SEARCH_TOTAL_RESULTS, "resultsPerPage": max_results},
+            "items": self.server.payloads.search(params.get("q", [""])[0], max_results, offset),
+        }
+        if offset + max_results < SEARCH_TOTAL_RESULTS:
+            response["nextPageToken"] = str(offset + max_results)
+        self.send_json(200, response)
+
+
+    # videos.list with statistics and content details derived from each ID
+    def video_details(self, params):
+        self.server.count("youtube.videos")
+        if self.maybe_fail(self.server.youtube_error_rate):
+            return
+        video_ids = [video_id for video_id in params.get("id", [""])[0].split(",") if video_id]
+        time.sleep(self.server.sample_latency(self.server.youtube_latency))
+        self.send_json(200, {
+            "kind": "youtube#videoListResponse",
+            "items": [self.server.payloads.video_details(video_id) for video_id in video_ids[:50]],
+        })
+
+
+# Local server answering chat completions, batch jobs, youtube.search().list and videos.list
+# with replayed payloads, configurable latency and injected errors
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Pooled clients open many connections at once
+
+    def __init__(
+        self,
+        address=("127.0.0.1", 0),
+        payloads=None,
+        openai_latency=None,
+        youtube_latency=None,
+        openai_error_rate=0.0,
+        youtube_error_rate=0.0,
+        openai_token_latency=0.0,
+        batch_latency=1.0,
+        batch_outcome="completed",
+        seed=None,
+    ):
+        super().__init__(address, StandinHandler)
+        self.payloads = payloads or ReplayPayloads()
+        self.openai_latency = openai_latency or LatencyModel(1.5)
+        self.youtube_latency = youtube_latency or LatencyModel(0.3)
+        self.openai_error_rate = openai_error_rate
+        self.youtube_error_rate = youtube_error_rate
+        self.openai_token_latency = openai_token_latency
+        self.batch_latency = batch_latency
+        self.batch_outcome = batch_outcome  # "completed", "failed", "expired" or "cancelled"
+        self.files = {}
+        self.batches = {}
+        self.calls = Counter()  # Upstream calls served, by API
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def draw(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def sample_latency(self, latency_model):
+        with self._rng_lock:
+            return latency_model.sample(self._rng)
+
+    def count(self, api):
+        with self._rng_lock:
+            self.calls[api] += 1
+
+    # Answer text and usage for a chat completion request body
+    def completion_content(self, request):
+        prompt = request["messages"][-1]["content"]
+        if request.get("response_format", {}).get("type") in ("json_schema", "json_object"):
+            content = self.payloads.structured_completion(prompt)
+        else:
+            content = self.payloads.completion(prompt)
+        # Whitespace-separated words stand in for tokens
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(content.split()),
+            "total_tokens": len(prompt.split()) + len(content.split()),
+        }
+        return content, usage
+
+    def completion_response(self, request, content, usage):
+        return {
+            "id": f"chatcmpl-standin-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def add_file(self, data, filename, purpose):
+        file_id = f"file-standin-{uuid.uuid4().hex[:12]}"
+        self.files[file_id] = {"data": data, "filename": filename, "purpose": purpose}
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    # Batches run in the background and complete batch_latency seconds after creation
+    def start_batch(self, request):
+        batch_id = f"batch_standin_{uuid.uuid4().hex[:12]}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request.get("endpoint", "/v1/chat/completions"),
+            "completion_window": request.get("completion_window", "24h"),
+            "input_file_id": request["input_file_id"],
+            "metadata": request.get("metadata"),
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "in_progress_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "errors": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        timer = threading.Timer(self.batch_latency, self.run_batch, args=(batch_id,))
+        timer.daemon = True
+        timer.start()
+        return self.batches[batch_id]
+
+    # Answer every request of the job file; injected errors go to the error file.
+    # A failed batch answers nothing; an expired or cancelled one answers the
+    # first half of its requests and reports the rest in the error file.
+    def run_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        if self.batch_outcome == "failed":
+            batch.update(
+                status="failed",
+                failed_at=int(time.time()),
+                errors={"object": "list", "data": [{"code": "invalid_request", "message": "Injected stand-in batch failure"}]},
+            )
+            return
+        jobs = [json.loads(line) for line in self.files[batch["input_file_id"]]["data"].decode("utf-8").splitlines() if line.strip()]
+        answered = len(jobs) if self.batch_outcome == "completed" else len(jobs) // 2
+        output_lines, error_lines = [], []
+        for position, job in enumerate(jobs):
+            result = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": job["custom_id"], "error": None}
+            if position >= answered:
+                result.update(response=None, error={"code": f"batch_{self.batch_outcome}", "message": f"Batch {self.batch_outcome} before this request ran"})
+                error_lines.append(result)
+                continue
+            if self.draw() < self.openai_error_rate:
+                result["response"] = {
+                    "status_code": 500,
+                    "body": {"error": {"message": "Injected stand-in failure", "type": "server_error"}},
+                }
+                error_lines.append(result)
+                continue
+            content, usage = self.completion_content(job["body"])
+            result["response"] = {"status_code": 200, "body": self.completion_response(job["body"], content, usage)}
+            output_lines.append(result)
+
+        def stored_file(lines):
+            if not lines:
+                return None
+            data = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+            return self.add_file(data, f"{batch_id}_output.jsonl", "batch_output")["id"]
+
+        batch.update(
+            {"status": self.batch_outcome, f"{self.batch_outcome}_at": int(time.time())},
+            output_file_id=stored_file(output_lines),
+            error_file_id=stored_file(error_lines),
+            request_counts={
+                "total": len(output_lines) + len(error_lines),
+                "completed": len(output_lines),
+                "failed": len(error_lines),
+            },
+        )
+
+
+# Start a stand-in server on a background thread; call .shutdown() when done
+def start_standin_server(**kwargs):
+    server = StandinServer(**kwargs)
+    threading.Thread(target=server.serve_forever, name="mindy-standin", daemon=True).start()
+    return server
+
+
+def add_standin_arguments(parser):
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="Simulation results CSV to replay payloads from")
+    parser.add_argument("--openai-latency", type=float, default=1.5, help="Median chat completion latency (s)")
+    parser.add_argument("--youtube-latency", type=float, default=0.3, help="Median search latency (s)")
+    parser.add_argument("--openai-token-latency", type=float, default=0.0, help="Extra completion latency per output token (s)")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="Time until a batch job completes (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal sigma of both latencies")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="Fraction of completions that fail")
+    parser.add_argument("--youtube-error-rate", type=float, default=0.0, help="Fraction of searches that fail")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency and error sampling")
+
+
+def standin_kwargs(args):
+    return {
+        "payloads": ReplayPayloads(args.corpus),
+        "openai_latency": LatencyModel(args.openai_latency, args.latency_sigma),
+        "youtube_latency": LatencyModel(args.youtube_latency, args.latency_sigma),
+        "openai_error_rate": args.openai_error_rate,
+        "youtube_error_rate": args.youtube_error_rate,
+        "openai_token_latency": args.openai_token_latency,
+        "batch_latency": args.batch_latency,
+        "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve stand-ins for the OpenAI chat completions and YouTube search APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandinServer((args.host, args.port), **standin_kwargs(args))
+    print(f"Stand-in APIs listening on {server.url}. Point the app at them with:")
+    print(f"  OPENAI_BASE_URL={server.url}/v1 MINDY_YOUTUBE_API_ENDPOINT={server.url}/")
+    server.serve_forever()
@@ -0,0 +1,11 @@
+import math
+
+
+# Nearest-rank percentile: the smallest sample with at least `fraction` of all
+# samples at or below it, NaN without samples. The resilience layer's hedging
+# delay and every benchmark's reported tails use this one definition.
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    if not samples:
+        return float("nan")
+    return samples[max(math.ceil(len(samples) * fraction) - 1, 0)]
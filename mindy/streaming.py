@@ -0,0 +1,61 @@
+import re
+
+
+# Numbered recommendation lines, e.g. "1. **Box Breathing**: ...". As in the
+# original parser, only items 1-3 count, so at most three techniques are searched.
+NUMBERED_LINE = re.compile(r"^[1-3]\.")
+
+
+def keywords_from_text(text):
+    # Filter out short/common words
+    return [word.lower() for word in text.split() if len(word) > 3]
+
+
+# Incrementally extracts techniques from a streamed GPT response. Chunks are
+# buffered until a line is complete; the "# " title supplies keywords shared by
+# every technique, and each numbered **Technique** line is reported right away
+# in the same shape extract_techniques_and_keywords produces.
+class TechniqueStreamParser:
+    def __init__(self, on_technique=None, prefixes=None):
+        self.on_technique = on_technique
+        self.prefixes = tuple(prefixes) if prefixes else None
+        self.buffer = ""
+        self.title_keywords = None
+        self.techniques = []
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            self._parse_line(line)
+
+    def close(self):
+        if self.buffer:
+            self._parse_line(self.buffer)
+            self.buffer = ""
+
+    def _is_technique_line(self, line):
+        if self.prefixes is not None:
+            return line.startswith(self.prefixes)
+        return NUMBERED_LINE.match(line) is not None
+
+    def _parse_line(self, line):
+        if self.title_keywords is None and line.startswith("# "):
+            self.title_keywords = keywords_from_text(line[2:].strip())
+            return
+        if not self._is_technique_line(line) or line.count("**") < 2:
+            return
+
+        technique_name = line.split("**")[1]
+        description = ""
+        if ":" in line.strip():
+            description = line.strip().split(":", 1)[1].strip()
+
+        technique_data = {
+            "technique": technique_name,
+            "keywords": keywords_from_text(technique_name) + (self.title_keywords or []),
+            "description": description,
+        }
+        self.techniques.append(technique_data)
+        if self.on_technique is not None:
+            self.on_technique(technique_data)
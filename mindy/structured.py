@@ -0,0 +1,91 @@
+import json
+
+from mindy.streaming import keywords_from_text
+
+
+# Compact answer format requested in JSON output mode. Strict structured
+# outputs guarantee the model returns exactly this shape.
+RECOMMENDATIONS_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["title", "techniques"],
+    "properties": {
+        "title": {"type": "string"},
+        "techniques": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": ["name", "description", "keywords"],
+                "properties": {
+                    "name": {"type": "string"},
+                    "description": {"type": "string"},
+                    "keywords": {"type": "array", "items": {"type": "string"}},
+                },
+            },
+        },
+    },
+}
+
+RECOMMENDATIONS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "recommendations", "strict": True, "schema": RECOMMENDATIONS_SCHEMA},
+}
+
+
+class InvalidRecommendationsError(ValueError):
+    pass
+
+
+# Parse and validate a JSON answer in one pass; raises InvalidRecommendationsError
+def parse_recommendations(text):
+    try:
+        recommendations = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise InvalidRecommendationsError(f"Response is not valid JSON: {e}") from e
+
+    if not isinstance(recommendations, dict) or not isinstance(recommendations.get("title"), str):
+        raise InvalidRecommendationsError("Response has no title")
+    techniques = recommendations.get("techniques")
+    if not isinstance(techniques, list):
+        raise InvalidRecommendationsError("Response has no techniques list")
+    for position, technique in enumerate(techniques, start=1):
+        if not (
+            isinstance(technique, dict)
+            and isinstance(technique.get("name"), str) and technique["name"].strip()
+            and isinstance(technique.get("description"), str)
+            and isinstance(technique.get("keywords"), list)
+            and all(isinstance(keyword, str) for keyword in technique["keywords"])
+        ):
+            raise InvalidRecommendationsError(f"Technique {position} does not match the schema")
+    return recommendations
+
+
+# Render the answer locally in the layout the markdown prompt asks the model for
+def render_markdown(recommendations):
+    lines = [f"# {recommendations['title']}", "", "## Recommendations"]
+    lines += [
+        f"{number}. **{technique['name']}**: {technique['description']}"
+        for number, technique in enumerate(recommendations["techniques"], start=1)
+    ]
+    if not recommendations["techniques"]:
+        lines.append("The provided context does not contain this information.")
+    return "\n".join(lines)
+
+
+# Techniques in the shape extract_techniques_and_keywords produces. Keywords are
+# the technique's name words, the model's search keywords and the title words.
+def techniques_from_recommendations(recommendations):
+    title_keywords = keywords_from_text(recommendations["title"])
+    return [
+        {
+            "technique": technique["name"],
+            "keywords": list(dict.fromkeys(
+                keywords_from_text(technique["name"])
+                + [keyword.lower() for keyword in technique["keywords"]]
+                + title_keywords
+            )),
+            "description": technique["description"],
+        }
+        for technique in recommendations["techniques"]
+    ]
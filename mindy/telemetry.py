@@ -0,0 +1,287 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mindy.config import cache_path, env_flag, env_int
+
+
+# Off by default; when off, spans and counters are shared no-op objects
+TELEMETRY_ENABLED = env_flag("MINDY_TELEMETRY", False)
+
+# Finished traces are appended here as JSON lines, and metrics are rewritten
+# here in the Prometheus text format (for a node-exporter textfile collector)
+TRACE_LOG_PATH = os.getenv("MINDY_TRACE_LOG")
+METRICS_PATH = os.getenv("MINDY_METRICS_FILE")
+
+# Also serve the metrics over HTTP at /metrics when set
+METRICS_PORT = env_int("MINDY_METRICS_PORT", 0)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace = contextvars.ContextVar("mindy_trace", default=None)
+
+
+# Process-wide counters and histograms, rendered in the Prometheus text format
+class MetricsRegistry:
+    def __init__(self):
+        self.counters = defaultdict(float)  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, description="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.help.setdefault(name, description)
+            self.counters[key] += amount
+
+    def observe(self, name, value, description="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.help.setdefault(name, description)
+            histogram = self.histograms.setdefault(key, [[0] * len(DURATION_BUCKETS), 0.0, 0])
+            for position, bound in enumerate(DURATION_BUCKETS):
+                if value <= bound:
+                    histogram[0][position] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @staticmethod
+    def format_labels(labels, **extra):
+        pairs = list(labels) + list(extra.items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines += [f"# HELP {name} {self.help[name]}", f"# TYPE {name} counter"]
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self.format_labels(labels)} {value:g}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines += [f"# HELP {name} {self.help[name]}", f"# TYPE {name} histogram"]
+                for (metric, labels), (buckets, total, count) in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{self.format_labels(labels, le=f'{bound:g}')} {bucket_count}")
+                    lines.append(f"{name}_bucket{self.format_labels(labels, le='+Inf')} {count}")
+                    lines.append(f"{name}_sum{self.format_labels(labels)} {total:g}")
+                    lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+# One timed stage. Attributes describe the work (cache source, token counts,
+# quota units, ...); an exception escaping the span is counted as an error.
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.error = None
+        self.trace = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started_at
+        if exc is not None and exc_type is not GeneratorExit:  # A stream closed early is not an error
+            self.error = f"{exc_type.__name__}: {exc}"
+            metrics.inc("mindy_stage_errors_total", description="Stages that raised", stage=self.name)
+        metrics.observe("mindy_stage_duration_seconds", self.duration, description="Wall time per stage", stage=self.name)
+        if self.trace is not None:
+            self.trace.add(self)
+        return False
+
+
+# No-op stand-in returned for spans and traces while telemetry is off
+class NullSpan:
+    spans = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def to_dict(self):
+        return None
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, **attributes):
+    if not TELEMETRY_ENABLED:
+        return NULL_SPAN
+    return Span(name, attributes)
+
+
+# All spans recorded while handling one request. Spans started on worker
+# threads join the trace through the context copied by submit_timed.
+class Trace:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, finished_span):
+        with self._lock:
+            self.spans.append(finished_span)
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        self.timestamp = time.time()
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started_at
+        _current_trace.reset(self._token)
+        write_trace(self.to_dict())
+        write_metrics()
+        return False
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda finished_span: finished_span.started_at)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration_ms": self.duration * 1000 if hasattr(self, "duration") else None,
+            "attributes": self.attributes,
+            "spans": [
+                {
+                    "name": finished_span.name,
+                    "start_ms": (finished_span.started_at - self.started_at) * 1000,
+                    "duration_ms": finished_span.duration * 1000,
+                    "error": finished_span.error,
+                    "attributes": finished_span.attributes,
+                }
+                for finished_span in spans
+            ],
+        }
+
+
+def start_trace(name, **attributes):
+    if not TELEMETRY_ENABLED:
+        return NULL_SPAN
+    start_metrics_server()
+    return Trace(name, attributes)
+
+
+_write_lock = threading.Lock()
+
+
+def write_trace(trace):
+    with _write_lock, open(TRACE_LOG_PATH or cache_path("traces.jsonl"), "a", encoding="utf-8") as file:
+        file.write(json.dumps(trace, default=str) + "\n")
+
+
+def write_metrics():
+    path = METRICS_PATH or cache_path("metrics.prom")
+    with _write_lock:
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            file.write(metrics.render())
+        os.replace(f"{path}.tmp", path)
+
+
+# Counters for the money side of a request; each is a no-op while telemetry is off
+def record_tokens(usage):
+    if not TELEMETRY_ENABLED or usage is None:
+        return
+    description = "OpenAI tokens used"
+    metrics.inc("mindy_openai_tokens_total", usage.prompt_tokens, description=description, kind="prompt")
+    metrics.inc("mindy_openai_tokens_total", usage.completion_tokens, description=description, kind="completion")
+
+
+# For stages that handle their own exceptions, so the span never sees them
+def record_error(stage):
+    if TELEMETRY_ENABLED:
+        metrics.inc("mindy_stage_errors_total", description="Stages that raised", stage=stage)
+
+
+def record_quota(units, endpoint):
+    if TELEMETRY_ENABLED:
+        metrics.inc("mindy_youtube_quota_units_total", units, description="YouTube quota units spent", endpoint=endpoint)
+
+
+def record_cache(cache, hit):
+    if TELEMETRY_ENABLED:
+        metrics.inc("mindy_cache_lookups_total", description="Cache lookups", cache=cache, result="hit" if hit else "miss")
+
+
+# First-token latency per model, and the hedges, fallbacks and missed
+# deadlines of the GPT call layer
+def record_gpt_latency(model, seconds):
+    if TELEMETRY_ENABLED:
+        metrics.observe("mindy_gpt_first_token_seconds", seconds, description="Time to the first token of a GPT answer", model=model)
+
+
+def record_gpt_event(event, model):
+    if TELEMETRY_ENABLED:
+        metrics.inc("mindy_gpt_events_total", description="Hedges, fallbacks and deadlines of GPT calls", event=event, model=model)
+
+
+# How long a task waited for a free worker of a bounded pool; a growing wait
+# means the pool is saturated
+def record_pool_wait(pool, seconds):
+    if TELEMETRY_ENABLED:
+        metrics.observe("mindy_pool_wait_seconds", seconds, description="Time tasks waited for a pool worker", pool=pool)
+
+
+# Tasks given up on at a deadline: "cancelled" before they started, or
+# "abandoned" while running, in which case they hold a worker until they return
+def record_pool_timeout(pool, outcome):
+    if TELEMETRY_ENABLED:
+        metrics.inc("mindy_pool_timeouts_total", description="Pool tasks given up on at a deadline", pool=pool, outcome=outcome)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Started at most once per process, on the first trace
+@lru_cache(maxsize=None)
+def start_metrics_server():
+    if not METRICS_PORT:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mindy-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,219 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from functools import lru_cache
+
+from mindy.concurrency import run_concurrently
+from mindy.config import cache_path, env_flag, env_float, env_int
+from mindy.prompts import CATEGORIES
+from mindy.ranking import CORPUS_PATH, get_ranker
+from mindy.results import RESULTS_DIR, list_runs
+from mindy.search_scheduler import canonical_query, get_search_scheduler
+from mindy.telemetry import record_error, start_trace
+from mindy.youtube import QuotaExceededError, build_youtube_client, enrich_videos
+
+
+# Ranked videos for the category seed techniques and the techniques GPT
+# suggests most often, precomputed in the background into a table the app's
+# video tab reads before searching. Entries are refreshed once older than
+# REFRESH_SECONDS and no longer served once older than MAX_AGE_SECONDS.
+TOP_N = env_int("MINDY_WARMUP_TOP_N", 50)
+REFRESH_SECONDS = env_float("MINDY_WARMUP_REFRESH_SECONDS", 6 * 3600)
+MAX_AGE_SECONDS = env_float("MINDY_WARMUP_MAX_AGE_SECONDS", 24 * 3600)
+INTERVAL_SECONDS = env_float("MINDY_WARMUP_INTERVAL_SECONDS", 3600)
+VIDEOS_PER_TECHNIQUE = 10
+
+# Run the warm-up loop on a daemon thread inside the Streamlit app
+IN_APP = env_flag("MINDY_WARMUP_IN_APP", False)
+
+# Search parameters of the app's technique searches
+SEARCH_PARAMS = {"part": "snippet", "type": "video", "maxResults": 10, "order": "relevance", "videoDuration": "medium", "videoDefinition": "high"}
+
+# Words that vary between spellings of the same technique ("Box Breathing
+# Technique", "Progressive Muscle Relaxation (PMR)")
+GENERIC_WORDS = frozenset(["technique", "exercise", "practice", "method"])
+PARENTHESES = re.compile(r"\([^)]*\)")
+
+
+def technique_key(technique):
+    return " ".join(word for word in canonical_query(PARENTHESES.sub(" ", technique)).split() if word not in GENERIC_WORDS)
+
+
+# Materialized technique -> ranked videos lookup, shared across processes
+class TechniqueVideoTable:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS technique_videos ("
+                "key TEXT PRIMARY KEY, technique TEXT NOT NULL, source TEXT NOT NULL, "
+                "frequency INTEGER NOT NULL, videos TEXT NOT NULL, refreshed_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # Ranked videos for the technique, or None when missing or older than max_age
+    def get(self, technique, max_age=MAX_AGE_SECONDS):
+        key = technique_key(technique)
+        if not key:
+            return None
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT videos, refreshed_at FROM technique_videos WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[0])
+
+    def put(self, target, videos):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO technique_videos (key, technique, source, frequency, videos, refreshed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (target["key"], target["technique"], target["source"], target["frequency"], json.dumps(videos), time.time()),
+            )
+
+    def refreshed_at(self):
+        with closing(self._connect()) as conn, conn:
+            return dict(conn.execute("SELECT key, refreshed_at FROM technique_videos").fetchall())
+
+    def entries(self):
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT technique, source, frequency, json_array_length(videos), refreshed_at "
+                "FROM technique_videos ORDER BY frequency DESC, technique"
+            ).fetchall()
+
+
+@lru_cache(maxsize=None)
+def get_technique_video_table():
+    return TechniqueVideoTable(cache_path("mindy_cache.sqlite3"))
+
+
+# Technique counts from the result store, or from the simulation CSV before
+# any run has been stored
+def technique_counts(store_dir=RESULTS_DIR, csv_path=CORPUS_PATH):
+    if list_runs(store_dir):
+        from mindy.analytics import AnalyticsEngine  # Imported lazily; needs duckdb
+
+        with AnalyticsEngine(store_dir=store_dir) as engine:
+            engine.refresh()
+            top = engine.top_values("technique", limit=1_000_000)
+        return Counter(dict(zip(top["value"], top["count"])))
+    with open(csv_path, newline="", encoding="utf-8") as file:
+        return Counter(row["Technique"] for row in csv.DictReader(file) if row["Technique"])
+
+
+# Every category seed plus the top_n most frequent techniques, with spellings
+# of one technique counted together and searched under their commonest name
+def warmup_targets(top_n=TOP_N, counts=None):
+    targets = {}
+    for seeds in CATEGORIES.values():
+        for seed in seeds:
+            targets.setdefault(technique_key(seed), {"technique": seed, "source": "seed", "frequency": 0})
+
+    spellings = defaultdict(Counter)
+    for technique, count in (counts if counts is not None else technique_counts()).items():
+        spellings[technique_key(technique)][technique] += count
+    spellings.pop("", None)
+    popular = sorted(spellings.items(), key=lambda item: (-sum(item[1].values()), item[0]))[:top_n]
+    for key, names in popular:
+        target = targets.setdefault(key, {"technique": names.most_common(1)[0][0], "source": "popular", "frequency": 0})
+        target["frequency"] = sum(names.values())
+    return [{"key": key, **target} for key, target in targets.items()]
+
+
+def precompute_videos(youtube, target):
+    request_params = {**SEARCH_PARAMS, "q": target["technique"]}
+    videos = get_search_scheduler().search(youtube, request_params, background=True)
+    videos = enrich_videos(youtube, [videos], background=True)[0]
+    return get_ranker().rank(target["technique"], videos)[:VIDEOS_PER_TECHNIQUE]
+
+
+# Refresh the targets whose entries are missing or older than refresh_after,
+# most frequent first. Searches run as background work, so they stop at the
+# interactive reserve of the daily quota; entries that fail keep their old videos.
+# The batch has no overall deadline; each search is bounded by the HTTP timeout.
+def refresh_table(youtube, targets, refresh_after=REFRESH_SECONDS, table=None, executor=None):
+    table = table or get_technique_video_table()
+    refreshed_at = table.refreshed_at()
+    now = time.time()
+    due = [target for target in targets if now - refreshed_at.get(target["key"], 0) > refresh_after]
+    due.sort(key=lambda target: (target["source"] != "seed", -target["frequency"]))
+
+    refreshed, failed, over_quota = 0, 0, 0
+    with start_trace("warmup", due=len(due)):
+        for index, videos, error in run_concurrently(
+            lambda target: precompute_videos(youtube, target), due, timeout=None, executor=executor
+        ):
+            if error is not None:
+                record_error("warmup")
+                failed += 1
+                over_quota += isinstance(error, QuotaExceededError)
+                continue
+            if videos:
+                table.put(due[index], videos)
+                refreshed += 1
+    if over_quota:
+        print(f"Warm-up: {over_quota} techniques skipped; the background share of today's quota is spent.")
+    return {"targets": len(targets), "due": len(due), "refreshed": refreshed, "failed": failed}
+
+
+def warmup_cycle(youtube, top_n=TOP_N, refresh_after=REFRESH_SECONDS, executor=None):
+    return refresh_table(youtube, warmup_targets(top_n), refresh_after, executor=executor)
+
+
+# Refresh every interval seconds until stopped; errors are reported and retried next cycle
+def run_forever(youtube, interval=INTERVAL_SECONDS, top_n=TOP_N, refresh_after=REFRESH_SECONDS, executor=None, stop=None):
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            summary = warmup_cycle(youtube, top_n, refresh_after, executor=executor)
+            print(f"Warm-up: refreshed {summary['refreshed']} of {summary['due']} due techniques ({summary['failed']} failed).")
+        except Exception as e:
+            record_error("warmup")
+            print(f"Warm-up failed: {e}")
+        stop.wait(interval)
+
+
+# Started at most once per process, when MINDY_WARMUP_IN_APP is set
+@lru_cache(maxsize=None)
+def start_warmup_thread(youtube):
+    thread = threading.Thread(target=run_forever, args=(youtube,), name="mindy-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute ranked videos for seed and popular techniques.")
+    parser.add_argument("--top-n", type=int, default=TOP_N, help="Most frequent techniques to precompute, besides the category seeds")
+    parser.add_argument("--refresh-after", type=float, default=REFRESH_SECONDS, help="Refresh entries older than this (s)")
+    parser.add_argument("--interval", type=float, default=INTERVAL_SECONDS, help="Seconds between cycles with --loop")
+    parser.add_argument("--loop", action="store_true", help="Keep refreshing every --interval seconds")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent searches")
+    parser.add_argument("--status", action="store_true", help="List the table instead of refreshing it")
+    args = parser.parse_args()
+
+    if args.status:
+        now = time.time()
+        for technique, source, frequency, n_videos, refreshed_at in get_technique_video_table().entries():
+            print(f"{technique:<45} {source:<8} {frequency:>6} {n_videos:>3} videos  {(now - refreshed_at) / 3600:6.1f} h old")
+    else:
+        youtube = build_youtube_client(os.getenv("YOUTUBE_API_KEY"))
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="mindy-warmup") as executor:
+            if args.loop:
+                run_forever(youtube, args.interval, args.top_n, args.refresh_after, executor=executor)
+            else:
+                summary = warmup_cycle(youtube, args.top_n, args.refresh_after, executor=executor)
+                print(f"Refreshed {summary['refreshed']} of {summary['due']} due techniques "
+                      f"({summary['targets']} targets, {summary['failed']} failed).")
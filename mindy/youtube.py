@@ -0,0 +1,321 @@
+import asyncio
+import os
+import re
+import threading
+from functools import lru_cache
+
+import httplib2
+
+from mindy.cache import SQLiteCache, make_cache_key
+from mindy.config import cache_path, env_flag, env_float, env_int
+from mindy.local_index import get_local_index
+from mindy.quota import QuotaLedger
+from mindy.ranking import preprocess_texts
+from mindy.telemetry import record_cache, record_error, record_quota, span
+
+
+# YouTube Data API cost of one search.list call, and of one videos.list call
+# for up to VIDEOS_LIST_MAX_IDS videos
+SEARCH_LIST_COST = 100
+VIDEOS_LIST_COST = 1
+VIDEOS_LIST_MAX_IDS = 50
+
+# Add view counts, likes and durations to search results with videos.list
+ENRICH_ENABLED = env_flag("MINDY_YOUTUBE_ENRICH", True)
+
+ISO_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+
+
+# Socket timeout for a single YouTube API request
+YOUTUBE_HTTP_TIMEOUT = env_float("MINDY_YOUTUBE_HTTP_TIMEOUT", 10.0)
+
+# Answer from the local index of harvested videos before spending quota, and
+# only call the live API when the local results are not confident enough
+LOCAL_INDEX_ENABLED = env_flag("MINDY_LOCAL_INDEX", True)
+LOCAL_INDEX_MIN_CONFIDENCE = env_float("MINDY_LOCAL_INDEX_MIN_CONFIDENCE", 0.5)
+
+# Never call the live API; serve everything from the cache and local index
+OFFLINE = env_flag("MINDY_OFFLINE", False)
+
+# Point the client at another server, e.g. the stand-in from mindy.standins
+YOUTUBE_API_ENDPOINT = os.getenv("MINDY_YOUTUBE_API_ENDPOINT")
+
+_thread_local = threading.local()
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+# httplib2 connections are not thread-safe, so every worker thread gets its own
+def thread_http():
+    if not hasattr(_thread_local, "http"):
+        _thread_local.http = httplib2.Http(timeout=YOUTUBE_HTTP_TIMEOUT)
+    return _thread_local.http
+
+
+def build_youtube_client(api_key):
+    from googleapiclient.discovery import build  # Imported lazily; the discovery client is slow to import
+
+    client_options = {"api_endpoint": YOUTUBE_API_ENDPOINT} if YOUTUBE_API_ENDPOINT else None
+    return build("youtube", "v3", developerKey=api_key, client_options=client_options)
+
+
+# Cache of parsed search results shared by the app and the simulator
+@lru_cache(maxsize=None)
+def get_video_cache():
+    return SQLiteCache(
+        cache_path("mindy_cache.sqlite3"),
+        table="youtube_searches",
+        ttl_seconds=env_float("MINDY_YOUTUBE_CACHE_TTL", 24 * 3600),
+        max_entries=env_int("MINDY_YOUTUBE_CACHE_MAX_ENTRIES", 2000),
+        enabled=env_flag("MINDY_YOUTUBE_CACHE", True),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_quota_ledger():
+    return QuotaLedger(
+        cache_path("mindy_cache.sqlite3"),
+        daily_limit=env_int("MINDY_YOUTUBE_DAILY_QUOTA", 10000),
+        reserve_units=env_int("MINDY_YOUTUBE_QUOTA_RESERVE", 0),
+        background_reserve_units=env_int("MINDY_YOUTUBE_BACKGROUND_RESERVE", 2000),
+    )
+
+
+# Statistics and content details per video ID; they change slowly, so keep them a week
+@lru_cache(maxsize=None)
+def get_video_details_cache():
+    return SQLiteCache(
+        cache_path("mindy_cache.sqlite3"),
+        table="youtube_video_details",
+        ttl_seconds=env_float("MINDY_YOUTUBE_DETAILS_TTL", 7 * 24 * 3600),
+        max_entries=env_int("MINDY_YOUTUBE_DETAILS_MAX_ENTRIES", 50000),
+        enabled=env_flag("MINDY_YOUTUBE_CACHE", True),
+    )
+
+
+# Enriched queries repeat the same title keywords under every technique, in
+# whatever order a set happened to produce. Searches are cached under a
+# canonical form of the query (stop words dropped, plurals folded, terms
+# sorted), so equivalent keyword sets share one cache entry, in this process and
+# in every other process using the shared cache. The query sent to the API is
+# left as the user's.
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from how in into is it its of on or that the this to with your you".split()
+)
+
+
+def fold_plural(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def query_terms(query):
+    return frozenset(fold_plural(word) for word in preprocess_texts([query])[0].split() if word not in STOP_WORDS)
+
+
+def canonical_query(query):
+    return " ".join(sorted(query_terms(query))) or query
+
+
+def video_cache_key(request_params):
+    return make_cache_key(
+        "youtube.search",
+        canonical_query(request_params["q"]),
+        request_params.get("maxResults"),
+        request_params.get("order"),
+        request_params.get("videoDuration"),
+        request_params.get("videoDefinition"),
+    )
+
+
+def parse_search_response(response):
+    return [
+        {
+            "title": item["snippet"]["title"],
+            "description": item["snippet"]["description"],
+            "video_id": item["id"]["videoId"],
+            "link": f"https://www.youtube.com/watch?v={item['id']['videoId']}",
+        }
+        for item in response.get("items", [])
+    ]
+
+
+# Everything before a live youtube.search().list call: the results cache, the
+# local index and the daily quota ledger. Returns the videos when the search is
+# answered without the API, or None once the units for a live call are spent.
+# When the budget is exhausted, fall back to an expired cache entry or any local
+# results before refusing. Background searches leave the interactive reserve.
+def search_without_api(request_params, search_span, background=False):
+    video_cache = get_video_cache()
+    cache_key = video_cache_key(request_params)
+
+    videos = video_cache.get(cache_key)
+    if videos is not None:
+        search_span.set(source="cache")
+        return videos
+
+    local_videos = []
+    if LOCAL_INDEX_ENABLED or OFFLINE:
+        max_results = request_params.get("maxResults", 5)
+        local_videos, confidence = get_local_index().search(request_params["q"], max_results)
+        local_hit = OFFLINE or (len(local_videos) >= max_results and confidence >= LOCAL_INDEX_MIN_CONFIDENCE)
+        record_cache("local_index", hit=local_hit)
+        if local_hit:
+            search_span.set(source="local_index", confidence=confidence)
+            return local_videos
+
+    if not get_quota_ledger().try_spend(SEARCH_LIST_COST, "search.list", background=background):
+        stale_videos = video_cache.get(cache_key, allow_stale=True)
+        if stale_videos is not None:
+            search_span.set(source="stale_cache")
+            return stale_videos
+        if local_videos:
+            search_span.set(source="local_index")
+            return local_videos
+        raise QuotaExceededError("Daily YouTube quota exhausted; try again after midnight Pacific Time.")
+
+    record_quota(SEARCH_LIST_COST, "search.list")
+    search_span.set(source="live", quota_units=SEARCH_LIST_COST)
+    return None
+
+
+def remember_search(request_params, videos):
+    get_video_cache().set(video_cache_key(request_params), videos)
+    if LOCAL_INDEX_ENABLED:
+        get_local_index().add_videos(videos)  # Grow the local index with every live result
+
+
+# Run youtube.search().list through the results cache, the local index and the quota ledger
+def cached_youtube_search(youtube, request_params, background=False):
+    with span("youtube.search", q=request_params["q"]) as search_span:
+        videos = search_without_api(request_params, search_span, background)
+        if videos is not None:
+            return videos
+        response = youtube.search().list(**request_params).execute(http=thread_http())
+        videos = parse_search_response(response)
+        remember_search(request_params, videos)
+        return videos
+
+
+# Async variant for the API service: the same cache, index and quota steps run
+# on a worker thread, and the live call goes through a shared httpx.AsyncClient
+async def cached_youtube_search_async(http_client, api_key, request_params):
+    with span("youtube.search", q=request_params["q"]) as search_span:
+        videos = await asyncio.to_thread(search_without_api, request_params, search_span)
+        if videos is not None:
+            return videos
+        base_url = YOUTUBE_API_ENDPOINT or "https://www.googleapis.com/"
+        response = await http_client.get(
+            base_url.rstrip("/") + "/youtube/v3/search", params={**request_params, "key": api_key}
+        )
+        response.raise_for_status()
+        videos = parse_search_response(response.json())
+        await asyncio.to_thread(remember_search, request_params, videos)
+        return videos
+
+
+def search_page_cache_key(request_params, page_token=None):
+    return make_cache_key(
+        "youtube.search.page",
+        canonical_query(request_params["q"]),
+        request_params.get("maxResults"),
+        request_params.get("order"),
+        request_params.get("videoDuration"),
+        request_params.get("videoDefinition"),
+        page_token,
+    )
+
+
+# One page of search results as columns, with the token of the page after it
+def parse_search_page(response):
+    items = response.get("items", [])
+    return {
+        "video_ids": [item["id"]["videoId"] for item in items],
+        "titles": [item["snippet"]["title"] for item in items],
+        "descriptions": [item["snippet"]["description"] for item in items],
+        "next_page_token": response.get("nextPageToken"),
+    }
+
+
+# A cached page of a paginated search, or None
+def cached_search_page(request_params, page_token=None):
+    return get_video_cache().get(search_page_cache_key(request_params, page_token))
+
+
+# Fetch one page of a search with youtube.search().list. Quota is the caller's
+# to spend, so it can stop paging within its own budget.
+def live_search_page(youtube, request_params, page_token=None):
+    params = {**request_params, "pageToken": page_token} if page_token else request_params
+    response = youtube.search().list(**params).execute(http=thread_http())
+    page = parse_search_page(response)
+    get_video_cache().set(search_page_cache_key(request_params, page_token), page)
+    if LOCAL_INDEX_ENABLED:
+        get_local_index().add_videos(parse_search_response(response))
+    return page
+
+
+def duration_seconds(iso_duration):
+    match = ISO_DURATION.fullmatch(iso_duration or "")
+    if match is None:
+        return None
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def parse_video_details(response):
+    details = {}
+    for item in response.get("items", []):
+        statistics = item.get("statistics", {})
+        content_details = item.get("contentDetails", {})
+        details[item["id"]] = {
+            "view_count": int(statistics["viewCount"]) if "viewCount" in statistics else None,
+            "like_count": int(statistics["likeCount"]) if "likeCount" in statistics else None,
+            "duration_seconds": duration_seconds(content_details.get("duration")),
+            "definition": content_details.get("definition"),
+        }
+    return details
+
+
+# Statistics and content details per video ID, looking up the IDs missing from
+# the details cache with one videos.list call per 50 IDs. Best effort: on errors
+# or without quota, only the details already cached are returned.
+def fetch_video_details(youtube, video_ids, background=False):
+    with span("youtube.videos", videos=len(video_ids)) as enrich_span:
+        details_cache = get_video_details_cache()
+        cache_keys = {video_id: make_cache_key("youtube.videos", video_id) for video_id in video_ids}
+        cached = details_cache.get_many(list(cache_keys.values()))
+        details = {video_id: cached[key] for video_id, key in cache_keys.items() if key in cached}
+        missing = [video_id for video_id in video_ids if video_id not in details]
+        calls = 0
+        for start in range(0, 0 if OFFLINE else len(missing), VIDEOS_LIST_MAX_IDS):
+            if not get_quota_ledger().try_spend(VIDEOS_LIST_COST, "videos.list", background=background):
+                break
+            record_quota(VIDEOS_LIST_COST, "videos.list")
+            chunk = missing[start:start + VIDEOS_LIST_MAX_IDS]
+            try:
+                response = youtube.videos().list(
+                    part="statistics,contentDetails", id=",".join(chunk), maxResults=len(chunk)
+                ).execute(http=thread_http())
+            except Exception:
+                record_error("youtube.videos")
+                break
+            calls += 1
+            fetched = parse_video_details(response)
+            details_cache.set_many({cache_keys[video_id]: value for video_id, value in fetched.items() if video_id in cache_keys})
+            details.update(fetched)
+        enrich_span.set(cached=len(video_ids) - len(missing), calls=calls, quota_units=calls * VIDEOS_LIST_COST)
+    return details
+
+
+# Add statistics and content details to every video in video_lists
+def enrich_videos(youtube, video_lists, background=False):
+    if not ENRICH_ENABLED:
+        return video_lists
+    video_ids = list(dict.fromkeys(video["video_id"] for videos in video_lists for video in videos))
+    details = fetch_video_details(youtube, video_ids, background=background)
+    return [[{**video, **details.get(video["video_id"], {})} for video in videos] for videos in video_lists]
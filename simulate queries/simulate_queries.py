@@ -1,5 +1,10 @@
-import csv
-from app_logic import generate_gpt_recommendations, extract_techniques_and_keywords, fetch_youtube_videos, rank_videos_by_query
+import argparse
+import os
+from app_logic import categories
+from simulation_runner import SimulationRunner
+from mindy.batch import BATCH_POLL_SECONDS
+from mindy.query_cache import get_semantic_query_cache
+from mindy.results import RESULTS_DIR
 
 
 user_queries = [
@@ -64,59 +69,54 @@ user_queries = [
 
 
 # Log results into a CSV file
-def simulate_queries_and_log_results(queries, categories, output_file="simulation_results.csv"):
-    with open(output_file, mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Query ID", "Query", "Category", "Technique", "Description", "Keywords", "Video Title", "Video Description", "Similarity Score", "Video Link"])
+def simulate_queries_and_log_results(queries, categories, output_file="simulation_results.csv", workers=4, openai_rps=1.0, youtube_rps=2.0, resume=True, batch=False, batch_poll_seconds=BATCH_POLL_SECONDS, store_dir=RESULTS_DIR):
+    runner = SimulationRunner(
+        queries,
+        categories,
+        output_file=output_file,
+        workers=workers,
+        openai_rps=openai_rps,
+        youtube_rps=youtube_rps,
+        batch=batch,
+        batch_poll_seconds=batch_poll_seconds,
+        store_dir=store_dir,
+    )
+    if not resume and os.path.exists(runner.journal_file):
+        os.remove(runner.journal_file)  # Start over instead of skipping finished units
+    progress = runner.run()
 
-        query_id = 1
-        
-        for query in queries:
-            for category in ["All"] + list(categories.keys()):  # Iterate over all categories, including "All"
-                print(f"Processing Query ID {query_id}: '{query}' for Category: '{category}'")
-                
-                gpt_recommendations = generate_gpt_recommendations(query, category)
-                print(f"GPT Recommendations: {gpt_recommendations}")
-                techniques_with_details = extract_techniques_and_keywords(gpt_recommendations)
-                print(f"Extracted Techniques: {techniques_with_details}")
-
-                for technique_data in techniques_with_details:
-                    technique = technique_data["technique"]
-                    description = technique_data["description"]
-                    enriched_query = " ".join([technique] + technique_data["keywords"])
-                    print(f"Enriched Query: {enriched_query}")
-                    
-                    videos = fetch_youtube_videos(
-                        enriched_query,
-                        max_results=3,
-                        order="relevance",  # Fetch the most-viewed videos
-                        video_duration="medium",  # Fetch videos between 4 and 20 minutes
-                        video_definition="high"  # Fetch only high-definition videos
-                    )
-                    print(f"Fetched Videos: {videos}")
-                    
-                    if not videos:
-                        print(f"No videos found for query: {enriched_query}")
-                        continue
-                        
-                    ranked_videos = rank_videos_by_query(enriched_query, videos)
-                    print(f"Ranked Videos: {ranked_videos[:5]}")
-
-                    for video in ranked_videos[:5]:  # Log top 5 videos per technique
-                        writer.writerow([
-                            query_id,
-                            query,
-                            category,
-                            technique,
-                            description,
-                            " ".join(technique_data["keywords"]),
-                            video["title"],
-                            video["description"],
-                            video.get("similarity_score", 0.0),
-                            video["link"]
-                        ])
-            query_id += 1  # Increment the Query ID for the next query
+    semantic_cache = get_semantic_query_cache()
+    if semantic_cache is not None:
+        stats = semantic_cache.stats()
+        print(
+            f"Semantic cache: {stats['hits']} paraphrases reused ({stats['hit_rate']:.0%} hit rate), "
+            f"{stats['latency_saved_seconds']:.1f}s of GPT latency saved."
+        )
+    return progress
 
 # Run the simulation
 if __name__ == "__main__":
-    simulate_queries_and_log_results(user_queries, categories)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Simulate user queries and log GPT techniques with ranked videos.")
+    parser.add_argument("--output", default="simulation_results.csv", help="CSV file to write results to")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent API calls")
+    parser.add_argument("--openai-rps", type=float, default=1.0, help="Maximum OpenAI requests per second")
+    parser.add_argument("--youtube-rps", type=float, default=2.0, help="Maximum YouTube requests per second")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint journal and start over")
+    parser.add_argument("--batch", action="store_true", help="Generate all GPT answers as one Batch API job before fetching videos")
+    parser.add_argument("--store", default=RESULTS_DIR, help="Parquet result store to append this run to")
+    parser.add_argument("--no-store", action="store_true", help="Only write the CSV")
+    parser.add_argument("--batch-poll", type=float, default=BATCH_POLL_SECONDS, help="Seconds between batch status checks")
+    args = parser.parse_args()
+
+    simulate_queries_and_log_results(
+        user_queries,
+        categories,
+        output_file=args.output,
+        workers=args.workers,
+        openai_rps=args.openai_rps,
+        youtube_rps=args.youtube_rps,
+        resume=not args.fresh,
+        batch=args.batch,
+        batch_poll_seconds=args.batch_poll,
+        store_dir=None if args.no_store else args.store,
+    )
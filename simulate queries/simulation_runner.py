@@ -0,0 +1,335 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+
+from app_logic import add_retrieved_videos, enrich_youtube_videos, rank_videos_by_query, request_gpt_techniques, search_youtube_videos
+from mindy.batch import BATCH_POLL_SECONDS, BatchFailedError, read_batch_results, submit_batch, wait_for_batch, write_batch_jobs
+from mindy.extraction import techniques_from_answer
+from mindy.gpt import store_completion
+from mindy.prompts import GPT_OUTPUT_FORMAT
+from mindy.rate_limit import TokenBucket, retry_with_backoff
+from mindy.resilience import GPTDeadlineError, GPTUnavailableError
+from mindy.results import RESULTS_DIR, ResultWriter, new_run_id
+from mindy.telemetry import start_trace
+from mindy.youtube import QuotaExceededError
+
+
+# Rows written to the Parquet store as one row group
+STORE_ROWS_PER_GROUP = 1000
+
+CSV_HEADER = ["Query ID", "Query", "Category", "Technique", "Description", "Keywords", "Video Title", "Video Description", "Similarity Score", "Video Link"]
+
+
+# Prints progress and throughput as units complete
+class ProgressReporter:
+    def __init__(self, total_pairs):
+        self.total_pairs = total_pairs
+        self.pairs_done = 0
+        self.total_techniques = 0
+        self.techniques_done = 0
+        self.units_this_run = 0
+        self.failures = 0
+        self.started_at = time.monotonic()
+
+    def update(self, label):
+        self.units_this_run += 1
+        elapsed = time.monotonic() - self.started_at
+        print(
+            f"[{elapsed:7.1f}s] GPT {self.pairs_done}/{self.total_pairs} | "
+            f"techniques {self.techniques_done}/{self.total_techniques} | "
+            f"{self.units_this_run / elapsed if elapsed else 0.0:.2f} units/s | {label}"
+        )
+
+
+# Runs (query, category) GPT calls and (query, category, technique) video fetches
+# concurrently, with separate token-bucket rate limits for OpenAI and YouTube.
+# Every finished unit is appended to a JSONL journal, so a rerun after a crash
+# skips the work that already completed. In batch mode the GPT calls are sent
+# as one Batch API job first; the journal records the batch id, so a rerun
+# resumes polling it instead of submitting the prompts again. Results go to the
+# CSV and, under the journal's run ID, to the partitioned Parquet store, which
+# is appended to as units are journaled.
+class SimulationRunner:
+    def __init__(
+        self,
+        queries,
+        categories,
+        output_file="simulation_results.csv",
+        journal_file=None,
+        workers=4,
+        openai_rps=1.0,
+        youtube_rps=2.0,
+        retries=4,
+        max_results=3,
+        top_n=5,
+        batch=False,
+        batch_poll_seconds=BATCH_POLL_SECONDS,
+        store_dir=RESULTS_DIR,
+    ):
+        self.queries = queries
+        self.categories = ["All"] + list(categories.keys())
+        self.output_file = output_file
+        self.journal_file = journal_file or f"{output_file}.journal.jsonl"
+        self.workers = workers
+        self.openai_bucket = TokenBucket(openai_rps)
+        self.youtube_bucket = TokenBucket(youtube_rps)
+        self.retries = retries
+        self.max_results = max_results
+        self.top_n = top_n
+        self.batch = batch
+        self.batch_poll_seconds = batch_poll_seconds
+        self.batch_file = f"{output_file}.batch.jsonl"
+        self.store_dir = store_dir  # None disables the Parquet store
+
+    def pairs(self):
+        return [
+            (query_id, query, category)
+            for query_id, query in enumerate(self.queries, start=1)
+            for category in self.categories
+        ]
+
+    @staticmethod
+    def pair_key(query_id, query, category):
+        return json.dumps([query_id, query, category])
+
+    @staticmethod
+    def technique_key(query_id, query, category, index, technique):
+        return json.dumps([query_id, query, category, index, technique])
+
+    def load_journal(self):
+        techniques_by_pair = {}
+        rows_by_technique = {}
+        state = {"batch_id": None, "run_id": None}
+        if not os.path.exists(self.journal_file):
+            return techniques_by_pair, rows_by_technique, state
+        with open(self.journal_file, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A torn final line from a crash; that unit simply reruns
+                if entry["type"] == "gpt":
+                    techniques_by_pair[entry["key"]] = entry["techniques"]
+                elif entry["type"] == "batch":
+                    state["batch_id"] = entry["batch_id"]  # Set to None once the batch is ingested
+                elif entry["type"] == "run":
+                    state["run_id"] = entry["run_id"]
+                else:
+                    rows_by_technique[entry["key"]] = entry["rows"]
+        return techniques_by_pair, rows_by_technique, state
+
+    def _log_retry(self, label):
+        def on_retry(attempt, delay, error):
+            print(f"Retrying {label} (attempt {attempt}) in {delay:.1f}s after error: {error}")
+        return on_retry
+
+    def run_gpt_unit(self, query, category):
+        def call():
+            self.openai_bucket.acquire()
+            return request_gpt_techniques(query, category)
+
+        # Extraction failures are retried here; in JSON mode that is a malformed
+        # answer. Failed calls are not: ResilientCompletions has already retried,
+        # hedged and fallen back before raising GPTUnavailableError.
+        with start_trace("simulate.gpt", query=query, category=category):
+            return retry_with_backoff(
+                call,
+                retries=self.retries,
+                give_up_on=(GPTUnavailableError, GPTDeadlineError),
+                on_retry=self._log_retry(f"GPT '{query}' / '{category}'"),
+            )
+
+    # Submit every pair without techniques as one batch job (or resume polling
+    # the journaled one), then ingest the answers. Failed requests are left
+    # out and run as live GPT units afterwards. A batch that fails, expires or
+    # is cancelled is cleared from the journal once whatever it answered is
+    # ingested, so a rerun does not resume it again.
+    def run_gpt_batch(self, pending_pairs, batch_id, techniques_by_pair, record):
+        jobs = write_batch_jobs(self.batch_file, pending_pairs, GPT_OUTPUT_FORMAT)
+        if batch_id is None:
+            batch_id = submit_batch(self.batch_file, metadata={"output_file": os.path.basename(self.output_file)})
+            record({"type": "batch", "batch_id": batch_id})
+            print(f"Submitted batch {batch_id} with {len(jobs)} prompts from {self.batch_file}.")
+        else:
+            print(f"Resuming batch {batch_id} from {self.journal_file}.")
+
+        def on_poll(batch):
+            counts = batch.request_counts
+            done = f" ({counts.completed + counts.failed}/{counts.total} requests)" if counts and counts.total else ""
+            print(f"Batch {batch_id}: {batch.status}{done}")
+
+        try:
+            batch = wait_for_batch(batch_id, poll_seconds=self.batch_poll_seconds, on_poll=on_poll)
+        except BatchFailedError as e:
+            print(f"{e}; its unanswered prompts will run live.")
+            batch = e.batch
+        answers, errors = read_batch_results(batch)
+        ingested = 0
+        for custom_id, (query_id, query, category) in jobs.items():
+            if custom_id not in answers:
+                continue
+            try:
+                techniques = techniques_from_answer(answers[custom_id])
+            except Exception as e:
+                errors[custom_id] = str(e)
+                continue
+            store_completion(query, category, answers[custom_id], GPT_OUTPUT_FORMAT)  # Shared with the app's cache
+            key = self.pair_key(query_id, query, category)
+            techniques_by_pair[key] = techniques
+            record({"type": "gpt", "key": key, "techniques": techniques})
+            ingested += 1
+        record({"type": "batch", "batch_id": None})
+
+        remaining = len(jobs) - ingested
+        print(f"Ingested {ingested}/{len(jobs)} batch answers" + (f"; {remaining} will run live." if remaining else "."))
+
+    def run_technique_unit(self, query_id, query, category, technique_data):
+        technique = technique_data["technique"]
+        enriched_query = " ".join([technique] + technique_data["keywords"])
+
+        def call():
+            self.youtube_bucket.acquire()
+            return search_youtube_videos(
+                enriched_query,
+                max_results=self.max_results,
+                order="relevance",  # Fetch the most-viewed videos
+                video_duration="medium",  # Fetch videos between 4 and 20 minutes
+                video_definition="high",  # Fetch only high-definition videos
+            )
+
+        with start_trace("simulate.technique", query=query, category=category, technique=technique):
+            videos = retry_with_backoff(
+                call,
+                retries=self.retries,
+                give_up_on=(QuotaExceededError,),
+                on_retry=self._log_retry(f"videos for '{enriched_query}'"),
+            )
+            if not videos:
+                return []
+            videos = enrich_youtube_videos(add_retrieved_videos(enriched_query, videos))
+            ranked_videos = rank_videos_by_query(enriched_query, videos)
+
+        return [
+            [
+                query_id,
+                query,
+                category,
+                technique,
+                technique_data["description"],
+                " ".join(technique_data["keywords"]),
+                video["title"],
+                video["description"],
+                float(video.get("similarity_score", 0.0)),
+                video["link"],
+            ]
+            for video in ranked_videos[:self.top_n]  # Log top videos per technique
+        ]
+
+    def run(self):
+        techniques_by_pair, rows_by_technique, state = self.load_journal()
+        pairs = self.pairs()
+        progress = ProgressReporter(len(pairs))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                open(self.journal_file, "a", encoding="utf-8") as journal, ExitStack() as stack:
+
+            def record(entry):
+                journal.write(json.dumps(entry) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+
+            journaled_pairs = sum(self.pair_key(*pair) in techniques_by_pair for pair in pairs)
+            pending_pairs = [pair for pair in pairs if self.pair_key(*pair) not in techniques_by_pair]
+            if self.batch and pending_pairs:
+                self.run_gpt_batch(pending_pairs, state["batch_id"], techniques_by_pair, record)
+
+            run_id = state["run_id"]
+            if run_id is None:
+                run_id = new_run_id()
+                record({"type": "run", "run_id": run_id})
+            store = None
+            if self.store_dir is not None:
+                store = stack.enter_context(self.open_store(run_id, pairs, techniques_by_pair, rows_by_technique))
+
+            futures = {}
+
+            def schedule_techniques(query_id, query, category, techniques):
+                for index, technique_data in enumerate(techniques):
+                    key = self.technique_key(query_id, query, category, index, technique_data["technique"])
+                    progress.total_techniques += 1
+                    if key in rows_by_technique:
+                        progress.techniques_done += 1
+                        continue
+                    future = executor.submit(self.run_technique_unit, query_id, query, category, technique_data)
+                    futures[future] = ("technique", key)
+
+            for query_id, query, category in pairs:
+                key = self.pair_key(query_id, query, category)
+                if key in techniques_by_pair:
+                    progress.pairs_done += 1
+                    schedule_techniques(query_id, query, category, techniques_by_pair[key])
+                else:
+                    future = executor.submit(self.run_gpt_unit, query, category)
+                    futures[future] = ("gpt", (key, query_id, query, category))
+
+            if journaled_pairs or progress.techniques_done:
+                print(f"Resuming from {self.journal_file}: {journaled_pairs} GPT and {progress.techniques_done} technique units already done.")
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, unit = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        progress.failures += 1
+                        print(f"Failed {kind} unit {unit}: {e}")
+                        continue
+
+                    if kind == "gpt":
+                        key, query_id, query, category = unit
+                        techniques_by_pair[key] = result
+                        record({"type": "gpt", "key": key, "techniques": result})
+                        progress.pairs_done += 1
+                        schedule_techniques(query_id, query, category, result)
+                        progress.update(f"Processed Query ID {query_id}: '{query}' for Category: '{category}'")
+                    else:
+                        rows_by_technique[unit] = result
+                        record({"type": "technique", "key": unit, "rows": result})
+                        if store is not None:
+                            store.extend(result)
+                        progress.techniques_done += 1
+                        progress.update(f"Logged {len(result)} videos for {json.loads(unit)[4]}")
+
+        self.write_csv(pairs, techniques_by_pair, rows_by_technique)
+        if store is not None:
+            print(f"Stored {store.rows_written} rows as run {run_id} in {self.store_dir}.")
+        if progress.failures:
+            print(f"{progress.failures} units failed; rerun to resume from {self.journal_file}.")
+        return progress
+
+    # Result rows in query/category/technique order
+    def ordered_rows(self, pairs, techniques_by_pair, rows_by_technique):
+        for query_id, query, category in pairs:
+            techniques = techniques_by_pair.get(self.pair_key(query_id, query, category), [])
+            for index, technique_data in enumerate(techniques):
+                key = self.technique_key(query_id, query, category, index, technique_data["technique"])
+                yield from rows_by_technique.get(key, [])
+
+    # Write the CSV with the original schema
+    def write_csv(self, pairs, techniques_by_pair, rows_by_technique):
+        with open(self.output_file, mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_HEADER)
+            writer.writerows(self.ordered_rows(pairs, techniques_by_pair, rows_by_technique))
+
+    # Start this run's partition of the store over with the rows already in the
+    # journal, so a resumed run is stored once. Rows of later units are appended
+    # as they are journaled, a row group per STORE_ROWS_PER_GROUP rows.
+    def open_store(self, run_id, pairs, techniques_by_pair, rows_by_technique):
+        writer = ResultWriter(run_id, store_dir=self.store_dir, rows_per_group=STORE_ROWS_PER_GROUP, overwrite=True)
+        writer.extend(self.ordered_rows(pairs, techniques_by_pair, rows_by_technique))
+        return writer
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# mindy.config reads the cache directory at import, so point it at a scratch
+# directory before any test imports mindy; nothing touches the real caches
+os.environ["MINDY_CACHE_DIR"] = tempfile.mkdtemp(prefix="mindy-tests-")
+os.environ["MINDY_LOCAL_INDEX"] = "0"
+
+# Make the mindy package importable however pytest is started
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
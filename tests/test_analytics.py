@@ -0,0 +1,28 @@
+from mindy.analytics import AnalyticsEngine, print_report
+from mindy.results import ResultWriter
+
+
+def result_row(query, category, technique, keywords):
+    return [1, query, category, technique, f"{technique} explained", keywords, "Title", "Video", 0.5, "https://youtu.be/x"]
+
+
+def test_relationship_counts_stay_with_their_category(tmp_path, capsys):
+    store = tmp_path / "results"
+    with ResultWriter("run-a", store_dir=str(store)) as writer:
+        writer.extend([
+            # Anxiety has no keywords, so it is missing from the keyword counts
+            result_row("calm down", "Anxiety", "Box Breathing", ""),
+            result_row("calm down", "Anxiety", "Grounding", ""),
+            result_row("sleep better", "Sleep", "Body Scan", "body scan sleep"),
+            result_row("rest", "Sleep", "Body Scan", "rest"),
+        ])
+
+    with AnalyticsEngine(str(tmp_path / "analytics.duckdb"), str(store)) as engine:
+        engine.refresh()
+        summary = engine.relationship_summary()
+        rows = {row.Category: (row.techniques, row.keywords, row.queries) for row in summary.itertuples()}
+        assert rows == {"Anxiety": (2, 0, 1), "Sleep": (1, 4, 2)}
+
+        print_report(engine)
+    report = capsys.readouterr().out.split("--- Relationship Analysis ---")[1]
+    assert report.splitlines()[2].split() == ["Anxiety", "2", "0", "1"]
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+BENCH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "bench_pipeline.py")
+
+
+# The configured cache directory stands in for the real .mindy_cache: the run
+# must leave it untouched and clean up its own scratch directory
+def test_bench_pipeline_writes_only_to_its_scratch_directory(tmp_path):
+    configured, scratch = tmp_path / "configured", tmp_path / "tmp"
+    configured.mkdir()
+    scratch.mkdir()
+    env = {**os.environ, "MINDY_CACHE_DIR": str(configured), "TMPDIR": str(scratch)}
+    subprocess.run(
+        [sys.executable, BENCH_PATH, "--queries", "2", "--no-save", "--openai-latency", "0.01", "--youtube-latency", "0.01"],
+        env=env, check=True, capture_output=True, timeout=120,
+    )
+    assert list(configured.iterdir()) == []
+    assert list(scratch.iterdir()) == []
@@ -0,0 +1,96 @@
+import types
+
+import pytest
+
+import mindy.cache
+import mindy.gpt
+from mindy.cache import SQLiteCache, gpt_cache_key, normalize_query
+from mindy.gpt import completion_cache_keys, completion_params
+
+
+# A clock the test moves by hand, patched into mindy.cache
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1_000_000.0)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(mindy.cache, "time", clock)
+    return clock
+
+
+def test_get_returns_what_set_stored(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries")
+    cache.set("key", {"videos": [1, 2]})
+    assert cache.get("key") == {"videos": [1, 2]}
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entries_are_only_returned_when_stale_is_allowed(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries", ttl_seconds=60)
+    cache.set("key", "value")
+    clock.now += 59
+    assert cache.get("key") == "value"
+    clock.now += 2
+    assert cache.get("key") is None
+    assert cache.get("key", allow_stale=True) == "value"
+
+
+def test_get_many_skips_expired_entries(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries", ttl_seconds=60)
+    cache.set("old", 1)
+    clock.now += 30
+    cache.set_many({"new": 2, "newer": 3})
+    clock.now += 40
+    assert cache.get_many(["old", "new", "newer", "missing"]) == {"new": 2, "newer": 3}
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries", max_entries=2)
+    cache.set("a", 1)
+    clock.now += 1
+    cache.set("b", 2)
+    clock.now += 1
+    cache.get("a")  # Now more recently used than b
+    clock.now += 1
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["entries"] == 2
+
+
+def test_writes_drop_expired_entries(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries", ttl_seconds=60)
+    cache.set("old", 1)
+    clock.now += 61
+    cache.set("new", 2)
+    assert cache.get("old", allow_stale=True) is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_disabled_cache_stores_nothing(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries", enabled=False)
+    cache.set("key", "value")
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_gpt_cache_key_ignores_case_and_whitespace():
+    assert normalize_query("  How can I   Sleep? ") == "how can i sleep?"
+    key, _ = completion_cache_keys("How can I sleep?", "All")
+    assert completion_cache_keys("how can i  sleep?", "All")[0] == key
+    assert completion_cache_keys("How can I sleep?", "Sleep and Rest")[0] != key
+    assert completion_cache_keys("How can I sleep?", "All", "json")[0] != key
+
+
+def test_gpt_cache_key_covers_the_whole_rendered_request(monkeypatch):
+    params = completion_params("how can i sleep?", "All")
+    assert gpt_cache_key(params) == completion_cache_keys("How can I sleep?", "All")[0]
+    for name, value in [("model", "gpt-4o"), ("max_tokens", 100), ("temperature", 0.2)]:
+        assert gpt_cache_key({**params, name: value}) != gpt_cache_key(params)
+    messages = [{**params["messages"][0], "content": "You are a terse assistant."}] + params["messages"][1:]
+    assert gpt_cache_key({**params, "messages": messages}) != gpt_cache_key(params)
+
+    key, _ = completion_cache_keys("How can I sleep?", "All")
+    monkeypatch.setattr(mindy.gpt, "GPT_MAX_TOKENS", 100)
+    assert completion_cache_keys("How can I sleep?", "All")[0] != key
@@ -0,0 +1,32 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mindy.concurrency import FetchTimeoutError, iter_completed, submit_timed
+
+
+def test_one_deadline_bounds_the_wait_for_running_and_queued_calls():
+    release = threading.Event()
+    started = []
+
+    def fetch(name):
+        started.append(name)
+        if name != "fast":
+            release.wait(5)
+        return name
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        fast = submit_timed(fetch, "fast", executor=executor)
+        fast.result()
+        submit_timed(fetch, "busy", executor=executor)  # Keeps the second worker occupied
+        futures = [fast] + [submit_timed(fetch, name, executor=executor) for name in ["slow", "queued"]]
+        started_at = time.monotonic()
+        results = {index: (result, error) for index, result, error in iter_completed(futures, timeout=0.2)}
+        elapsed = time.monotonic() - started_at
+        release.set()
+
+    assert elapsed < 1
+    assert results[0] == ("fast", None)
+    assert isinstance(results[1][1], FetchTimeoutError) and "abandoned" in str(results[1][1])
+    assert isinstance(results[2][1], FetchTimeoutError) and "cancelled" in str(results[2][1])
+    assert futures[2].cancelled() and "queued" not in started
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from mindy.extraction import extract_techniques_and_keywords, techniques_from_answer
+from mindy.streaming import TechniqueStreamParser
+from mindy.structured import InvalidRecommendationsError
+
+ANSWER = """# How to Relax Before Sleep
+
+## Recommendations
+1. **Box Breathing**: Inhale, hold, exhale and hold for four counts each.
+2. **Progressive Muscle Relaxation**: Tense and release each muscle group.
+3. **Sleep Journaling** - Write down tomorrow's tasks.
+4. **Warm Bath**: Soak for twenty minutes.
+- **Not a technique**: bullet lines are ignored
+"""
+
+
+def test_batch_parser_matches_the_stream_parser():
+    parser = TechniqueStreamParser()
+    parser.feed(ANSWER)
+    parser.close()
+    assert extract_techniques_and_keywords(ANSWER) == parser.techniques
+    assert len(parser.techniques) == 3
+
+
+def test_title_keywords_come_from_the_first_title_only():
+    answer = "# Evening Calm\n1. **Walk**: outside\n# Other Title\n2. **Read**: a book"
+    assert [technique["keywords"] for technique in extract_techniques_and_keywords(answer)] == [
+        ["walk", "evening", "calm"], ["read", "evening", "calm"]
+    ]
+
+
+def test_only_items_one_to_three_count():
+    answer = "# Focus\n1. **One**: a\n3. **Three**: c\n4. **Four**: d\n10. **Ten**: e\n"
+    assert [technique["technique"] for technique in extract_techniques_and_keywords(answer)] == ["One", "Three"]
+
+
+def test_answer_without_techniques_gives_none():
+    assert extract_techniques_and_keywords("The provided context does not contain this information.") == []
+
+
+def test_markdown_answers_are_parsed_by_default():
+    assert techniques_from_answer(ANSWER, "markdown") == extract_techniques_and_keywords(ANSWER)
+
+
+def test_json_answers_use_the_model_keywords():
+    answer = json.dumps({
+        "title": "Calm Mornings",
+        "techniques": [{"name": "Mindful Walking", "description": "Walk slowly.", "keywords": ["Walking", "outdoors"]}],
+    })
+    assert techniques_from_answer(answer, "json") == [
+        {"technique": "Mindful Walking", "keywords": ["mindful", "walking", "outdoors", "calm", "mornings"], "description": "Walk slowly."}
+    ]
+
+
+def test_invalid_json_answers_raise():
+    with pytest.raises(InvalidRecommendationsError):
+        techniques_from_answer('{"title": "x"}', "json")
+    with pytest.raises(InvalidRecommendationsError):
+        techniques_from_answer("1. **Not JSON**", "json")
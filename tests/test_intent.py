@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+import mindy.intent
+from mindy.intent import IntentClassifier, calibrate_threshold
+
+
+# A two-term model: "sleep" pushes a query on topic and into "Sleep and Rest",
+# "stocks" pushes it off topic and into "Focus"
+def tiny_classifier(reject_below=None):
+    return IntentClassifier(
+        vocabulary=["sleep", "stocks"],
+        idf=np.ones(2),
+        topic_coef=np.array([4.0, -4.0]),
+        topic_intercept=0.0,
+        category_coef=np.array([[3.0, 0.0], [0.0, 3.0]]),
+        category_intercept=np.zeros(2),
+        categories=["Sleep and Rest", "Focus"],
+        reject_below=reject_below,
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_threshold_override(monkeypatch):
+    monkeypatch.setattr(mindy.intent, "REJECT_BELOW", None)
+
+
+def test_classify_scores_known_terms():
+    classifier = tiny_classifier()
+    on_topic = classifier.classify("I cannot sleep")
+    off_topic = classifier.classify("Which stocks should I buy")
+    assert on_topic["on_topic"] > 0.9 and on_topic["category"] == "Sleep and Rest"
+    assert off_topic["on_topic"] < 0.1 and off_topic["category"] == "Focus"
+
+
+def test_queries_without_known_terms_are_left_to_gpt():
+    classifier = tiny_classifier(reject_below=0.5)
+    result = classifier.classify("something entirely different")
+    assert result == {"on_topic": None, "category": None, "category_probability": None}
+    assert not classifier.is_off_topic(result)
+    assert classifier.suggest_category(result) is None
+
+
+def test_nothing_is_refused_without_a_threshold():
+    assert not tiny_classifier().is_off_topic({"on_topic": 0.001})
+
+
+def test_model_threshold_refuses_only_below_it():
+    classifier = tiny_classifier(reject_below=0.1)
+    assert classifier.is_off_topic({"on_topic": 0.05})
+    assert not classifier.is_off_topic({"on_topic": 0.1})
+    assert not classifier.is_off_topic({"on_topic": 0.4})  # Uncertain queries still go to GPT
+
+
+def test_explicit_and_configured_thresholds_override_the_model(monkeypatch):
+    classifier = tiny_classifier(reject_below=0.1)
+    assert classifier.is_off_topic({"on_topic": 0.3}, reject_below=0.5)
+    assert not classifier.is_off_topic({"on_topic": 0.05}, reject_below=0.01)
+    monkeypatch.setattr(mindy.intent, "REJECT_BELOW", 0.5)
+    assert classifier.is_off_topic({"on_topic": 0.3})
+
+
+def test_category_is_only_suggested_when_confident():
+    classifier = tiny_classifier()
+    assert classifier.suggest_category({"category": "Focus", "category_probability": 0.8}, suggest_above=0.5) == "Focus"
+    assert classifier.suggest_category({"category": "Focus", "category_probability": 0.4}, suggest_above=0.5) is None
+
+
+def test_calibrated_threshold_bounds_false_refusals():
+    on_topic = np.linspace(0.01, 1.0, 1000)
+    threshold = calibrate_threshold(on_topic, np.array([]), max_false_refusals=0.005)
+    assert np.mean(on_topic < threshold) <= 0.005
+
+
+def test_calibrated_threshold_never_refuses_distress_examples():
+    on_topic = np.linspace(0.5, 1.0, 100)
+    distress = np.array([0.3, 0.08, 0.6])
+    threshold = calibrate_threshold(on_topic, distress, max_false_refusals=0.05)
+    assert threshold == 0.08
+    assert not any(probability < threshold for probability in distress)
+
+
+@pytest.mark.parametrize("reject_below", [None, 0.075])
+def test_threshold_survives_save_and_load(tmp_path, reject_below):
+    path = str(tmp_path / "intent.npz")
+    tiny_classifier(reject_below).save(path)
+    loaded = IntentClassifier.load(path)
+    assert loaded.reject_below == reject_below
+    assert loaded.classify("sleep") == tiny_classifier().classify("sleep")
+
+
+def test_a_missing_model_disables_the_check_instead_of_training(tmp_path, monkeypatch):
+    monkeypatch.setattr(mindy.intent, "MODEL_PATH", str(tmp_path / "intent_classifier.npz"))
+    monkeypatch.setattr(mindy.intent, "train", lambda *args, **kwargs: pytest.fail("trained on the request path"))
+    mindy.intent.get_intent_classifier.cache_clear()
+    try:
+        assert mindy.intent.get_intent_classifier() is None
+        tiny_classifier(reject_below=0.2).save(mindy.intent.MODEL_PATH)
+        mindy.intent.get_intent_classifier.cache_clear()
+        assert mindy.intent.get_intent_classifier().reject_below == pytest.approx(0.2)
+    finally:
+        mindy.intent.get_intent_classifier.cache_clear()
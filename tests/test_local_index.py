@@ -0,0 +1,30 @@
+import mindy.local_index
+from mindy.local_index import LocalVideoIndex
+
+
+def video(video_id, title):
+    return {"video_id": video_id, "title": title, "description": "", "link": f"https://www.youtube.com/watch?v={video_id}"}
+
+
+def test_search_survives_a_compaction_in_another_process(tmp_path, monkeypatch):
+    writer = LocalVideoIndex(str(tmp_path))
+    writer.add_videos([video("a", "box breathing for anxiety")])
+    writer.add_videos([video("b", "box breathing before sleep")])
+    compactor = LocalVideoIndex(str(tmp_path))
+    reader = LocalVideoIndex(str(tmp_path))
+
+    # The other process merges and deletes the segments right after this one listed them
+    compacted = []
+
+    class SegmentAfterCompaction(mindy.local_index.Segment):
+        def __init__(self, path, base):
+            if not compacted:
+                compacted.append(True)
+                compactor.compact()
+            super().__init__(path, base)
+
+    monkeypatch.setattr(mindy.local_index, "Segment", SegmentAfterCompaction)
+    videos, _ = reader.search("box breathing")
+    assert compacted
+    assert sorted(found["video_id"] for found in videos) == ["a", "b"]
+    assert len(reader._segments) == 1
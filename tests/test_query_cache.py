@@ -0,0 +1,68 @@
+import time
+import types
+
+import numpy as np
+
+import mindy.query_cache
+from mindy.query_cache import SemanticQueryCache
+
+
+# One axis per first word, so queries starting alike are identical and others orthogonal
+def embed(texts):
+    vocabulary = ["box", "body", "journal", "walk", "tea"]
+    embeddings = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    for row, text in enumerate(texts):
+        embeddings[row, vocabulary.index(text.split()[0])] = 1
+    return embeddings
+
+
+def remember(cache, query, answer, scope="All"):
+    entry, _, embedding = cache.lookup(query, scope)
+    assert entry is None
+    cache.add(query, scope, embedding, answer, latency=1.0)
+
+
+def test_paraphrases_reuse_an_answer_in_the_same_scope():
+    cache = SemanticQueryCache(embed, threshold=0.9)
+    remember(cache, "box breathing at night", "answer")
+    entry, similarity, _ = cache.lookup("Box breathing before bed", "All")
+    assert entry["answer"] == "answer" and similarity == 1.0
+    assert cache.lookup("box breathing before bed", "Focus")[0] is None
+    assert cache.lookup("body scan", "All")[0] is None
+
+
+def test_processes_sharing_the_file_keep_each_other_s_answers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = SemanticQueryCache(embed, path=path)
+    second = SemanticQueryCache(embed, path=path)
+    remember(first, "box breathing", "from first")
+    remember(second, "body scan", "from second")
+    reopened = SemanticQueryCache(embed, path=path)
+    assert sorted(entry["answer"] for entry in reopened.entries) == ["from first", "from second"]
+    assert reopened.lookup("box breathing please", "All")[0]["answer"] == "from first"
+
+
+def test_least_recently_used_entry_is_replaced_in_memory_and_on_disk(tmp_path, monkeypatch):
+    clock = types.SimpleNamespace(now=1_000_000.0, monotonic=time.monotonic)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(mindy.query_cache, "time", clock)
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SemanticQueryCache(embed, max_entries=2, path=path)
+    remember(cache, "box breathing", "box")
+    clock.now += 1
+    remember(cache, "body scan", "body")
+    clock.now += 1
+    cache.lookup("box breathing", "All")  # Now more recently used than body
+    clock.now += 1
+    remember(cache, "journal prompts", "journal")
+    assert sorted(entry["answer"] for entry in cache.entries) == ["box", "journal"]
+    assert sorted(entry["answer"] for entry in SemanticQueryCache(embed, max_entries=2, path=path).entries) == ["box", "journal"]
+
+
+def test_clear_empties_the_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SemanticQueryCache(embed, path=path)
+    remember(cache, "walk outside", "walk")
+    cache.clear()
+    assert cache.entries == []
+    assert SemanticQueryCache(embed, path=path).entries == []
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import mindy.quota
+from mindy.quota import QuotaLedger
+
+
+# A datetime whose now() the test sets, patched into mindy.quota
+@pytest.fixture
+def utc_now(monkeypatch):
+    class FakeDatetime(datetime):
+        current = datetime(2026, 1, 15, 12, 0, tzinfo=timezone.utc)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current.astimezone(tz)
+
+    monkeypatch.setattr(mindy.quota, "datetime", FakeDatetime)
+
+    def set_now(*args):
+        FakeDatetime.current = datetime(*args, tzinfo=timezone.utc)
+
+    return set_now
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return QuotaLedger(str(tmp_path / "quota.sqlite3"), daily_limit=300)
+
+
+def test_budget_resets_at_midnight_pacific_time(ledger, utc_now):
+    utc_now(2026, 1, 15, 7, 59)  # 23:59 PST on January 14
+    assert ledger.try_spend(300, "search.list")
+    assert not ledger.try_spend(1, "videos.list")
+    utc_now(2026, 1, 15, 8, 0)  # Midnight PST
+    assert ledger.today() == "2026-01-15"
+    assert ledger.remaining() == 300
+    assert ledger.try_spend(100, "search.list")
+    assert ledger.usage("2026-01-14") == {"search.list": 300}
+    assert ledger.usage() == {"search.list": 100}
+
+
+def test_budget_does_not_reset_at_midnight_utc(ledger, utc_now):
+    utc_now(2026, 1, 14, 23, 30)
+    assert ledger.try_spend(300, "search.list")
+    utc_now(2026, 1, 15, 0, 30)  # 16:30 PST, still January 14
+    assert ledger.today() == "2026-01-14"
+    assert not ledger.try_spend(100, "search.list")
+
+
+def test_reset_follows_daylight_saving_time(ledger, utc_now):
+    utc_now(2026, 7, 15, 6, 59)  # 23:59 PDT on July 14
+    assert ledger.today() == "2026-07-14"
+    utc_now(2026, 7, 15, 7, 0)
+    assert ledger.today() == "2026-07-15"
+
+
+def test_background_spending_leaves_the_interactive_reserve(tmp_path, utc_now):
+    ledger = QuotaLedger(str(tmp_path / "quota.sqlite3"), daily_limit=300, background_reserve_units=100)
+    assert ledger.try_spend(200, "search.list", background=True)
+    assert not ledger.try_spend(1, "videos.list", background=True)
+    assert ledger.remaining(background=True) == 0
+    assert ledger.try_spend(100, "search.list")
+    assert ledger.usage() == {"search.list": 300}
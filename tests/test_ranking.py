@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from mindy.ranking import dedupe_ranked, top_k_indices
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 5, 8])
+def test_top_k_indices_match_a_stable_sort(k):
+    values = np.array([0.2, 0.9, 0.5, 0.9, 0.1, 0.5, 0.5, 0.3])
+    expected = np.argsort(-values, kind="stable")[:k]
+    assert top_k_indices(values, k).tolist() == expected.tolist()
+
+
+def test_top_k_indices_keep_the_earliest_of_tied_values():
+    assert top_k_indices(np.array([1.0, 2.0, 2.0, 2.0, 0.0]), 2).tolist() == [1, 2]
+    assert top_k_indices(np.zeros(4), 3).tolist() == [0, 1, 2]
+
+
+def test_top_k_indices_with_k_past_the_end_rank_everything():
+    assert top_k_indices(np.array([0.1, 0.3, 0.2]), 10).tolist() == [1, 2, 0]
+    assert top_k_indices(np.array([]), 3).tolist() == []
+
+
+def test_top_k_indices_on_random_scores():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        values = rng.integers(0, 10, size=rng.integers(1, 40)).astype(float)
+        k = int(rng.integers(0, len(values) + 2))
+        assert top_k_indices(values, k).tolist() == np.argsort(-values, kind="stable")[:k].tolist()
+
+
+def test_dedupe_ranked_keeps_each_video_where_it_scored_highest():
+    first = [{"video_id": "a", "similarity_score": 0.9}, {"video_id": "b", "similarity_score": 0.2}]
+    second = [{"video_id": "b", "similarity_score": 0.6}, {"video_id": "a", "similarity_score": 0.9}, {"video_id": "c"}]
+    assert dedupe_ranked([first, second]) == [
+        [{"video_id": "a", "similarity_score": 0.9}],
+        [{"video_id": "b", "similarity_score": 0.6}, {"video_id": "c"}],
+    ]
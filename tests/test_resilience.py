@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from mindy.gpt import completion_params, read_answer
+from mindy.resilience import GPTUnavailableError, LatencyTracker, ResilientCompletions
+from mindy.standins import LatencyModel, start_standin_server
+from mindy.stats import percentile
+from mindy.telemetry import NULL_SPAN
+
+openai = pytest.importorskip("openai")
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = start_standin_server(openai_latency=LatencyModel(0.01, sigma=0), seed=0)
+    yield server
+    server.shutdown()
+
+
+# chat.completions.create against the stand-in; requests for `slow_model` wait
+# `delay` seconds first, as a stalled upstream would
+def standin_create(server, slow_model=None, delay=0.0):
+    client = openai.OpenAI(base_url=f"{server.url}/v1", api_key="standin", max_retries=0)
+
+    def create(**params):
+        if params["model"] == slow_model:
+            time.sleep(delay)
+        return client.chat.completions.create(**params)
+
+    return create
+
+
+def completions(create, **kwargs):
+    return ResilientCompletions(create, fallback_model="gpt-4o-mini", retries=1, retry_base_delay=0.01, **kwargs)
+
+
+def params():
+    return completion_params("How can I relax before bed?", "All")
+
+
+def test_primary_model_answers(server):
+    server.openai_error_rate = 0.0
+    resilient = completions(standin_create(server))
+    opened = resilient.open(params())
+    assert opened.model == params()["model"]
+    assert "**" in read_answer(opened, NULL_SPAN)
+    assert resilient.stats()["fallbacks"] == 0
+
+
+def test_missed_deadline_falls_back_without_retrying(server):
+    server.openai_error_rate = 0.0
+    primary = params()["model"]
+    resilient = completions(standin_create(server, slow_model=primary, delay=1.0), deadline=0.2, fallback_deadline=5.0)
+    started_at = time.monotonic()
+    opened = resilient.open(params())
+    assert opened.model == "gpt-4o-mini"
+    assert read_answer(opened, NULL_SPAN)
+    assert time.monotonic() - started_at < 1.0  # The stalled attempt was not waited for
+    stats = resilient.stats()
+    assert (stats["deadlines_missed"], stats["fallbacks"]) == (1, 1)
+
+
+def test_failing_upstream_is_retried_then_reported_unavailable(server):
+    server.openai_error_rate = 1.0
+    try:
+        resilient = completions(standin_create(server))
+        calls_before = server.calls["chat.completions"]
+        with pytest.raises(GPTUnavailableError):
+            resilient.open(params())
+        # One retry on the primary model, then one on the fallback
+        assert server.calls["chat.completions"] - calls_before == 4
+        assert resilient.stats()["fallbacks"] == 1
+    finally:
+        server.openai_error_rate = 0.0
+
+
+def test_no_fallback_when_it_is_turned_off(server):
+    server.openai_error_rate = 1.0
+    try:
+        resilient = ResilientCompletions(standin_create(server), fallback_model="", retries=0)
+        calls_before = server.calls["chat.completions"]
+        with pytest.raises(GPTUnavailableError):
+            resilient.open(params())
+        assert server.calls["chat.completions"] - calls_before == 1
+    finally:
+        server.openai_error_rate = 0.0
+
+
+def test_latency_tracker_uses_the_nearest_rank_percentile():
+    tracker = LatencyTracker()
+    assert tracker.percentile(0.5) is None
+    for seconds in range(1, 11):
+        tracker.observe(seconds)
+    assert tracker.percentile(0.5) == percentile(range(1, 11), 0.5) == 5
+    assert tracker.percentile(0.95) == percentile(range(1, 11), 0.95) == 10
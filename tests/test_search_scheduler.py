@@ -0,0 +1,88 @@
+import threading
+import time
+
+import mindy.search_scheduler
+from mindy.search_scheduler import SearchScheduler, canonical_query
+from mindy.youtube import video_cache_key
+
+PARAMS = {"part": "snippet", "type": "video", "maxResults": 3, "order": "relevance"}
+
+
+def test_canonical_query_drops_stop_words_folds_plurals_and_sorts():
+    assert canonical_query("Box Breathing for anxiety") == canonical_query("anxiety breathing box")
+    assert canonical_query("breathing exercises exercise") == "breathing exercise"
+    assert canonical_query("How to breathe") == "breathe"
+
+
+def test_plurals_fold_across_queries():
+    assert canonical_query("breathing techniques") == canonical_query("breathing technique")
+    assert canonical_query("bedtime stories") == canonical_query("bedtime story")
+    assert canonical_query("stress relief") == "relief stress"
+
+
+def test_equivalent_keyword_sets_share_one_cache_key_but_keep_their_query():
+    scheduler = SearchScheduler(near_duplicate_jaccard=1)
+    first = scheduler.merge_request({**PARAMS, "q": "Body Scan sleep relaxation"})
+    second = scheduler.merge_request({**PARAMS, "q": "relaxation for sleep body scans"})
+    assert first["q"] == "Body Scan sleep relaxation"
+    assert second["q"] == "relaxation for sleep body scans"
+    assert video_cache_key(first) == video_cache_key(second)
+    assert scheduler.merged == 0
+
+
+def test_near_duplicates_merge_into_a_recent_search_with_the_same_filters():
+    scheduler = SearchScheduler(near_duplicate_jaccard=0.75)
+    first = scheduler.merge_request({**PARAMS, "q": "Box breathing, calm evening routine"})
+    merged = scheduler.merge_request({**PARAMS, "q": "box breathing calm evening"})  # Jaccard 4/5
+    assert merged["q"] == "Box breathing, calm evening routine"
+    assert video_cache_key(merged) == video_cache_key(first)
+    assert scheduler.merged == 1
+
+    other_filters = scheduler.merge_request({**PARAMS, "order": "viewCount", "q": "box breathing calm evening"})
+    assert other_filters["q"] == "box breathing calm evening"
+    distinct = scheduler.merge_request({**PARAMS, "q": "box breathing focus"})
+    assert distinct["q"] == "box breathing focus"
+    assert scheduler.merged == 1
+
+
+def test_merging_can_be_turned_off():
+    scheduler = SearchScheduler(near_duplicate_jaccard=1)
+    scheduler.merge_request({**PARAMS, "q": "box breathing calm evening routine"})
+    assert scheduler.merge_request({**PARAMS, "q": "box breathing calm evening"})["q"] == "box breathing calm evening"
+
+
+def test_recent_window_is_bounded():
+    scheduler = SearchScheduler(near_duplicate_jaccard=0.5, window=1)
+    scheduler.merge_request({**PARAMS, "q": "box breathing calm"})
+    scheduler.merge_request({**PARAMS, "q": "journaling gratitude"})
+    assert scheduler.merge_request({**PARAMS, "q": "box breathing"})["q"] == "box breathing"
+
+
+def test_concurrent_equivalent_searches_make_one_call(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def fake_search(youtube, request_params, background=False):
+        calls.append(request_params["q"])
+        release.wait(5)
+        return [{"video_id": "abc"}]
+
+    monkeypatch.setattr(mindy.search_scheduler, "cached_youtube_search", fake_search)
+    scheduler = SearchScheduler(near_duplicate_jaccard=1)
+    results = []
+    threads = [
+        threading.Thread(target=lambda query=query: results.append(scheduler.search(None, {**PARAMS, "q": query})))
+        for query in ("mindful walking", "walking mindful", "Mindful Walking")
+    ]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while scheduler.searches + scheduler.shared < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1 and calls[0] in ("mindful walking", "walking mindful", "Mindful Walking")
+    assert results == [[{"video_id": "abc"}]] * 3
+    assert scheduler.stats() == {"searches": 1, "shared": 2, "merged": 0}
@@ -0,0 +1,69 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+import mindy.youtube
+from mindy.standins import LatencyModel, start_standin_server
+
+openai = pytest.importorskip("openai")
+
+QUERIES = ["How can I sleep better?", "How do I calm down before an exam?"]
+
+
+# app_logic builds its API clients at import, so the stand-in environment is
+# set before the simulator is imported. mindy.youtube may already have read
+# its endpoint, so that is pointed at the stand-in directly.
+@pytest.fixture(scope="module")
+def server():
+    server = start_standin_server(
+        openai_latency=LatencyModel(0.01, sigma=0), youtube_latency=LatencyModel(0.01, sigma=0), batch_latency=0.05, seed=0
+    )
+    saved = dict(os.environ)
+    os.environ.update({
+        "OPENAI_BASE_URL": f"{server.url}/v1",
+        "OPENAI_API_KEY": "standin",
+        "YOUTUBE_API_KEY": "standin",
+        "MINDY_YOUTUBE_API_ENDPOINT": f"{server.url}/",
+        "MINDY_GPT_CACHE": "0",
+        "MINDY_YOUTUBE_CACHE": "0",
+    })
+    saved_endpoint, mindy.youtube.YOUTUBE_API_ENDPOINT = mindy.youtube.YOUTUBE_API_ENDPOINT, f"{server.url}/"
+    yield server
+    mindy.youtube.YOUTUBE_API_ENDPOINT = saved_endpoint
+    os.environ.clear()
+    os.environ.update(saved)
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def simulation_runner(server):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "simulate queries"))
+    return importlib.import_module("simulation_runner")
+
+
+def journaled(journal_file, entry_type):
+    with open(journal_file, encoding="utf-8") as journal:
+        return [entry for entry in map(json.loads, journal) if entry["type"] == entry_type]
+
+
+@pytest.mark.parametrize("outcome, answered", [("expired", 2), ("cancelled", 2), ("failed", 0)])
+def test_a_dead_batch_is_cleared_and_its_unanswered_prompts_run_live(tmp_path, server, simulation_runner, outcome, answered):
+    server.batch_outcome = outcome
+    runner = simulation_runner.SimulationRunner(
+        QUERIES, {"Sleep and Rest": []}, output_file=str(tmp_path / "results.csv"),
+        openai_rps=100, youtube_rps=100, batch=True, batch_poll_seconds=0.05, store_dir=None,
+    )
+    live_calls = server.calls["chat.completions"]
+    try:
+        runner.run()
+    finally:
+        server.batch_outcome = "completed"
+
+    assert server.calls["chat.completions"] - live_calls == len(runner.pairs()) - answered
+    assert len(journaled(runner.journal_file, "gpt")) == len(runner.pairs())
+    assert journaled(runner.journal_file, "batch")[-1]["batch_id"] is None
+    assert runner.load_journal()[2]["batch_id"] is None
+    assert any(entry["rows"] for entry in journaled(runner.journal_file, "technique"))
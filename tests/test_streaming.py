@@ -0,0 +1,53 @@
+import pytest
+
+from mindy.streaming import TechniqueStreamParser
+
+ANSWER = """# How to Relax Before Sleep
+
+## Recommendations
+1. **Box Breathing**: Inhale, hold, exhale and hold for four counts each.
+2. **Progressive Muscle Relaxation**: Tense and release each muscle group.
+3. **Sleep Journaling** - Write down tomorrow's tasks.
+4. **Warm Bath**: Soak for twenty minutes.
+- **Not a technique**: bullet lines are ignored
+"""
+
+
+def parse(text, chunk_size, **kwargs):
+    seen = []
+    parser = TechniqueStreamParser(on_technique=seen.append, **kwargs)
+    for start in range(0, len(text), chunk_size):
+        parser.feed(text[start:start + chunk_size])
+    parser.close()
+    assert parser.techniques == seen
+    return seen
+
+
+def test_techniques_carry_name_and_title_keywords_and_description():
+    techniques = parse(ANSWER, len(ANSWER))
+    assert [technique["technique"] for technique in techniques] == [
+        "Box Breathing", "Progressive Muscle Relaxation", "Sleep Journaling"
+    ]
+    assert techniques[0]["keywords"] == ["breathing", "relax", "before", "sleep"]
+    assert techniques[0]["description"] == "Inhale, hold, exhale and hold for four counts each."
+    assert techniques[2]["description"] == ""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_chunk_boundaries_do_not_change_the_result(chunk_size):
+    assert parse(ANSWER, chunk_size) == parse(ANSWER, len(ANSWER))
+
+
+def test_last_line_without_a_newline_is_parsed_on_close():
+    assert [technique["technique"] for technique in parse("# Focus\n1. **Walk**: outside", 4)] == ["Walk"]
+
+
+def test_lines_without_a_bold_name_are_skipped():
+    assert parse("# Title\n1. Breathe slowly\n2. **Walk**: outside", 5) == [
+        {"technique": "Walk", "keywords": ["walk", "title"], "description": "outside"}
+    ]
+
+
+def test_prefixes_restrict_the_technique_lines():
+    techniques = parse(ANSWER, 16, prefixes=["1.", "2."])
+    assert [technique["technique"] for technique in techniques] == ["Box Breathing", "Progressive Muscle Relaxation"]
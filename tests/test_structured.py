@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from mindy.structured import (
+    InvalidRecommendationsError,
+    parse_recommendations,
+    render_markdown,
+    techniques_from_recommendations,
+)
+
+RECOMMENDATIONS = {
+    "title": "Calm Mornings",
+    "techniques": [
+        {"name": "Mindful Walking", "description": "Walk slowly.", "keywords": ["Walking", "outdoors"]},
+        {"name": "Tea Ritual", "description": "Brew and sip.", "keywords": ["tea"]},
+    ],
+}
+
+
+def test_valid_answer_parses():
+    assert parse_recommendations(json.dumps(RECOMMENDATIONS)) == RECOMMENDATIONS
+
+
+@pytest.mark.parametrize("text", [
+    "1. **Not JSON**",
+    '["a list"]',
+    '{"techniques": []}',
+    '{"title": "x"}',
+    '{"title": "x", "techniques": [{"name": "", "description": "d", "keywords": []}]}',
+    '{"title": "x", "techniques": [{"name": "n", "description": "d", "keywords": [1]}]}',
+])
+def test_invalid_answers_raise(text):
+    with pytest.raises(InvalidRecommendationsError):
+        parse_recommendations(text)
+
+
+def test_keywords_combine_name_model_and_title_words_without_repeats():
+    assert techniques_from_recommendations(RECOMMENDATIONS)[0] == {
+        "technique": "Mindful Walking",
+        "keywords": ["mindful", "walking", "outdoors", "calm", "mornings"],
+        "description": "Walk slowly.",
+    }
+
+
+def test_rendered_markdown_has_the_prompted_layout():
+    assert render_markdown(RECOMMENDATIONS).splitlines() == [
+        "# Calm Mornings",
+        "",
+        "## Recommendations",
+        "1. **Mindful Walking**: Walk slowly.",
+        "2. **Tea Ritual**: Brew and sip.",
+    ]
+    assert "does not contain" in render_markdown({"title": "Off topic", "techniques": []})